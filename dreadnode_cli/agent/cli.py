@@ -3,9 +3,11 @@ import pathlib
 import shutil
 import time
 import typing as t
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import toml
 import typer
+from docker.models.images import Image  # type: ignore
 from rich import box, print
 from rich.live import Live
 from rich.prompt import Prompt
@@ -13,27 +15,35 @@ from rich.table import Table
 
 from dreadnode_cli import api
 from dreadnode_cli.agent import docker
-from dreadnode_cli.agent.config import AgentConfig
+from dreadnode_cli.agent.config import AgentConfig, find_agent_directories
 from dreadnode_cli.agent.docker import get_registry
+from dreadnode_cli.agent.dockerfile import lint_dockerfile
 from dreadnode_cli.agent.format import (
     format_agent,
     format_agent_versions,
+    format_findings,
+    format_push_plan,
     format_run,
     format_run_groups,
     format_runs,
     format_strike_models,
     format_strikes,
 )
+from dreadnode_cli.agent.registry import PushPlan, RegistryClient, get_local_layer_sizes, plan_push
 from dreadnode_cli.agent.templates import cli as templates_cli
+from dreadnode_cli.agent.templates.catalog import fetch_catalog, get_github_headers
 from dreadnode_cli.agent.templates.format import format_templates
 from dreadnode_cli.agent.templates.manager import TemplateManager
 from dreadnode_cli.api import Client
+from dreadnode_cli.archives import fetch_archive
 from dreadnode_cli.config import UserConfig
+from dreadnode_cli.defaults import TEMPLATES_DEFAULT_REPO
+from dreadnode_cli.ext.typer import pretty_cli
 from dreadnode_cli.model.config import UserModels
 from dreadnode_cli.model.format import format_user_models
 from dreadnode_cli.profile.cli import switch as switch_profile
 from dreadnode_cli.types import GithubRepo
-from dreadnode_cli.utils import download_and_unzip_archive, get_repo_archive_source_path, pretty_cli
+from dreadnode_cli.utils import check_github_path, download_github_subtree, get_repo_archive_source_path
 
 cli = typer.Typer(no_args_is_help=True)
 
@@ -137,18 +147,33 @@ def init(
     context = {"project_name": project_name, "strike": strike_response}
 
     if source is None:
-        # get the templates that match the strike
-        available_templates = template_manager.get_templates_for_strike(strike_response.name, strike_response.type)
-        available: list[str] = list(available_templates.keys())
+        remote_repo: GithubRepo | None = None
+        remote_headers: dict[str, str] = {}
+
+        if template_manager.templates:
+            # get the templates that match the strike
+            available_templates = template_manager.get_templates_for_strike(strike_response.name, strike_response.type)
+        else:
+            # nothing installed yet, match against the catalog of the default pack instead of downloading it
+            remote_repo = GithubRepo(TEMPLATES_DEFAULT_REPO)
+            try:
+                remote_headers = get_github_headers(remote_repo)
+                catalog = fetch_catalog(remote_repo, headers=remote_headers)
+            except Exception:
+                catalog = None
 
-        # none available
-        if not available:
-            if not template_manager.templates:
+            if catalog is None:
                 raise Exception(
                     "No templates installed, use [bold]dreadnode agent templates install[/] to install some."
                 )
-            else:
-                raise Exception("No templates found for the given strike.")
+
+            available_templates = catalog.get_templates_for_strike(strike_response.name, strike_response.type)
+
+        available: list[str] = list(available_templates.keys())
+
+        # none available
+        if not available:
+            raise Exception("No templates found for the given strike.")
 
         # ask the user if the template has not been passed via command line
         if template is None:
@@ -166,7 +191,17 @@ def init(
             )
 
         # install the template
-        template_manager.install(template, directory, context)
+        if remote_repo is None:
+            template_manager.install(template, directory, context)
+        else:
+            # only the chosen template is downloaded from the remote pack
+            source_dir = download_github_subtree(
+                remote_repo, available_templates[template].path.as_posix(), headers=remote_headers
+            )
+            try:
+                template_manager.install_from_dir(source_dir, directory, context)
+            finally:
+                shutil.rmtree(source_dir)
     else:
         source_dir = pathlib.Path(source)
         cleanup = False
@@ -179,29 +214,33 @@ def init(
             try:
                 github_repo = GithubRepo(source)
 
-                # Check if the repo is accessible
-                if github_repo.exists:
-                    source_dir = download_and_unzip_archive(github_repo.zip_url)
-
-                # This could be a private repo that the user can access
-                # by getting an access token from our API
-                elif github_repo.namespace == "dreadnode":
-                    github_access_token = client.get_github_access_token([github_repo.repo])
+                # private repositories need an access token and can only be downloaded through the API
+                headers = get_github_headers(github_repo)
+                if headers:
                     print(":key: Accessed private repository")
-                    source_dir = download_and_unzip_archive(
-                        github_repo.api_zip_url, headers={"Authorization": f"Bearer {github_access_token.token}"}
-                    )
 
-                else:
-                    raise Exception(f"Repository '{github_repo}' not found or inaccessible")
+                if path is not None:
+                    # fail before downloading anything, then only the subfolder is extracted from the archive
+                    check_github_path(github_repo, path, headers=headers)
 
-                # github repos zip archives usually contain a single branch folder, the real source dir,
-                # and the path is not known beforehand
-                source_dir = get_repo_archive_source_path(source_dir)
+                source_dir = fetch_archive(
+                    github_repo.api_tar_url if headers else github_repo.tar_url,
+                    headers=headers,
+                    commit=github_repo.resolve_commit(headers=headers),
+                    subpath=path,
+                )
+
+                if path is None:
+                    # github repo archives usually contain a single branch folder, the real source dir,
+                    # and the path is not known beforehand
+                    source_dir = get_repo_archive_source_path(source_dir)
+                else:
+                    # the archive was extracted from the subfolder already
+                    path = None
 
             except ValueError:
                 # not a repo, download and unzip as a ZIP archive URL
-                source_dir = download_and_unzip_archive(source)
+                source_dir = fetch_archive(source)
 
             # make sure the temporary directory is cleaned up
             cleanup = True
@@ -240,36 +279,66 @@ def push(
     new: t.Annotated[bool, typer.Option("--new", "-n", help="Create a new agent instead of a new version")] = False,
     notes: t.Annotated[str | None, typer.Option("--message", "-m", help="Notes for the new version")] = None,
     rebuild: t.Annotated[bool, typer.Option("--rebuild", "-r", help="Force rebuild the agent image")] = False,
+    workspace: t.Annotated[
+        pathlib.Path | None,
+        typer.Option(
+            "--workspace",
+            "-w",
+            help="Push every agent found under this directory",
+            file_okay=False,
+            resolve_path=True,
+        ),
+    ] = None,
+    jobs: t.Annotated[
+        int, typer.Option("--jobs", "-j", help="Maximum number of agents to build and push in parallel", min=1)
+    ] = 4,
+    plan: t.Annotated[
+        bool, typer.Option("--plan", help="Only report which image layers would be uploaded, without pushing")
+    ] = False,
+    quiet: t.Annotated[bool, typer.Option("--quiet", "-q", help="Only show the build step headers")] = False,
 ) -> None:
     env = {env_var.split("=")[0]: env_var.split("=")[1] for env_var in env_vars or []}
 
+    if workspace is not None:
+        if plan:
+            raise Exception("--plan can't be combined with --workspace, plan each agent with --dir instead")
+        if quiet:
+            raise Exception("--quiet can't be combined with --workspace, which never shows build output")
+
+        push_workspace(workspace, tag=tag, env=env, notes=notes, rebuild=rebuild, jobs=jobs, new=new)
+        return
+
     agent_config = AgentConfig.read(directory)
     user_config = UserConfig.read()
 
     if not user_config.active_profile_name:
         raise Exception("No server profile is set, use [bold]dreadnode login[/] to authenticate")
 
-    if agent_config.links and not agent_config.has_link_to_profile(user_config.active_profile_name):
-        print(f":link: Linking as a fresh agent to the current profile [magenta]{user_config.active_profile_name}[/]")
-        print()
+    if needs_new_link(agent_config, user_config.active_profile_name):
+        # a plan doesn't link anything
+        if not plan:
+            print(
+                f":link: Linking as a fresh agent to the current profile [magenta]{user_config.active_profile_name}[/]"
+            )
+            print()
         new = True
-    elif agent_config.active and agent_config.active_link.profile != user_config.active_profile_name:
-        raise Exception(
-            f"Current agent link ([yellow]{agent_config.active_link.profile}[/]) does not match "
-            f"the current server profile ([magenta]{user_config.active_profile_name}[/]). "
-            "Use [bold]dreadnode agent switch[/] or [bold]dreadnode profile switch[/]."
-        )
 
     server_config = user_config.get_server_config()
 
     registry = get_registry(server_config)
 
-    print(f":key: Authenticating with [bold]{registry}[/] ...")
-    docker.login(registry, server_config.username, server_config.api_key)
+    if not plan:
+        print(f":key: Authenticating with [bold]{registry}[/] ...")
+        docker.login(registry, server_config.username, server_config.api_key)
+        print()
 
-    print()
     print(f":wrench: Building agent from [b]{directory}[/] ...")
-    image = docker.build(directory, force_rebuild=rebuild)
+    build_profile = docker.BuildProfile()
+    image = docker.build(directory, force_rebuild=rebuild, output="steps" if quiet else "full", profile=build_profile)
+
+    if build_profile.steps:
+        print()
+        print(build_profile.render())
     agent_name = docker.sanitized_name(agent_config.project_name)
     sanitized_user_name = docker.sanitized_name(server_config.username)
 
@@ -288,11 +357,24 @@ def push(
     repository = f"{registry}/{sanitized_user_name}/agents/{agent_name}"
     tag = tag or image.id[-8:]
 
+    if plan:
+        print()
+        print(f":mag: Checking which layers already exist in [b]{repository}[/] ...")
+        print()
+        print(
+            format_push_plan(
+                get_push_plan(
+                    image, registry, repository, server_config.username, server_config.api_key, user_config=user_config
+                )
+            )
+        )
+        return
+
     print()
     print(f":package: Pushing agent to [b]{repository}:{tag}[/] ...")
     docker.push(image, repository, tag)
 
-    client = api.create_client()
+    client = api.create_client(user_config=user_config)
     container = api.Client.Container(image=f"{repository}:{tag}", env=env, name=None)
 
     if new or not agent_config.links:
@@ -329,6 +411,211 @@ def push(
     print(":tada: Agent pushed. use [bold]dreadnode agent deploy[/] to start a new run.")
 
 
+def needs_new_link(agent_config: AgentConfig, profile: str) -> bool:
+    """
+    Return True if the agent has links, but none to the given profile, so it must be pushed as a new agent.
+    Raise an error if the active link points to a different profile.
+    """
+
+    if agent_config.links and not agent_config.has_link_to_profile(profile):
+        return True
+
+    if agent_config.active and agent_config.active_link.profile != profile:
+        raise Exception(
+            f"Current agent link ([yellow]{agent_config.active_link.profile}[/]) does not match "
+            f"the current server profile ([magenta]{profile}[/]). "
+            "Use [bold]dreadnode agent switch[/] or [bold]dreadnode profile switch[/]."
+        )
+
+    return False
+
+
+def get_push_plan(
+    image: Image, registry: str, repository: str, username: str, api_key: str, *, user_config: UserConfig
+) -> PushPlan:
+    """Plan the push of a built image, looking for reusable layers in every agent repository of the user."""
+
+    repository_name = repository.removeprefix(f"{registry}/")
+    user_prefix = repository_name.split("/", 1)[0] + "/"
+
+    # other agents of the same user on this registry are candidates for cross-repository blob mounts
+    other_repositories: list[str] = []
+    # the latest version of every agent tells which tags are recent, the registry only lists them lexically
+    recent_tags: dict[str, list[str]] = {}
+    agents = sorted(
+        api.create_client(user_config=user_config).list_strike_agents(),
+        key=lambda a: a.latest_version.created_at,
+        reverse=True,
+    )
+    for agent in agents:
+        image_name, _, image_tag = agent.latest_version.container.image.removeprefix(f"{registry}/").rpartition(":")
+        if not image_name.startswith(user_prefix):
+            continue
+
+        recent_tags.setdefault(image_name, []).append(image_tag)
+        if image_name != repository_name and image_name not in other_repositories:
+            other_repositories.append(image_name)
+
+    diff_ids: list[str] = image.attrs["RootFS"]["Layers"]
+
+    return plan_push(
+        RegistryClient(registry, username, api_key),
+        repository_name,
+        diff_ids,
+        local_sizes=get_local_layer_sizes(diff_ids, image.history()),
+        other_repositories=other_repositories,
+        recent_tags=recent_tags,
+    )
+
+
+def push_workspace(
+    root: pathlib.Path,
+    *,
+    tag: str | None,
+    env: dict[str, str],
+    notes: str | None,
+    rebuild: bool,
+    jobs: int,
+    new: bool = False,
+) -> None:
+    """
+    Build and push every agent under root, sharing registry login and API client across all of them.
+    With `new`, every agent is created again instead of getting a new version.
+    """
+
+    directories = find_agent_directories(root)
+    if not directories:
+        raise Exception(f"No agents found in {root}, use [bold]dreadnode agent init[/]")
+
+    user_config = UserConfig.read()
+    profile = user_config.active_profile_name
+    if not profile:
+        raise Exception("No server profile is set, use [bold]dreadnode login[/] to authenticate")
+
+    server_config = user_config.get_server_config()
+    sanitized_user_name = docker.sanitized_name(server_config.username)
+    if not sanitized_user_name:
+        raise Exception("Failed to sanitize username")
+
+    # validate every agent before starting any build
+    agent_configs = {directory: AgentConfig.read(directory) for directory in directories}
+    for directory, agent_config in agent_configs.items():
+        if not docker.sanitized_name(agent_config.project_name):
+            raise Exception(f"Failed to sanitize agent name in {directory}, please use a different name")
+        try:
+            needs_new_link(agent_config, profile)
+        except Exception as e:
+            raise Exception(f"{directory}: {e}") from e
+
+    registry = get_registry(server_config)
+
+    print(f":key: Authenticating with [bold]{registry}[/] ...")
+    docker.login(registry, server_config.username, server_config.api_key)
+
+    client = api.create_client(user_config=user_config)
+
+    def build_and_push(directory: pathlib.Path) -> tuple[str, float, float]:
+        agent_name = docker.sanitized_name(agent_configs[directory].project_name)
+        repository = f"{registry}/{sanitized_user_name}/agents/{agent_name}"
+
+        started_at = time.monotonic()
+        image = docker.build(directory, force_rebuild=rebuild, output="none")
+        built_at = time.monotonic()
+
+        image_tag = tag or image.id[-8:]
+        docker.push(image, repository, image_tag, quiet=True)
+
+        return f"{repository}:{image_tag}", built_at - started_at, time.monotonic() - built_at
+
+    print()
+    print(f":wrench: Building and pushing {len(directories)} agents from [b]{root}[/] ({jobs} at a time) ...")
+    print()
+
+    table = Table(box=box.ROUNDED)
+    table.add_column("Agent", style="magenta")
+    table.add_column("Directory")
+    table.add_column("Build", justify="right")
+    table.add_column("Push", justify="right")
+    table.add_column("Image")
+    table.add_column("Revision", style="yellow")
+
+    rows: dict[pathlib.Path, tuple[str, ...]] = {}
+    failed = 0
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(build_and_push, directory): directory for directory in directories}
+        for future in as_completed(futures):
+            directory = futures[future]
+            agent_config = agent_configs[directory]
+            relative = str(directory.relative_to(root)) if directory != root else "."
+
+            try:
+                image, build_time, push_time = future.result()
+                container = api.Client.Container(image=image, env=env, name=None)
+
+                # versions are created from this thread only, through the shared client
+                if new or needs_new_link(agent_config, profile) or not agent_config.links:
+                    agent = client.create_strike_agent(
+                        container, agent_config.project_name, strike=agent_config.strike, notes=notes
+                    )
+                    agent_config.add_link(agent.key, agent.id, profile).write(directory)
+                else:
+                    agent = client.create_strike_agent_version(str(agent_config.active_link.id), container, notes)
+
+                print(f":white_check_mark: {relative} pushed as [bold]{agent.key}[/] revision {agent.revision}")
+                rows[directory] = (
+                    agent.key,
+                    relative,
+                    f"{build_time:.1f}s",
+                    f"{push_time:.1f}s",
+                    f"[dim]{image}[/]",
+                    str(agent.revision),
+                )
+            except Exception as e:
+                failed += 1
+                print(f":exclamation: {relative} failed: {e}")
+                rows[directory] = (agent_config.project_name, relative, "-", "-", f"[red]{e}[/]", "-")
+
+    for directory in directories:
+        table.add_row(*rows[directory])
+
+    print()
+    print(table)
+
+    if failed:
+        raise Exception(f"{failed} of {len(directories)} agents failed to push")
+
+    print()
+    print(":tada: Agents pushed. use [bold]dreadnode agent deploy[/] to start new runs.")
+
+
+@cli.command(help="Check the agent Dockerfile for patterns that slow down rebuilds")
+@pretty_cli
+def lint_build(
+    directory: t.Annotated[
+        pathlib.Path,
+        typer.Option("--dir", "-d", help="The agent directory", file_okay=False, resolve_path=True),
+    ] = pathlib.Path("."),
+    template: t.Annotated[
+        str | None, typer.Option("--template", "-t", help="Check an installed template instead of a directory")
+    ] = None,
+) -> None:
+    if template is not None:
+        template_manager = TemplateManager()
+        if template not in template_manager.templates:
+            raise Exception(
+                f"Template '{template}' not found, use [bold]dreadnode agent templates show[/] to list them"
+            )
+        directory = template_manager.templates[template].path
+
+    findings = lint_dockerfile(directory)
+    if not findings:
+        print(":white_check_mark: No issues found")
+        return
+
+    print(format_findings(findings))
+
+
 def prepare_run_context(
     env_vars: list[str] | None, parameters: list[str] | None, command: str | None
 ) -> Client.StrikeRunContext | None:
@@ -385,14 +672,14 @@ def deploy(
     group: t.Annotated[str | None, typer.Option("--group", "-g", help="Group to associate this run with")] = None,
 ) -> None:
     agent_config = AgentConfig.read(directory)
-    ensure_profile(agent_config)
-
     user_config = UserConfig.read()
+    ensure_profile(agent_config, user_config=user_config)
+
     server_config = user_config.get_server_config()
 
     active_link = agent_config.active_link
 
-    client = api.create_client()
+    client = api.create_client(user_config=user_config)
     agent = client.get_strike_agent(active_link.id)
 
     strike = strike or agent_config.strike
@@ -498,9 +785,9 @@ def latest(
     raw: t.Annotated[bool, typer.Option("--raw", help="Show raw JSON output")] = False,
 ) -> None:
     agent_config = AgentConfig.read(directory)
-    ensure_profile(agent_config)
-
     user_config = UserConfig.read()
+    ensure_profile(agent_config, user_config=user_config)
+
     server_config = user_config.get_server_config()
 
     active_link = agent_config.active_link
@@ -508,7 +795,7 @@ def latest(
         print(":exclamation: No runs yet, use [bold]dreadnode agent deploy[/]")
         return
 
-    client = api.create_client()
+    client = api.create_client(user_config=user_config)
     run = client.get_strike_run(str(active_link.runs[-1]))
 
     if raw:
@@ -619,7 +906,7 @@ def links(
     for key, link in agent_config.links.items():
         active_link = key == agent_config.active
         mismatched_profile = active_link and user_config.active_profile_name != link.profile
-        client = api.create_client(profile=agent_config.links[key].profile)
+        client = api.create_client(profile=agent_config.links[key].profile, user_config=user_config)
         agent = client.get_strike_agent(link.id)
         table.add_row(
             agent.key + ("*" if active_link else ""),
@@ -680,21 +967,16 @@ def clone(
         print()
         shutil.rmtree(target)
 
-    # Check if the repo is accessible
-    if github_repo.exists:
-        temp_dir = download_and_unzip_archive(github_repo.zip_url)
-
-    # This could be a private repo that the user can access
-    # by getting an access token from our API
-    elif github_repo.namespace == "dreadnode":
-        github_access_token = api.create_client().get_github_access_token([github_repo.repo])
+    # private repositories need an access token and can only be downloaded through the API
+    headers = get_github_headers(github_repo)
+    if headers:
         print(":key: Accessed private repository")
-        temp_dir = download_and_unzip_archive(
-            github_repo.api_zip_url, headers={"Authorization": f"Bearer {github_access_token.token}"}
-        )
 
-    else:
-        raise Exception(f"Repository '{github_repo}' not found or inaccessible")
+    temp_dir = fetch_archive(
+        github_repo.api_tar_url if headers else github_repo.tar_url,
+        headers=headers,
+        commit=github_repo.resolve_commit(headers=headers),
+    )
 
     # We assume the repo download results in a single
     # child folder which is the real target
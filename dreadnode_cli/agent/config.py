@@ -2,7 +2,8 @@ import pathlib
 from uuid import UUID
 
 import pydantic
-from ruamel.yaml import YAML
+
+from dreadnode_cli.config import read_config_file, write_config_file
 
 AGENT_CONFIG_FILENAME = ".dreadnode.yaml"
 
@@ -31,17 +32,14 @@ class AgentConfig(pydantic.BaseModel):
 
     @classmethod
     def read(cls, directory: pathlib.Path = pathlib.Path(".")) -> "AgentConfig":
-        path = directory / AGENT_CONFIG_FILENAME
-        if not path.exists():
+        config = read_config_file(cls, directory / AGENT_CONFIG_FILENAME)
+        if config is None:
             raise Exception(f"{directory} is not initialized, use [bold]dreadnode agent init[/]")
-
-        with path.open("r") as f:
-            return cls.model_validate(YAML().load(f))
+        return config
 
     def write(self, directory: pathlib.Path = pathlib.Path(".")) -> None:
         self._update_active()
-        with (directory / AGENT_CONFIG_FILENAME).open("w") as f:
-            YAML().dump(self.model_dump(mode="json"), f)
+        write_config_file(self, directory / AGENT_CONFIG_FILENAME)
 
     def add_link(self, key: str, id: UUID, profile: str) -> "AgentConfig":
         if key not in self.links:
@@ -59,3 +57,9 @@ class AgentConfig(pydantic.BaseModel):
     def add_run(self, id: UUID) -> "AgentConfig":
         self.active_link.runs.append(id)
         return self
+
+
+def find_agent_directories(root: pathlib.Path) -> list[pathlib.Path]:
+    """Return every directory under root that contains an agent config, sorted by path."""
+
+    return sorted(path.parent for path in root.rglob(AGENT_CONFIG_FILENAME) if path.is_file())
@@ -1,16 +1,28 @@
+import hashlib
+import hmac
 import pathlib
 import re
+import secrets
+import sys
+import threading
+import time
 import typing as t
 
 import docker  # type: ignore
 from docker.models.images import Image  # type: ignore
-from rich import print
+from pydantic import BaseModel
+from rich import box, filesize, print
 from rich.live import Live
+from rich.table import Table
 from rich.text import Text
 
 from dreadnode_cli.config import ServerConfig
 from dreadnode_cli.defaults import (
+    DOCKER_LOCAL_REGISTRY_CACHE_PATH,
+    DOCKER_LOGIN_CACHE_PATH,
+    DOCKER_LOGIN_TTL,
     DOCKER_REGISTRY_IMAGE_TAG,
+    DOCKER_REGISTRY_LOCAL,
     DOCKER_REGISTRY_LOCAL_PORT,
     DOCKER_REGISTRY_SUBDOMAIN,
     PLATFORM_BASE_DOMAIN,
@@ -21,19 +33,125 @@ try:
 except docker.errors.DockerException:
     client = None
 
+# registry -> credentials of the last login, sent along with every push to that registry
+_credentials: dict[str, dict[str, str]] = {}
+_login_lock = threading.Lock()
+
+
+class RegistryUnauthorizedError(Exception):
+    """The registry rejected the credentials used for a push."""
+
+
+class RegistryLogin(BaseModel):
+    # random per login, so the credentials can't be looked up or compared across caches
+    salt: str
+    credential_hash: str
+    expires_at: float
+
+
+class RegistryLoginCache(BaseModel):
+    """Successful registry logins, keyed by username and registry, so they can be skipped while still valid."""
+
+    logins: dict[str, RegistryLogin] = {}
+
+    @staticmethod
+    def _key(registry: str, username: str) -> str:
+        return f"{username}@{registry}"
+
+    @staticmethod
+    def _hash(salt: str, username: str, password: str) -> str:
+        return hmac.new(salt.encode(), f"{username}:{password}".encode(), hashlib.sha256).hexdigest()
+
+    @classmethod
+    def read(cls) -> "RegistryLoginCache":
+        """Read the cache from the file system or return an empty instance if missing or unreadable."""
+
+        try:
+            return cls.model_validate_json(DOCKER_LOGIN_CACHE_PATH.read_text())
+        except Exception:
+            return cls()
+
+    def write(self) -> None:
+        """Write the cache to the file system, only readable by the user, dropping expired entries."""
+
+        now = time.time()
+        self.logins = {key: login for key, login in self.logins.items() if login.expires_at > now}
+
+        DOCKER_LOGIN_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        DOCKER_LOGIN_CACHE_PATH.touch(mode=0o600)
+        DOCKER_LOGIN_CACHE_PATH.chmod(0o600)
+        DOCKER_LOGIN_CACHE_PATH.write_text(self.model_dump_json())
+
+    def is_valid(self, registry: str, username: str, password: str) -> bool:
+        login = self.logins.get(self._key(registry, username))
+        return (
+            login is not None
+            and login.expires_at > time.time()
+            and hmac.compare_digest(login.credential_hash, self._hash(login.salt, username, password))
+        )
+
+    def add(self, registry: str, username: str, password: str, ttl: int = DOCKER_LOGIN_TTL) -> "RegistryLoginCache":
+        salt = secrets.token_hex(16)
+        self.logins[self._key(registry, username)] = RegistryLogin(
+            salt=salt, credential_hash=self._hash(salt, username, password), expires_at=time.time() + ttl
+        )
+        return self
+
+    def remove(self, registry: str, username: str) -> "RegistryLoginCache":
+        self.logins.pop(self._key(registry, username), None)
+        return self
+
+
+class LocalRegistryCache(BaseModel):
+    """The last local registry container found, reused for as long as that container is running."""
+
+    container_id: str
+    port: int
+
+    @classmethod
+    def read(cls) -> "LocalRegistryCache | None":
+        try:
+            return cls.model_validate_json(DOCKER_LOCAL_REGISTRY_CACHE_PATH.read_text())
+        except Exception:
+            return None
+
+    def write(self) -> None:
+        DOCKER_LOCAL_REGISTRY_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        DOCKER_LOCAL_REGISTRY_CACHE_PATH.write_text(self.model_dump_json())
+
+
+def _get_cached_local_registry_port() -> int | None:
+    if client is None or (cached := LocalRegistryCache.read()) is None:
+        return None
+
+    try:
+        attrs = client.api.inspect_container(cached.container_id)
+    except docker.errors.APIError:
+        attrs = {}
+
+    if attrs.get("State", {}).get("Running"):
+        for port_bindings in (attrs["NetworkSettings"]["Ports"] or {}).values():
+            for binding in port_bindings or []:
+                return int(binding["HostPort"])
+
+    # the container is gone, stopped or can't be inspected, so it's discovered again
+    DOCKER_LOCAL_REGISTRY_CACHE_PATH.unlink(missing_ok=True)
+    return None
+
 
 def get_local_registry_port() -> int:
     if client is None:
         raise Exception("Docker not available")
 
-    for container in client.containers.list():
-        if DOCKER_REGISTRY_IMAGE_TAG in container.image.tags:
-            ports = container.attrs["NetworkSettings"]["Ports"]
-            assert len(ports) == 1
-            for _container_port, port_bindings in ports.items():
-                if port_bindings:
-                    for binding in port_bindings:
-                        return int(binding["HostPort"])
+    if (port := _get_cached_local_registry_port()) is not None:
+        return port
+
+    # let the daemon filter containers instead of inspecting every one of them
+    for container in client.api.containers(filters={"ancestor": DOCKER_REGISTRY_IMAGE_TAG, "status": "running"}):
+        for binding in container.get("Ports") or []:
+            if public_port := binding.get("PublicPort"):
+                LocalRegistryCache(container_id=container["Id"], port=int(public_port)).write()
+                return int(public_port)
 
     # fallback to the default port if we can't find the running container
     return DOCKER_REGISTRY_LOCAL_PORT
@@ -46,6 +164,8 @@ def get_registry(config: ServerConfig) -> str:
 
     # localhost is a special case
     if "localhost" in config.url or "127.0.0.1" in config.url:
+        if DOCKER_REGISTRY_LOCAL:
+            return f"localhost:{DOCKER_REGISTRY_LOCAL}" if DOCKER_REGISTRY_LOCAL.isdigit() else DOCKER_REGISTRY_LOCAL
         return f"localhost:{get_local_registry_port()}"
 
     prefix = ""
@@ -57,11 +177,29 @@ def get_registry(config: ServerConfig) -> str:
     return f"{prefix}{DOCKER_REGISTRY_SUBDOMAIN}.{PLATFORM_BASE_DOMAIN}"
 
 
-def login(registry: str, username: str, password: str) -> None:
+def login(registry: str, username: str, password: str, *, force: bool = False) -> None:
+    """
+    Authenticate with the registry, skipping the round trip if a login with the same credentials is still cached.
+    """
+
     if client is None:
         raise Exception("Docker not available")
 
-    client.api.login(username=username, password=password, registry=registry)
+    with _login_lock:
+        _credentials[registry] = {"username": username, "password": password}
+
+        cache = RegistryLoginCache.read()
+        if not force and DOCKER_LOGIN_TTL > 0 and cache.is_valid(registry, username, password):
+            return
+
+        try:
+            client.api.login(username=username, password=password, registry=registry, reauth=force)
+        except Exception:
+            cache.remove(registry, username).write()
+            raise
+
+        if DOCKER_LOGIN_TTL > 0:
+            cache.add(registry, username, password).write()
 
 
 def sanitized_name(name: str) -> str:
@@ -81,21 +219,127 @@ def sanitized_name(name: str) -> str:
     return name
 
 
-def build(directory: str | pathlib.Path, *, force_rebuild: bool = False) -> Image:
+BUILD_STEP_PATTERN = re.compile(r"^Step (\d+)/(\d+) : (.+)$")
+
+# how often buffered build output is written to the terminal
+BUILD_OUTPUT_FLUSH_INTERVAL = 0.1
+
+BuildOutput = t.Literal["full", "steps", "none"]
+
+
+class BuildStep(BaseModel):
+    number: int
+    instruction: str
+    cached: bool = False
+    duration: float = 0.0
+
+
+class BuildProfile:
+    """Tracks the Dockerfile steps of a build, whether they were cached and how long they took."""
+
+    def __init__(self) -> None:
+        self.steps: list[BuildStep] = []
+        self._step_started_at: float | None = None
+
+    def add_line(self, line: str) -> BuildStep | None:
+        """Process a line of build output, returning the new step if the line starts one."""
+
+        if match := BUILD_STEP_PATTERN.match(line):
+            now = time.monotonic()
+            self.finish(now)
+            step = BuildStep(number=int(match.group(1)), instruction=match.group(3).strip())
+            self.steps.append(step)
+            self._step_started_at = now
+            return step
+
+        if self.steps and line.strip() == "---> Using cache":
+            self.steps[-1].cached = True
+
+        return None
+
+    def finish(self, now: float | None = None) -> None:
+        """Close the running step, if any."""
+
+        if self.steps and self._step_started_at is not None:
+            self.steps[-1].duration = (now or time.monotonic()) - self._step_started_at
+            self._step_started_at = None
+
+    def slowest(self, count: int = 3) -> list[BuildStep]:
+        """Return the slowest executed (not cached) steps."""
+
+        return sorted((step for step in self.steps if not step.cached), key=lambda s: s.duration, reverse=True)[:count]
+
+    def render(self) -> Table:
+        slowest = {step.number for step in self.slowest()}
+        cached = sum(1 for step in self.steps if step.cached)
+
+        table = Table(box=box.ROUNDED, caption=f"{cached}/{len(self.steps)} steps cached")
+        table.add_column("step", justify="right")
+        table.add_column("instruction")
+        table.add_column("cache")
+        table.add_column("time", justify="right")
+
+        for step in self.steps:
+            table.add_row(
+                str(step.number),
+                Text(step.instruction if len(step.instruction) <= 60 else step.instruction[:57] + "..."),
+                Text("cached", style="green") if step.cached else Text("executed", style="yellow"),
+                Text(f"{step.duration:.1f}s", style="bold red" if step.number in slowest else ""),
+            )
+
+        return table
+
+
+def build(
+    directory: str | pathlib.Path,
+    *,
+    force_rebuild: bool = False,
+    output: BuildOutput = "full",
+    profile: BuildProfile | None = None,
+) -> Image:
+    """
+    Build the image in the given directory, writing the build output as requested (everything, only step
+    headers or nothing) and recording step timings into the profile, if given.
+    """
+
     if client is None:
         raise Exception("Docker not available")
 
+    profile = profile or BuildProfile()
+
+    # build output is written as plain text in batches rather than printing every line through rich
+    buffer: list[str] = []
+    flushed_at = time.monotonic()
+
+    def flush() -> None:
+        nonlocal flushed_at
+        if buffer:
+            sys.stdout.write("".join(buffer))
+            sys.stdout.flush()
+            buffer.clear()
+        flushed_at = time.monotonic()
+
     id: str | None = None
-    for item in client.api.build(
-        path=str(directory), platform="linux/amd64", decode=True, nocache=force_rebuild, pull=force_rebuild
-    ):
-        if "error" in item:
-            print()
-            raise Exception(item["error"])
-        elif "stream" in item:
-            print("[dim]" + item["stream"].strip() + "[/]")
-        elif "aux" in item:
-            id = item["aux"].get("ID")
+    try:
+        for item in client.api.build(
+            path=str(directory), platform="linux/amd64", decode=True, nocache=force_rebuild, pull=force_rebuild
+        ):
+            if "error" in item:
+                flush()
+                print()
+                raise Exception(item["error"])
+            elif "stream" in item:
+                for line in item["stream"].splitlines(keepends=True):
+                    step = profile.add_line(line)
+                    if output == "full" or (output == "steps" and step is not None):
+                        buffer.append(line)
+                    if step is not None or time.monotonic() - flushed_at >= BUILD_OUTPUT_FLUSH_INTERVAL:
+                        flush()
+            elif "aux" in item:
+                id = item["aux"].get("ID")
+    finally:
+        profile.finish()
+        flush()
 
     if id is None:
         raise Exception("Failed to build image")
@@ -104,21 +348,72 @@ def build(directory: str | pathlib.Path, *, force_rebuild: bool = False) -> Imag
 
 
 class DockerPushDisplay:
+    """Tracks docker push progress events and renders them as a live display."""
+
     def __init__(self) -> None:
         self.lines: list[str | dict[str, t.Any]] = []
+        # layer id -> line, to update layers in place
+        self.layers: dict[str, dict[str, t.Any]] = {}
+        # layer id -> (current, total) bytes, kept in sync with the aggregates below
+        self.progress: dict[str, tuple[int, int]] = {}
+        self.current_bytes = 0
+        self.total_bytes = 0
+        self.started_at = time.monotonic()
+
+        self._lock = threading.Lock()
+        self._rendered: Text | None = None
+
+    def _update_progress(self, layer_id: str, current: int, total: int) -> None:
+        old_current, old_total = self.progress.get(layer_id, (0, 0))
+        self.progress[layer_id] = (current, total)
+        self.current_bytes += current - old_current
+        self.total_bytes += total - old_total
 
     def add_event(self, event: dict[str, t.Any]) -> None:
-        if "id" in event:
-            if matching_line := next(
-                (line for line in self.lines if isinstance(line, dict) and line["id"] == event["id"]), None
-            ):
-                matching_line.update(event)
-            else:
-                self.lines.append(event)
-        elif "status" in event:
-            self.lines.append(event["status"])
+        with self._lock:
+            self._rendered = None
+
+            if "id" in event:
+                layer_id = event["id"]
+                if (line := self.layers.get(layer_id)) is not None:
+                    line.update(event)
+                else:
+                    line = self.layers[layer_id] = event
+                    self.lines.append(line)
+
+                detail = event.get("progressDetail") or {}
+                total = detail.get("total", 0)
+                if total > 0:
+                    # (ENG-280) sometimes docker returns not entirely synced current vs totals
+                    self._update_progress(layer_id, min(detail.get("current", 0), total), total)
+                elif event.get("status") == "Pushed" and layer_id in self.progress:
+                    _, total = self.progress[layer_id]
+                    self._update_progress(layer_id, total, total)
+
+            elif "status" in event:
+                self.lines.append(event["status"])
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.current_bytes / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        """Estimated seconds until all known layers are pushed, or None if unknown."""
+
+        rate = self.bytes_per_second
+        if rate <= 0:
+            return None
+        return max(self.total_bytes - self.current_bytes, 0) / rate
 
     def render(self) -> Text:
+        with self._lock:
+            if self._rendered is None:
+                self._rendered = self._render()
+            return self._rendered
+
+    def _render(self) -> Text:
         output = Text(style="dim")
 
         for line in self.lines:
@@ -142,31 +437,82 @@ class DockerPushDisplay:
 
             # Add progress if available
             if "progressDetail" in line and line["progressDetail"]:
-                current = line["progressDetail"].get("current", 0)
-                total = line["progressDetail"].get("total", 0)
+                current, total = self.progress.get(line["id"], (0, 0))
                 if total > 0:
-                    # (ENG-280) sometimes docker returns not entirely synced current vs totals
-                    percentage = min((current / total) * 100, 100.0)
-                    output.append(f" {percentage:.1f}%", style="cyan")
+                    output.append(f" {current / total * 100:.1f}%", style="cyan")
+
+            output.append("\n")
 
+        if self.total_bytes > 0:
+            eta = self.eta
+            output.append(
+                f"{filesize.decimal(self.current_bytes)} / {filesize.decimal(self.total_bytes)} "
+                f"at {filesize.decimal(int(self.bytes_per_second))}/s",
+                style="bold",
+            )
+            if eta is not None:
+                output.append(f", ETA {int(eta) // 60}m{int(eta) % 60:02d}s", style="bold")
             output.append("\n")
 
         return output
 
 
-def push(image: Image, repository: str, tag: str) -> None:
+def _is_unauthorized(message: str) -> bool:
+    message = message.lower()
+    return "unauthorized" in message or "authentication required" in message
+
+
+def _push_events(repository: str, tag: str) -> t.Iterator[dict[str, t.Any]]:
     if client is None:
         raise Exception("Docker not available")
 
-    image.tag(repository, tag=tag)
+    auth_config = _credentials.get(repository.split("/", 1)[0])
 
-    display = DockerPushDisplay()
+    try:
+        events = client.api.push(repository, tag=tag, stream=True, decode=True, auth_config=auth_config)
+    except docker.errors.APIError as e:
+        if e.status_code == 401:
+            raise RegistryUnauthorizedError(str(e)) from e
+        raise
+
+    for event in events:
+        if "error" in event:
+            if _is_unauthorized(event["error"]):
+                raise RegistryUnauthorizedError(event["error"])
+            raise Exception(event["error"])
 
-    with Live(Text(), refresh_per_second=10) as live:
-        for event in client.api.push(repository, tag=tag, stream=True, decode=True):
-            if "error" in event:
-                live.stop()
-                raise Exception(event["error"])
+        yield event
 
+
+def _push(repository: str, tag: str, *, quiet: bool) -> None:
+    if quiet:
+        for _ in _push_events(repository, tag):
+            pass
+        return
+
+    display = DockerPushDisplay()
+
+    # the live display pulls a fresh render on each refresh tick, events only update the display state
+    with Live(get_renderable=display.render, refresh_per_second=10):
+        for event in _push_events(repository, tag):
             display.add_event(event)
-            live.update(display.render())
+
+
+def push(image: Image, repository: str, tag: str, *, quiet: bool = False) -> None:
+    if client is None:
+        raise Exception("Docker not available")
+
+    image.tag(repository, tag=tag)
+
+    try:
+        _push(repository, tag, quiet=quiet)
+    except RegistryUnauthorizedError:
+        registry = repository.split("/", 1)[0]
+        credentials = _credentials.get(registry)
+        if credentials is None:
+            raise
+
+        # the cached login is no longer accepted by the registry, authenticate again and retry once
+        print(f":key: Re-authenticating with [bold]{registry}[/] ...")
+        login(registry, credentials["username"], credentials["password"], force=True)
+        _push(repository, tag, quiet=quiet)
@@ -0,0 +1,284 @@
+import fnmatch
+import os
+import pathlib
+import re
+import typing as t
+
+from jinja2 import ChainableUndefined, Environment, FileSystemLoader
+from pydantic import BaseModel
+
+# paths that are almost never needed inside an agent image
+HEAVY_PATHS = {".git", "node_modules", ".venv", "venv", "__pycache__", ".mypy_cache", ".pytest_cache", ".ruff_cache"}
+# paths bigger than this are reported when they are not excluded from the build context
+LARGE_PATH_THRESHOLD = 10 * 1024 * 1024
+# rough rate at which the build context is sent to the daemon, in bytes per second
+CONTEXT_TRANSFER_RATE = 50 * 1024 * 1024
+# rough time it takes to pull a base image, in seconds
+BASE_IMAGE_PULL_TIME = 20.0
+# rough extra time a single stage image with a build toolchain adds to every rebuild and push, in seconds
+TOOLCHAIN_OVERHEAD_TIME = 20.0
+
+# rough time spent in dependency install commands, in seconds
+DEPENDENCY_INSTALL_TIMES: dict[str, float] = {
+    "pip install": 60.0,
+    "pip3 install": 60.0,
+    "poetry install": 60.0,
+    "uv sync": 30.0,
+    "uv pip install": 30.0,
+    "npm install": 60.0,
+    "npm ci": 60.0,
+    "yarn install": 60.0,
+    "go mod download": 30.0,
+    "cargo build": 120.0,
+    "apt-get install": 30.0,
+    "apk add": 15.0,
+}
+
+TOOLCHAIN_PACKAGES = re.compile(r"\b(build-essential|gcc|g\+\+|clang|make|cmake|rustc|cargo|golang|\S+-dev)\b")
+DIGEST_PATTERN = re.compile(r"@sha256:[0-9a-f]{64}$")
+
+
+class Instruction(BaseModel):
+    line: int
+    command: str
+    arguments: str
+
+
+class Finding(BaseModel):
+    rule: t.Literal["cache-order", "dockerignore", "unpinned-base", "multi-stage"]
+    line: int | None
+    message: str
+    # estimated seconds saved on each rebuild if the finding is addressed
+    saved: float
+
+
+def parse_dockerfile(content: str) -> list[Instruction]:
+    """Parse a Dockerfile into instructions, joining continuation lines and skipping comments."""
+
+    instructions: list[Instruction] = []
+    pending: list[str] = []
+    start = 0
+
+    for number, raw in enumerate(content.splitlines(), start=1):
+        line = raw.strip()
+        if not pending and (not line or line.startswith("#")):
+            continue
+
+        if not pending:
+            start = number
+        elif line.startswith("#"):
+            continue
+
+        if line.endswith("\\"):
+            pending.append(line[:-1].strip())
+            continue
+
+        pending.append(line)
+        command, _, arguments = " ".join(part for part in pending if part).partition(" ")
+        instructions.append(Instruction(line=start, command=command.upper(), arguments=arguments.strip()))
+        pending = []
+
+    return instructions
+
+
+def render_dockerfile(directory: pathlib.Path, context: dict[str, t.Any] | None = None) -> str:
+    """Return the Dockerfile of a directory, rendering Dockerfile.j2 with whatever context is available."""
+
+    if (directory / "Dockerfile").exists():
+        return (directory / "Dockerfile").read_text()
+
+    if (directory / "Dockerfile.j2").exists():
+        env = Environment(loader=FileSystemLoader(directory), undefined=ChainableUndefined)
+        return env.get_template("Dockerfile.j2").render(context or {})
+
+    raise Exception(f"Directory {directory} does not contain a Dockerfile")
+
+
+def read_dockerignore(directory: pathlib.Path) -> list[str]:
+    path = directory / ".dockerignore"
+    if not path.exists():
+        return []
+
+    return [
+        line.strip().strip("/")
+        for line in path.read_text().splitlines()
+        if line.strip() and not line.strip().startswith("#")
+    ]
+
+
+def is_ignored(path: str, patterns: list[str]) -> bool:
+    """Check a context relative path against .dockerignore patterns, the last matching pattern wins."""
+
+    ignored = False
+    for pattern in patterns:
+        negated = pattern.startswith("!")
+        pattern = pattern.removeprefix("!").strip("/")
+        if (
+            fnmatch.fnmatch(path, pattern)
+            or fnmatch.fnmatch(path, f"**/{pattern}")
+            or path.startswith(f"{pattern}/")
+            or (pattern.startswith("**/") and fnmatch.fnmatch(path, pattern[3:]))
+        ):
+            ignored = not negated
+    return ignored
+
+
+def _path_size(path: pathlib.Path) -> int:
+    if not path.is_dir():
+        return path.stat().st_size if path.exists() else 0
+
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _install_time(arguments: str) -> float:
+    return max((time for command, time in DEPENDENCY_INSTALL_TIMES.items() if command in arguments), default=0.0)
+
+
+def _is_broad_copy(instruction: Instruction) -> bool:
+    if instruction.command not in ("COPY", "ADD"):
+        return False
+
+    sources = [arg for arg in instruction.arguments.split() if not arg.startswith("--")][:-1]
+    return any(source in (".", "./", "*") for source in sources)
+
+
+def _lint_cache_order(instructions: list[Instruction]) -> list[Finding]:
+    findings: list[Finding] = []
+    broad_copy: Instruction | None = None
+
+    for instruction in instructions:
+        if instruction.command == "FROM":
+            broad_copy = None
+        elif _is_broad_copy(instruction):
+            broad_copy = broad_copy or instruction
+        elif broad_copy and instruction.command == "RUN" and (saved := _install_time(instruction.arguments)):
+            findings.append(
+                Finding(
+                    rule="cache-order",
+                    line=instruction.line,
+                    message=(
+                        f"Dependencies are installed after the whole source is copied (line {broad_copy.line}), "
+                        "any code change re-runs this step. Copy only the dependency manifests first, "
+                        "install, then copy the rest."
+                    ),
+                    saved=saved,
+                )
+            )
+
+    return findings
+
+
+def _lint_base_images(instructions: list[Instruction]) -> list[Finding]:
+    findings: list[Finding] = []
+    stages: set[str] = set()
+
+    for instruction in instructions:
+        if instruction.command != "FROM":
+            continue
+
+        parts = [arg for arg in instruction.arguments.split() if not arg.startswith("--")]
+        image = parts[0] if parts else ""
+        if len(parts) >= 3 and parts[1].lower() == "as":
+            stages.add(parts[2].lower())
+
+        # references to earlier stages, scratch and templated (or unrendered) values are fine
+        if not image or image.lower() in stages or image == "scratch" or "$" in image:
+            continue
+
+        if DIGEST_PATTERN.search(image):
+            continue
+
+        name = image.rsplit("/", 1)[-1]
+        tag = name.split(":", 1)[1] if ":" in name else None
+        if tag is None or tag == "latest":
+            findings.append(
+                Finding(
+                    rule="unpinned-base",
+                    line=instruction.line,
+                    message=(
+                        f"Base image '{image}' is not pinned to a version, so --rebuild always pulls it and "
+                        "invalidates every following layer. Pin a version tag or a digest."
+                    ),
+                    saved=BASE_IMAGE_PULL_TIME,
+                )
+            )
+
+    return findings
+
+
+def _lint_multi_stage(instructions: list[Instruction]) -> list[Finding]:
+    if sum(1 for instruction in instructions if instruction.command == "FROM") > 1:
+        return []
+
+    for instruction in instructions:
+        if instruction.command == "RUN" and TOOLCHAIN_PACKAGES.search(instruction.arguments):
+            return [
+                Finding(
+                    rule="multi-stage",
+                    line=instruction.line,
+                    message=(
+                        "A build toolchain is installed into the final image. Build in a separate stage and "
+                        "copy only the results to keep the image smaller and faster to push."
+                    ),
+                    saved=TOOLCHAIN_OVERHEAD_TIME,
+                )
+            ]
+
+    return []
+
+
+def _lint_dockerignore(directory: pathlib.Path) -> list[Finding]:
+    findings: list[Finding] = []
+    patterns = read_dockerignore(directory)
+
+    for path in sorted(directory.iterdir()):
+        name = path.name
+        if is_ignored(name, patterns) or name in ("Dockerfile", "Dockerfile.j2", ".dockerignore"):
+            continue
+
+        size = _path_size(path)
+        if name not in HEAVY_PATHS and size < LARGE_PATH_THRESHOLD:
+            continue
+
+        findings.append(
+            Finding(
+                rule="dockerignore",
+                line=None,
+                message=(
+                    f"'{name}' ({size / (1024 * 1024):.1f} MB) is sent with the build context on every build, "
+                    "add it to .dockerignore."
+                ),
+                saved=size / CONTEXT_TRANSFER_RATE,
+            )
+        )
+
+    return findings
+
+
+def lint_dockerfile(
+    directory: pathlib.Path, *, context: dict[str, t.Any] | None = None, check_context: bool = True
+) -> list[Finding]:
+    """
+    Check the Dockerfile (or Dockerfile.j2) in a directory for patterns that slow down rebuilds.
+    The build context itself is checked for large paths missing from .dockerignore when check_context is set.
+    """
+
+    instructions = parse_dockerfile(render_dockerfile(directory, context))
+
+    findings = [
+        *_lint_cache_order(instructions),
+        *_lint_base_images(instructions),
+        *_lint_multi_stage(instructions),
+    ]
+
+    if check_context:
+        findings.extend(_lint_dockerignore(directory))
+
+    return findings
@@ -1,7 +1,7 @@
 import typing as t
 from datetime import datetime
 
-from rich import box
+from rich import box, filesize
 from rich.console import Group, RenderableType
 from rich.panel import Panel
 from rich.pretty import Pretty
@@ -9,6 +9,8 @@ from rich.table import Table
 from rich.text import Text
 
 from dreadnode_cli import api
+from dreadnode_cli.agent.dockerfile import Finding
+from dreadnode_cli.agent.registry import PushPlan
 
 P = t.ParamSpec("P")
 
@@ -356,3 +358,52 @@ def format_run_groups(groups: list[api.Client.StrikeRunGroupResponse]) -> Render
         )
 
     return table
+
+
+def format_push_plan(plan: PushPlan) -> RenderableType:
+    table = Table(box=box.ROUNDED)
+    table.add_column("layer")
+    table.add_column("status")
+    table.add_column("size", justify="right")
+    table.add_column("source")
+
+    styles = {"exists": "green", "mountable": "cyan", "new": "yellow"}
+
+    for layer in plan.layers:
+        table.add_row(
+            f"[dim]{layer.diff_id.removeprefix('sha256:')[:12]}[/]",
+            Text(layer.status, style=styles[layer.status]),
+            filesize.decimal(layer.size) if layer.size is not None else "?",
+            layer.source or "-",
+        )
+
+    summary = Table(show_header=False, box=box.ROUNDED)
+    summary.add_column("Status", justify="right")
+    summary.add_column("Layers", justify="right")
+    summary.add_column("Bytes", justify="right")
+
+    for status, label in [("exists", "already pushed"), ("mountable", "mountable"), ("new", "to upload")]:
+        summary.add_row(
+            Text(label, style=styles[status]), str(plan.count(status)), filesize.decimal(plan.bytes(status))
+        )
+
+    return Group(table, summary)
+
+
+def format_findings(findings: list[Finding]) -> RenderableType:
+    table = Table(box=box.ROUNDED)
+    table.add_column("line", justify="right")
+    table.add_column("rule")
+    table.add_column("finding")
+    table.add_column("saves", justify="right")
+
+    for finding in sorted(findings, key=lambda f: -f.saved):
+        table.add_row(
+            str(finding.line) if finding.line is not None else "-",
+            Text(finding.rule, style="yellow"),
+            finding.message,
+            f"~{finding.saved:.0f}s",
+        )
+
+    table.caption = f"~{sum(f.saved for f in findings):.0f}s estimated savings per rebuild"
+    return table
@@ -0,0 +1,223 @@
+import re
+import typing as t
+
+import httpx
+from pydantic import BaseModel
+
+from dreadnode_cli import __version__
+
+# manifest media types we can read layers from, and the index types pointing to them
+MANIFEST_MEDIA_TYPES = [
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+]
+INDEX_MEDIA_TYPES = [
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+]
+
+# how many tags of each repository are inspected to map local layers to registry blobs, recent ones first
+MAX_TAGS_PER_REPOSITORY = 10
+
+_CHALLENGE_PARAM_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+
+
+class RegistryClient:
+    """Minimal client for the Docker Registry HTTP API V2, supporting basic and token authentication."""
+
+    def __init__(self, registry: str, username: str, password: str, *, client: httpx.Client | None = None):
+        scheme = "http" if registry.startswith(("localhost", "127.0.0.1")) else "https"
+        self._auth = (username, password)
+        self._tokens: dict[str, str] = {}
+        self._client = client or httpx.Client(
+            base_url=f"{scheme}://{registry}",
+            headers={"User-Agent": f"dreadnode-cli/{__version__}"},
+            timeout=30,
+        )
+
+    def _authenticate(self, challenge: str, scope: str) -> httpx.Auth | str | None:
+        """Resolve a WWW-Authenticate challenge into either basic auth or a bearer token."""
+
+        scheme, _, params = challenge.partition(" ")
+        if scheme.lower() == "basic":
+            return httpx.BasicAuth(*self._auth)
+
+        if scheme.lower() != "bearer":
+            return None
+
+        args = dict(_CHALLENGE_PARAM_PATTERN.findall(params))
+        if "realm" not in args:
+            return None
+
+        response = self._client.get(
+            args["realm"],
+            params={"service": args.get("service", ""), "scope": args.get("scope", scope)},
+            auth=self._auth,
+        )
+        response.raise_for_status()
+
+        data = response.json()
+        token = data.get("token") or data.get("access_token")
+        if token:
+            self._tokens[scope] = token
+        return t.cast(str | None, token)
+
+    def _request(
+        self, method: str, repository: str, path: str, *, headers: dict[str, str] | None = None
+    ) -> httpx.Response:
+        scope = f"repository:{repository}:pull"
+        url = f"/v2/{repository}/{path}"
+        headers = dict(headers or {})
+
+        if token := self._tokens.get(scope):
+            headers["Authorization"] = f"Bearer {token}"
+
+        response = self._client.request(method, url, headers=headers)
+        if response.status_code != 401:
+            return response
+
+        auth = self._authenticate(response.headers.get("WWW-Authenticate", ""), scope)
+        if isinstance(auth, str):
+            headers["Authorization"] = f"Bearer {auth}"
+            return self._client.request(method, url, headers=headers)
+        elif auth is not None:
+            return self._client.request(method, url, headers=headers, auth=auth)
+
+        return response
+
+    def get_blob_size(self, repository: str, digest: str) -> int | None:
+        """Return the size of a blob if it exists in the repository, None otherwise."""
+
+        response = self._request("HEAD", repository, f"blobs/{digest}")
+        if response.status_code != 200:
+            return None
+        return int(response.headers.get("Content-Length", 0))
+
+    def list_tags(self, repository: str) -> list[str]:
+        response = self._request("GET", repository, "tags/list")
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+        return list(response.json().get("tags") or [])
+
+    def get_manifest(self, repository: str, reference: str) -> dict[str, t.Any]:
+        """Get an image manifest, resolving multi-platform indexes to the linux/amd64 image."""
+
+        response = self._request(
+            "GET",
+            repository,
+            f"manifests/{reference}",
+            headers={"Accept": ", ".join(MANIFEST_MEDIA_TYPES + INDEX_MEDIA_TYPES)},
+        )
+        response.raise_for_status()
+        manifest: dict[str, t.Any] = response.json()
+
+        if manifest.get("mediaType") in INDEX_MEDIA_TYPES or "manifests" in manifest:
+            for entry in manifest.get("manifests", []):
+                platform = entry.get("platform", {})
+                if platform.get("os") == "linux" and platform.get("architecture") == "amd64":
+                    return self.get_manifest(repository, entry["digest"])
+            raise Exception(f"No linux/amd64 image in {repository}:{reference}")
+
+        return manifest
+
+    def get_layers(self, repository: str, reference: str) -> dict[str, tuple[str, int]]:
+        """Map the uncompressed layer digests (diff ids) of an image to their blob digest and size."""
+
+        manifest = self.get_manifest(repository, reference)
+        response = self._request("GET", repository, f"blobs/{manifest['config']['digest']}")
+        response.raise_for_status()
+
+        diff_ids: list[str] = response.json().get("rootfs", {}).get("diff_ids", [])
+        return {
+            diff_id: (layer["digest"], int(layer.get("size", 0)))
+            for diff_id, layer in zip(diff_ids, manifest.get("layers", []), strict=False)
+        }
+
+
+class LayerPlan(BaseModel):
+    diff_id: str
+    status: t.Literal["exists", "mountable", "new"]
+    # compressed size for known blobs, uncompressed local size for new layers
+    size: int | None = None
+    digest: str | None = None
+    # repository the blob can be mounted from
+    source: str | None = None
+
+
+class PushPlan(BaseModel):
+    repository: str
+    layers: list[LayerPlan]
+
+    def _select(self, status: str) -> list[LayerPlan]:
+        return [layer for layer in self.layers if layer.status == status]
+
+    def count(self, status: str) -> int:
+        return len(self._select(status))
+
+    def bytes(self, status: str) -> int:
+        return sum(layer.size or 0 for layer in self._select(status))
+
+
+def get_local_layer_sizes(diff_ids: list[str], history: list[dict[str, t.Any]]) -> dict[str, int]:
+    """
+    Best effort mapping of local layers to their uncompressed size using the image history,
+    empty if the non-empty history entries can't be lined up with the layers.
+    """
+
+    sizes = [int(entry.get("Size", 0)) for entry in reversed(history) if entry.get("Size", 0) > 0]
+    if len(sizes) != len(diff_ids):
+        return {}
+    return dict(zip(diff_ids, sizes, strict=True))
+
+
+def plan_push(
+    registry: RegistryClient,
+    repository: str,
+    diff_ids: list[str],
+    *,
+    local_sizes: dict[str, int] | None = None,
+    other_repositories: list[str] | None = None,
+    recent_tags: dict[str, list[str]] | None = None,
+) -> PushPlan:
+    """
+    Check which layers of a local image already exist in the target repository, which ones can be
+    mounted from other repositories of the same user and which ones will have to be uploaded.
+
+    `recent_tags` lists known tags of a repository newest first, they are inspected before the rest
+    of its tags, which the registry only returns in lexical order.
+    """
+
+    local_sizes = local_sizes or {}
+    recent_tags = recent_tags or {}
+    # diff id -> (blob digest, blob size, repository)
+    known: dict[str, tuple[str, int, str]] = {}
+
+    for name in [repository, *(other_repositories or [])]:
+        tags = list(dict.fromkeys([*recent_tags.get(name, []), *registry.list_tags(name)]))
+        for tag in tags[:MAX_TAGS_PER_REPOSITORY]:
+            try:
+                layers = registry.get_layers(name, tag)
+            except Exception:
+                continue
+            for diff_id, (digest, size) in layers.items():
+                known.setdefault(diff_id, (digest, size, name))
+
+            if all(diff_id in known for diff_id in diff_ids):
+                break
+
+    plan = PushPlan(repository=repository, layers=[])
+    for diff_id in diff_ids:
+        if diff_id not in known:
+            plan.layers.append(LayerPlan(diff_id=diff_id, status="new", size=local_sizes.get(diff_id)))
+            continue
+
+        digest, size, source = known[diff_id]
+        if (existing_size := registry.get_blob_size(repository, digest)) is not None:
+            plan.layers.append(LayerPlan(diff_id=diff_id, status="exists", size=existing_size, digest=digest))
+        elif registry.get_blob_size(source, digest) is not None:
+            plan.layers.append(LayerPlan(diff_id=diff_id, status="mountable", size=size, digest=digest, source=source))
+        else:
+            plan.layers.append(LayerPlan(diff_id=diff_id, status="new", size=local_sizes.get(diff_id, size)))
+
+    return plan
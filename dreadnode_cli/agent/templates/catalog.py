@@ -0,0 +1,103 @@
+import os
+import pathlib
+
+import httpx
+from pydantic import BaseModel
+from pydantic_yaml import parse_yaml_raw_as
+
+from dreadnode_cli import api
+from dreadnode_cli.agent.templates.manager import Manifest, Template
+from dreadnode_cli.defaults import TEMPLATE_CATALOG_FILE, TEMPLATE_MANIFEST_FILE
+from dreadnode_cli.types import GithubRepo
+
+
+class CatalogEntry(BaseModel):
+    manifest: Manifest
+    # path of the template directory relative to the pack root
+    path: str
+
+
+class Catalog(BaseModel):
+    """Index of the templates of a pack, published at the root of the pack repository."""
+
+    templates: dict[str, CatalogEntry]
+
+    def as_templates(self) -> dict[str, Template]:
+        return {
+            name: Template(manifest=entry.manifest, path=pathlib.Path(entry.path))
+            for name, entry in self.templates.items()
+        }
+
+    def get_templates_for_strike(self, strike_name: str, strike_type: str) -> dict[str, Template]:
+        """Return a dictionary of templates that match the given strike."""
+
+        return {
+            name: template
+            for name, template in self.as_templates().items()
+            if template.manifest.matches_strike(strike_name, strike_type)
+        }
+
+
+def build_catalog(source: pathlib.Path) -> Catalog:
+    """Build the catalog of a template pack from its manifests."""
+
+    templates: dict[str, CatalogEntry] = {}
+    for manifest_path in sorted(source.glob(f"**/{TEMPLATE_MANIFEST_FILE}")):
+        path = manifest_path.parent.relative_to(source).as_posix()
+        templates[path] = CatalogEntry(manifest=parse_yaml_raw_as(Manifest, manifest_path.read_text()), path=path)
+
+    return Catalog(templates=templates)
+
+
+def get_pack_name(github_repo: GithubRepo) -> str:
+    """Name a template pack installed from a repository is installed under, and its templates prefixed with."""
+
+    return f"{github_repo.namespace}-{github_repo.repo}"
+
+
+def get_github_headers(github_repo: GithubRepo) -> dict[str, str]:
+    """Return the headers needed to access a repository, requesting an access token for private dreadnode repos."""
+
+    if github_repo.exists:
+        return {}
+
+    # This could be a private repo that the user can access
+    # by getting an access token from our API
+    if github_repo.namespace == "dreadnode":
+        try:
+            github_access_token = api.create_client().get_github_access_token([github_repo.repo])
+        except Exception as e:
+            raise Exception(f"Failed to access private repository '{github_repo}': {e}") from e
+        return {"Authorization": f"Bearer {github_access_token.token}"}
+
+    raise Exception(f"Repository '{github_repo}' not found or inaccessible")
+
+
+def fetch_catalog(github_repo: GithubRepo, *, headers: dict[str, str] | None = None) -> Catalog | None:
+    """
+    Fetch the catalog of a template pack repository, None if the pack doesn't publish one. Templates are named
+    like once the pack is installed, <pack>/<path>.
+    """
+
+    response = httpx.get(
+        f"https://api.github.com/repos/{github_repo.namespace}/{github_repo.repo}/contents/{TEMPLATE_CATALOG_FILE}",
+        params={"ref": github_repo.ref},
+        headers={"Accept": "application/vnd.github.raw", **(headers or {})},
+        follow_redirects=True,
+        timeout=10,
+    )
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+
+    pack_name = get_pack_name(github_repo)
+    catalog = Catalog.model_validate_json(response.content)
+    return Catalog(templates={f"{pack_name}/{name}": entry for name, entry in catalog.templates.items()})
+
+
+def write_catalog(source: pathlib.Path) -> pathlib.Path:
+    """Write the catalog file at the root of a template pack."""
+
+    path = source / TEMPLATE_CATALOG_FILE
+    path.write_text(build_catalog(source).model_dump_json(indent=2, exclude_none=True) + os.linesep)
+    return path
@@ -5,20 +5,37 @@ import typing as t
 import typer
 from rich import print
 
-from dreadnode_cli import api
+from dreadnode_cli.agent.templates.catalog import fetch_catalog, get_github_headers, get_pack_name, write_catalog
 from dreadnode_cli.agent.templates.format import format_templates
 from dreadnode_cli.agent.templates.manager import TemplateManager
-from dreadnode_cli.defaults import TEMPLATES_DEFAULT_REPO
-from dreadnode_cli.ext.typer import AliasGroup
+from dreadnode_cli.archives import fetch_archive
+from dreadnode_cli.defaults import TEMPLATE_CATALOG_FILE, TEMPLATES_DEFAULT_REPO
+from dreadnode_cli.ext.typer import AliasGroup, pretty_cli
 from dreadnode_cli.types import GithubRepo
-from dreadnode_cli.utils import download_and_unzip_archive, get_repo_archive_source_path, pretty_cli
+from dreadnode_cli.utils import CopyMode, get_repo_archive_source_path
 
 cli = typer.Typer(no_args_is_help=True, cls=AliasGroup)
 
 
 @cli.command("show|list", help="List available agent templates with their descriptions")
 @pretty_cli
-def show() -> None:
+def show(
+    remote: t.Annotated[
+        bool, typer.Option("--remote", "-r", help="List the templates of a remote pack without installing it")
+    ] = False,
+    source: t.Annotated[
+        str, typer.Option("--source", "-s", help="The github repository of the remote pack")
+    ] = TEMPLATES_DEFAULT_REPO,
+) -> None:
+    if remote:
+        github_repo = GithubRepo(source)
+        catalog = fetch_catalog(github_repo, headers=get_github_headers(github_repo))
+        if catalog is None:
+            raise Exception(f"Template pack '{github_repo}' does not publish a {TEMPLATE_CATALOG_FILE}")
+
+        print(format_templates(catalog.as_templates()))
+        return
+
     template_manager = TemplateManager()
     if not template_manager.templates:
         raise Exception("No templates installed, use [bold]dreadnode agent templates install[/] to install some.")
@@ -26,14 +43,37 @@ def show() -> None:
     print(format_templates(template_manager.templates))
 
 
+@cli.command(help="Write the catalog of a template pack, to list its templates without downloading it")
+@pretty_cli
+def catalog(
+    directory: t.Annotated[
+        pathlib.Path, typer.Argument(help="The template pack directory", file_okay=False, resolve_path=True)
+    ] = pathlib.Path("."),
+) -> None:
+    path = write_catalog(directory)
+    print(f":notebook: Wrote {path}")
+
+
 @cli.command(help="Install a template pack")
 @pretty_cli
 def install(
     source: t.Annotated[str, typer.Argument(help="The source of the template pack")] = TEMPLATES_DEFAULT_REPO,
+    hardlink: t.Annotated[
+        bool, typer.Option("--hardlink", help="Hardlink the pack files instead of copying them when possible")
+    ] = False,
+    reflink: t.Annotated[
+        bool, typer.Option("--reflink", help="Clone the pack files (copy on write) when the filesystem supports it")
+    ] = False,
 ) -> None:
+    if hardlink and reflink:
+        raise Exception("Only one of --hardlink and --reflink can be used")
+
+    mode: CopyMode = "hardlink" if hardlink else "reflink" if reflink else "copy"
     template_manager = TemplateManager()
     source_dir: pathlib.Path = pathlib.Path(source)
     pack_name: str | None = None
+    origin: str | None = None
+    commit: str | None = None
     cleanup = False
 
     if not source_dir.exists():
@@ -42,41 +82,38 @@ def install(
         # - github compatible reference
         try:
             github_repo = GithubRepo(source)
+            pack_name = get_pack_name(github_repo)
+            origin = str(github_repo)
+
+            # private repositories need an access token and can only be downloaded through the API
+            headers = get_github_headers(github_repo)
+            if headers:
+                print(":key: Accessed private repository")
+            archive_url = github_repo.api_tar_url if headers else github_repo.tar_url
+
+            # skip the download entirely if the pack is already installed at the same commit
+            commit = github_repo.resolve_commit(headers=headers)
+            if template_manager.is_pack_up_to_date(pack_name, origin, commit):
+                print(f":white_check_mark: Template pack '{pack_name}' is already up to date")
+                return
+
+            source_dir = fetch_archive(archive_url, headers=headers, commit=commit)
 
-            # Check if the repo is accessible
-            if github_repo.exists:
-                source_dir = download_and_unzip_archive(github_repo.zip_url)
-
-            # This could be a private repo that the user can access
-            # by getting an access token from our API
-            elif github_repo.namespace == "dreadnode":
-                try:
-                    github_access_token = api.create_client().get_github_access_token([github_repo.repo])
-                    print(":key: Accessed private repository")
-                    source_dir = download_and_unzip_archive(
-                        github_repo.api_zip_url, headers={"Authorization": f"Bearer {github_access_token.token}"}
-                    )
-                except Exception as e:
-                    raise Exception(f"Failed to access private repository '{github_repo}': {e}") from e
-
-            else:
-                raise Exception(f"Repository '{github_repo}' not found or inaccessible")
-
-            # github repos zip archives usually contain a single branch folder, the real source dir,
+            # github repo archives usually contain a single branch folder, the real source dir,
             # and the path is not known beforehand
             source_dir = get_repo_archive_source_path(source_dir)
-            pack_name = f"{github_repo.namespace}-{github_repo.repo}"
 
         except ValueError:
             # not a repo, download and unzip as a ZIP archive URL
-            source_dir = download_and_unzip_archive(source)
+            origin = source
+            source_dir = fetch_archive(source)
 
         # make sure the temporary directory is cleaned up
         cleanup = True
 
     try:
         # install the template pack
-        template_manager.install_template_pack(source_dir, pack_name)
+        template_manager.install_template_pack(source_dir, pack_name, mode=mode, origin=origin, commit=commit)
     except Exception:
         if cleanup and source_dir.exists():
             shutil.rmtree(source_dir)
@@ -1,16 +1,25 @@
+import functools
 import os
 import pathlib
-import shutil
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from jinja2 import Environment, FileSystemLoader
-from pydantic import BaseModel
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from pydantic import BaseModel, PrivateAttr, ValidationError
 from pydantic_yaml import parse_yaml_raw_as
 from rich import print
 from rich.prompt import Prompt
 
-from dreadnode_cli.defaults import TEMPLATE_MANIFEST_FILE, TEMPLATES_PATH
+from dreadnode_cli.agent.dockerfile import lint_dockerfile
+from dreadnode_cli.defaults import (
+    JINJA_CACHE_PATH,
+    TEMPLATE_MANIFEST_FILE,
+    TEMPLATE_PACK_LOCK_FILE,
+    TEMPLATES_INDEX_FILE,
+    TEMPLATES_PATH,
+)
+from dreadnode_cli.utils import COPY_PARALLEL_THRESHOLD, CopyMode, copy_file, hash_tree
 
 
 class Manifest(BaseModel):
@@ -27,17 +36,25 @@ class Manifest(BaseModel):
     # which strike types this agent is meant to be used for
     strikes_types: list[str] | None = None
 
+    # lowercase lookups for strike matching, computed once
+    _strikes: set[str] = PrivateAttr(default_factory=set)
+    _strikes_types: set[str] = PrivateAttr(default_factory=set)
+
+    def model_post_init(self, __context: t.Any) -> None:
+        self._strikes = {s.lower() for s in self.strikes or []}
+        self._strikes_types = {s.lower() for s in self.strikes_types or []}
+
     def matches_strike(self, strike_name: str, strike_type: str) -> bool:
         """Return True if the manifest matches the given strike."""
 
-        if self.strikes and strike_name.lower() in [s.lower() for s in self.strikes]:
+        if strike_name.lower() in self._strikes:
             return True
 
-        elif self.strikes_types and strike_type.lower() in [s.lower() for s in self.strikes_types]:
+        elif strike_type.lower() in self._strikes_types:
             return True
 
         else:
-            return not self.strikes and not self.strikes_types
+            return not self._strikes and not self._strikes_types
 
 
 class Template(BaseModel):
@@ -45,22 +62,139 @@ class Template(BaseModel):
     path: Path
 
 
+class TemplateIndex(BaseModel):
+    # modification times (ns) of the templates directory, the directories leading to each manifest
+    # and the manifests themselves, the index is stale as soon as any of them changes
+    mtimes: dict[str, int] = {}
+    templates: dict[str, Template]
+
+    @staticmethod
+    def snapshot(base_path: Path, manifest_paths: t.Iterable[Path]) -> dict[str, int]:
+        paths = {base_path}
+        for manifest_path in manifest_paths:
+            paths.add(manifest_path)
+            paths.update(parent for parent in manifest_path.parents if parent.is_relative_to(base_path))
+
+        mtimes: dict[str, int] = {}
+        for path in paths:
+            try:
+                mtimes[str(path)] = path.stat().st_mtime_ns
+            except OSError:
+                mtimes[str(path)] = -1
+        return mtimes
+
+    @staticmethod
+    def read(base_path: Path) -> "TemplateIndex | None":
+        """Read the index of a templates directory, None if it's missing, unreadable or stale."""
+
+        index_path = base_path / TEMPLATES_INDEX_FILE
+        try:
+            index = TemplateIndex.model_validate_json(index_path.read_text())
+        except (OSError, ValueError, ValidationError):
+            return None
+
+        manifest_paths = [template.path / TEMPLATE_MANIFEST_FILE for template in index.templates.values()]
+        if TemplateIndex.snapshot(base_path, manifest_paths) != index.mtimes:
+            return None
+
+        return index
+
+    def write(self, base_path: Path) -> None:
+        index_path = base_path / TEMPLATES_INDEX_FILE
+        try:
+            # create the file before taking the snapshot, so that writing it doesn't change the directory mtime
+            index_path.touch()
+            manifest_paths = [template.path / TEMPLATE_MANIFEST_FILE for template in self.templates.values()]
+            self.mtimes = TemplateIndex.snapshot(base_path, manifest_paths)
+            index_path.write_text(self.model_dump_json())
+        except OSError:
+            # the index is only an optimization
+            pass
+
+
+class PackLock(BaseModel):
+    # where the pack was installed from, a github reference or a local path
+    source: str
+    # commit the source reference resolved to, if known
+    commit: str | None = None
+    # relative path -> sha256 of every installed file
+    files: dict[str, str] = {}
+
+    @staticmethod
+    def read(destination: Path) -> "PackLock | None":
+        try:
+            return PackLock.model_validate_json((destination / TEMPLATE_PACK_LOCK_FILE).read_text())
+        except (OSError, ValueError, ValidationError):
+            return None
+
+    def write(self, destination: Path) -> None:
+        (destination / TEMPLATE_PACK_LOCK_FILE).write_text(self.model_dump_json(indent=2))
+
+
+class PackSyncResult(BaseModel):
+    added: list[str] = []
+    changed: list[str] = []
+    removed: list[str] = []
+
+
+@functools.cache
+def get_environment(source: Path, cache_key: str | None = None) -> Environment:
+    """
+    Return the jinja environment shared by every install of a template directory. With a cache key (the pack
+    and version of installed templates), compiled templates are stored under its cache directory. Bytecode is
+    keyed by the template absolute path, so ad-hoc sources like temporary directories aren't cached.
+    """
+
+    bytecode_cache: FileSystemBytecodeCache | None = None
+    if cache_key is not None:
+        cache_path = JINJA_CACHE_PATH / cache_key
+        try:
+            cache_path.mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(str(cache_path))
+        except OSError:
+            pass
+
+    return Environment(loader=FileSystemLoader(source), bytecode_cache=bytecode_cache)
+
+
 class TemplateManager:
     def __init__(self, base_path: Path = TEMPLATES_PATH) -> None:
         self.base_path = base_path
-        self.templates: dict[str, Template] = {}
+        self._templates: dict[str, Template] | None = None
 
         # create the templates directory if it doesn't exist
         if not self.base_path.exists():
             self.base_path.mkdir(parents=True)
 
-        # load all templates from the templates directory
+    @property
+    def templates(self) -> dict[str, Template]:
+        """Installed templates, loaded on first access from the index or by scanning the templates directory."""
+
+        if self._templates is None:
+            index = TemplateIndex.read(self.base_path)
+            self._templates = index.templates if index is not None else self._scan()
+        return self._templates
+
+    def _scan(self) -> dict[str, Template]:
+        """Load all templates from the templates directory and refresh the index."""
+
+        templates: dict[str, Template] = {}
         for manifest_path in self.base_path.glob(f"**/{TEMPLATE_MANIFEST_FILE}"):
             manifest = parse_yaml_raw_as(Manifest, manifest_path.read_text())
             # get the template name from <base_path/>whatever/name</manifest.yaml>
             template_name = os.path.dirname(manifest_path.resolve().absolute().relative_to(self.base_path))
             # add to the index
-            self.templates[template_name] = Template(manifest=manifest, path=manifest_path.parent)
+            templates[template_name] = Template(manifest=manifest, path=manifest_path.parent)
+
+        TemplateIndex(templates=templates).write(self.base_path)
+
+        return templates
+
+    def invalidate(self) -> None:
+        """Drop the loaded templates and the index, the next access scans the templates directory again."""
+
+        self._templates = None
+        (self.base_path / TEMPLATES_INDEX_FILE).unlink(missing_ok=True)
 
     def get_templates_for_strike(self, strike_name: str, strike_type: str) -> dict[str, Template]:
         """Return a dictionary of templates that match the given strike."""
@@ -71,22 +205,130 @@ class TemplateManager:
             if template.manifest.matches_strike(strike_name, strike_type)
         }
 
-    def install_template_pack(self, source: pathlib.Path, pack_name: str | None = None) -> None:
-        """Install a template pack given its source directory."""
+    def is_pack_up_to_date(self, pack_name: str, source: str, commit: str | None) -> bool:
+        """Return True if the pack is installed from the same source at the same commit."""
+
+        if commit is None:
+            return False
+
+        lock = PackLock.read(self.base_path / pack_name)
+        return lock is not None and lock.source == source and lock.commit == commit
+
+    def install_template_pack(
+        self,
+        source: pathlib.Path,
+        pack_name: str | None = None,
+        *,
+        mode: CopyMode = "copy",
+        origin: str | None = None,
+        commit: str | None = None,
+    ) -> PackSyncResult:
+        """
+        Install or update a template pack given its source directory, optionally hardlinking or reflinking its files.
+        Updates of a pack installed from the same origin only transfer the files that were added, changed or removed.
+        """
 
         pack_name = pack_name or source.name
+        origin = origin or str(source.resolve())
         destination = self.base_path / pack_name
-        if destination.exists():
+
+        lock = PackLock.read(destination) if destination.exists() else None
+        if destination.exists() and (lock is None or lock.source != origin):
             if Prompt.ask(f":axe: Overwrite {destination}?", choices=["y", "n"], default="n") == "n":
                 raise Exception(f"Template pack '{pack_name}' already exists")
-            else:
-                shutil.rmtree(destination)
+            lock = None
 
         print(f":arrow_double_down: Installing template pack '{pack_name}' to {destination} ...")
 
-        shutil.copytree(source, destination)
+        destination.mkdir(parents=True, exist_ok=True)
+        source_files = hash_tree(source, exclude={TEMPLATE_PACK_LOCK_FILE})
+        result = self._sync_pack(source, destination, source_files, lock, mode=mode)
+        PackLock(source=origin, commit=commit, files=source_files).write(destination)
+
+        if lock is not None:
+            print(
+                f":arrows_counterclockwise: {len(result.added)} added, {len(result.changed)} changed, "
+                f"{len(result.removed)} removed"
+            )
+
+        self.invalidate()
+        self.lint_template_pack(destination)
+
+        return result
+
+    def _sync_pack(
+        self,
+        source: pathlib.Path,
+        destination: pathlib.Path,
+        source_files: dict[str, str],
+        lock: PackLock | None,
+        *,
+        mode: CopyMode,
+    ) -> PackSyncResult:
+        # without a lock the destination content is unknown, compare with what is there
+        current_files = lock.files if lock is not None else hash_tree(destination, exclude={TEMPLATE_PACK_LOCK_FILE})
+
+        result = PackSyncResult(
+            added=sorted(path for path in source_files if path not in current_files),
+            changed=sorted(
+                path
+                for path, digest in source_files.items()
+                if path in current_files and (current_files[path] != digest or not (destination / path).exists())
+            ),
+            removed=sorted(path for path in current_files if path not in source_files),
+        )
+
+        for path in result.removed:
+            (destination / path).unlink(missing_ok=True)
+
+        for path in [*result.added, *result.changed]:
+            (destination / path).parent.mkdir(parents=True, exist_ok=True)
+            # never write through a file that might be hardlinked to a previous source
+            (destination / path).unlink(missing_ok=True)
+
+        def transfer(path: str) -> None:
+            copy_file(source / path, destination / path, mode=mode)
+
+        transfers = [*result.added, *result.changed]
+        if len(transfers) <= COPY_PARALLEL_THRESHOLD:
+            for path in transfers:
+                transfer(path)
+        else:
+            with ThreadPoolExecutor() as executor:
+                list(executor.map(transfer, transfers))
+
+        # prune directories left empty by removed files
+        for directory in sorted(destination.rglob("*"), key=lambda p: len(p.parts), reverse=True):
+            if directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
+
+        # keep empty directories of the source
+        for directory in source.rglob("*"):
+            if directory.is_dir():
+                (destination / directory.relative_to(source)).mkdir(parents=True, exist_ok=True)
+
+        return result
+
+    def lint_template_pack(self, path: pathlib.Path) -> None:
+        """Report Dockerfile patterns that slow down rebuilds for every template of a pack."""
+
+        for manifest_path in sorted(path.glob(f"**/{TEMPLATE_MANIFEST_FILE}")):
+            template_path = manifest_path.parent
+            try:
+                findings = lint_dockerfile(template_path, check_context=False)
+            except Exception:
+                continue
+
+            if findings:
+                saved = sum(finding.saved for finding in findings)
+                print(
+                    f":warning:  {template_path.relative_to(path)}: {len(findings)} Dockerfile issue(s), "
+                    f"~{saved:.0f}s per rebuild (check with [bold]dreadnode agent lint-build[/])"
+                )
 
-    def install_from_dir(self, source: pathlib.Path, dest: pathlib.Path, context: dict[str, t.Any]) -> None:
+    def install_from_dir(
+        self, source: pathlib.Path, dest: pathlib.Path, context: dict[str, t.Any], *, cache_key: str | None = None
+    ) -> None:
         """Install a template given its name into a destination directory."""
 
         if not source.exists():
@@ -99,42 +341,52 @@ class TemplateManager:
         elif not (source / "Dockerfile").exists() and not (source / "Dockerfile.j2").exists():
             raise Exception(f"Template directory {source} does not contain a Dockerfile")
 
-        env = Environment(loader=FileSystemLoader(source))
+        env = get_environment(source.resolve(), cache_key)
+
+        directories: list[pathlib.Path] = []
+        files: list[tuple[pathlib.Path, pathlib.Path]] = []
 
-        # iterate over all items in the source directory
         for src_item in source.glob("**/*"):
             # do not copy the manifest itself
             if src_item.name == TEMPLATE_MANIFEST_FILE:
                 continue
 
-            # get the relative path of the item
-            src_item_path = str(src_item.relative_to(source))
-            # get the destination path
-            dest_item = dest / src_item_path
-
-            # if the destination item is not the root directory and it exists,
-            # ask the user if they want to overwrite it
-            if dest_item != dest and dest_item.exists():
-                if Prompt.ask(f":axe: Overwrite {dest_item}?", choices=["y", "n"], default="n") == "n":
-                    continue
-
-            # if the source item is a file
-            if src_item.is_file():
-                # if the file has a .j2 extension, render it using Jinja2
-                if src_item.name.endswith(".j2"):
-                    # we can read as text
-                    content = src_item.read_text()
-                    j2_template = env.get_template(src_item_path)
-                    content = j2_template.render(context)
-                    dest_item = dest / src_item_path.removesuffix(".j2")
-                    dest_item.write_text(content)
-                else:
-                    # otherwise, copy the file as is
-                    dest_item.write_bytes(src_item.read_bytes())
-
-            # if the source item is a directory, create it in the destination
-            elif src_item.is_dir():
-                dest_item.mkdir(exist_ok=True)
+            # get the destination path, rendered templates lose their .j2 extension
+            dest_item = dest / str(src_item.relative_to(source)).removesuffix(".j2")
+
+            if src_item.is_dir():
+                directories.append(dest_item)
+            elif src_item.is_file():
+                files.append((src_item, dest_item))
+
+        # ask about every file that would be overwritten before copying anything
+        files = [
+            (src_item, dest_item)
+            for src_item, dest_item in files
+            if not dest_item.exists()
+            or Prompt.ask(f":axe: Overwrite {dest_item}?", choices=["y", "n"], default="n") == "y"
+        ]
+
+        for directory in directories:
+            directory.mkdir(parents=True, exist_ok=True)
+
+        def install_file(item: tuple[pathlib.Path, pathlib.Path]) -> None:
+            src_item, dest_item = item
+            # if the file has a .j2 extension, render it using Jinja2
+            if src_item.name.endswith(".j2"):
+                j2_template = env.get_template(src_item.relative_to(source).as_posix())
+                dest_item.write_text(j2_template.render(context))
+            else:
+                # otherwise, copy the file as is
+                copy_file(src_item, dest_item)
+
+        if len(files) <= COPY_PARALLEL_THRESHOLD:
+            for item in files:
+                install_file(item)
+        else:
+            with ThreadPoolExecutor() as executor:
+                # consume the results to raise the first error
+                list(executor.map(install_file, files))
 
     def install(self, template_name: str, dest: pathlib.Path, context: dict[str, t.Any]) -> None:
         """Install a template given its name into a destination directory."""
@@ -142,4 +394,7 @@ class TemplateManager:
         if template_name not in self.templates:
             raise Exception(f"Template '{template_name}' not found")
 
-        self.install_from_dir(self.templates[template_name].path, dest, context)
+        template = self.templates[template_name]
+        # compiled templates are cached per pack and version
+        pack_name = next(iter(pathlib.PurePath(template_name).parts), "local")
+        self.install_from_dir(template.path, dest, context, cache_key=f"{pack_name}-{template.manifest.version}")
@@ -0,0 +1,61 @@
+import pathlib
+import typing as t
+
+import httpx
+import pytest
+
+from dreadnode_cli.agent.templates.catalog import Catalog, build_catalog, fetch_catalog, write_catalog
+from dreadnode_cli.types import GithubRepo
+
+
+def _create_pack(path: pathlib.Path) -> None:
+    (path / "any").mkdir(parents=True)
+    (path / "any" / "manifest.yaml").write_text("description: any strike")
+    (path / "nested" / "web").mkdir(parents=True)
+    (path / "nested" / "web" / "manifest.yaml").write_text("description: web\nversion: 1.0.0\nstrikes_types: [Web]")
+
+
+def test_build_catalog(tmp_path: pathlib.Path) -> None:
+    _create_pack(tmp_path)
+
+    catalog = build_catalog(tmp_path)
+
+    assert list(catalog.templates) == ["any", "nested/web"]
+    assert catalog.templates["nested/web"].manifest.version == "1.0.0"
+    assert list(catalog.get_templates_for_strike("x", "web")) == ["any", "nested/web"]
+    assert list(catalog.get_templates_for_strike("x", "ai")) == ["any"]
+
+
+def test_write_catalog_roundtrip(tmp_path: pathlib.Path) -> None:
+    _create_pack(tmp_path)
+
+    path = write_catalog(tmp_path)
+
+    catalog = Catalog.model_validate_json(path.read_text())
+    assert catalog == build_catalog(tmp_path)
+    assert catalog.as_templates()["nested/web"].path == pathlib.Path("nested/web")
+
+
+def test_fetch_catalog(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _create_pack(tmp_path)
+    content = build_catalog(tmp_path).model_dump_json()
+    urls: list[str] = []
+
+    def get(url: str, **kwargs: t.Any) -> httpx.Response:
+        urls.append(url)
+        if "missing" in url:
+            return httpx.Response(404)
+        assert kwargs["params"] == {"ref": "v1"}
+        assert kwargs["headers"]["Authorization"] == "Bearer token"
+        assert kwargs["timeout"]
+        return httpx.Response(200, content=content.encode(), request=httpx.Request("GET", url))
+
+    monkeypatch.setattr(httpx, "get", get)
+
+    catalog = fetch_catalog(GithubRepo("owner/pack@v1"), headers={"Authorization": "Bearer token"})
+    # named like once installed, so they can be passed to agent init
+    assert catalog is not None and list(catalog.templates) == ["owner-pack/any", "owner-pack/nested/web"]
+    assert catalog.templates["owner-pack/nested/web"].path == "nested/web"
+    assert urls[0] == "https://api.github.com/repos/owner/pack/contents/catalog.json"
+
+    assert fetch_catalog(GithubRepo("owner/missing"), headers={"Authorization": "Bearer token"}) is None
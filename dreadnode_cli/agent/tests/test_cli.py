@@ -1,7 +1,19 @@
+import importlib
+import typing as t
 from pathlib import Path
+from uuid import UUID, uuid4
 
+import pytest
+from typer.testing import CliRunner
+
+from dreadnode_cli.agent.config import AgentConfig
+from dreadnode_cli.agent.registry import PushPlan
+from dreadnode_cli.config import ServerConfig, UserConfig
 from dreadnode_cli.utils import get_repo_archive_source_path
 
+# dreadnode_cli.agent re-exports the typer app as `cli`, which shadows the module attribute
+agent_cli = importlib.import_module("dreadnode_cli.agent.cli")
+
 
 def test_get_repo_archive_source_path_from_repo(tmp_path: Path) -> None:
     # single inner folder
@@ -45,3 +57,162 @@ def test_get_repo_archive_source_path_from_non_repo_with_one_file(tmp_path: Path
     result = get_repo_archive_source_path(tmp_path)
     # source path should stay unchanged
     assert result == tmp_path
+
+
+class MockAgent:
+    def __init__(self, key: str, revision: int) -> None:
+        self.key = key
+        self.id = uuid4()
+        self.revision = revision
+
+
+class MockClient:
+    def __init__(self) -> None:
+        self.created: list[str] = []
+        self.versions: list[str] = []
+
+    def create_strike_agent(self, container: t.Any, name: str, **kwargs: t.Any) -> MockAgent:
+        self.created.append(container.image)
+        return MockAgent(name, 1)
+
+    def create_strike_agent_version(self, agent: str, container: t.Any, notes: str | None = None) -> MockAgent:
+        self.versions.append(container.image)
+        return MockAgent(agent, 2)
+
+
+class MockImage:
+    id = "sha256:0123456789abcdef"
+
+
+def _setup_workspace(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> tuple[MockClient, list[str], list[str]]:
+    user_config = UserConfig(active="main")
+    user_config.set_server_config(
+        ServerConfig(
+            url="https://platform.dreadnode.io",
+            email="test@example.com",
+            username="Test User",
+            api_key="test",
+            access_token="test",
+            refresh_token="test",
+        ),
+        "main",
+    )
+
+    (tmp_path / "new-agent").mkdir()
+    AgentConfig(project_name="New Agent").write(tmp_path / "new-agent")
+    (tmp_path / "nested" / "linked").mkdir(parents=True)
+    AgentConfig(project_name="linked").add_link("linked", UUID("00000000-0000-0000-0000-000000000000"), "main").write(
+        tmp_path / "nested" / "linked"
+    )
+
+    logins: list[str] = []
+    pushed: list[str] = []
+    client = MockClient()
+
+    monkeypatch.setattr(agent_cli.UserConfig, "read", lambda: user_config)
+    monkeypatch.setattr(agent_cli.api, "create_client", lambda **_: client)
+    monkeypatch.setattr(agent_cli, "get_registry", lambda _: "registry.dreadnode.io")
+    monkeypatch.setattr(agent_cli.docker, "login", lambda registry, *_: logins.append(registry))
+    monkeypatch.setattr(agent_cli.docker, "build", lambda *_, **__: MockImage())
+    monkeypatch.setattr(agent_cli.docker, "push", lambda _, repository, tag, **__: pushed.append(f"{repository}:{tag}"))
+
+    return client, logins, pushed
+
+
+def test_push_plan(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    client, logins, pushed = _setup_workspace(tmp_path, monkeypatch)
+    user_config = agent_cli.UserConfig.read()
+    # linked to another profile, a push would create a fresh agent
+    AgentConfig(project_name="agent").add_link("agent", uuid4(), "other").write(tmp_path)
+
+    client_configs: list[t.Any] = []
+
+    class PlanClient:
+        def list_strike_agents(self) -> list[t.Any]:
+            return []
+
+    def create_client(**kwargs: t.Any) -> PlanClient:
+        client_configs.append(kwargs.get("user_config"))
+        return PlanClient()
+
+    class PlanImage(MockImage):
+        attrs = {"RootFS": {"Layers": ["sha256:a"]}}
+
+        def history(self) -> list[dict[str, t.Any]]:
+            return []
+
+    monkeypatch.setattr(agent_cli.api, "create_client", create_client)
+    monkeypatch.setattr(agent_cli.docker, "build", lambda *_, **__: PlanImage())
+    monkeypatch.setattr(
+        agent_cli, "plan_push", lambda _, repository, *__, **___: PushPlan(repository=repository, layers=[])
+    )
+
+    result = CliRunner().invoke(agent_cli.cli, ["push", "--dir", str(tmp_path), "--plan"])
+
+    assert result.exit_code == 0, result.output
+    assert "Linking" not in result.output
+    assert client_configs == [user_config]
+    assert logins == pushed == []
+    assert client.created == client.versions == []
+
+
+def test_push_workspace(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    client, logins, pushed = _setup_workspace(tmp_path, monkeypatch)
+
+    agent_cli.push_workspace(tmp_path, tag=None, env={}, notes="test", rebuild=False, jobs=2)
+
+    assert logins == ["registry.dreadnode.io"]
+    assert sorted(pushed) == [
+        "registry.dreadnode.io/test-user/agents/linked:89abcdef",
+        "registry.dreadnode.io/test-user/agents/new-agent:89abcdef",
+    ]
+    assert client.created == ["registry.dreadnode.io/test-user/agents/new-agent:89abcdef"]
+    assert client.versions == ["registry.dreadnode.io/test-user/agents/linked:89abcdef"]
+
+    # the new agent is linked to the active profile
+    assert AgentConfig.read(tmp_path / "new-agent").active_link.profile == "main"
+
+
+def test_push_workspace_new(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    client, _, _ = _setup_workspace(tmp_path, monkeypatch)
+
+    result = CliRunner().invoke(agent_cli.cli, ["push", "--workspace", str(tmp_path), "--new", "-m", "test"])
+
+    assert result.exit_code == 0, result.output
+    assert sorted(client.created) == [
+        "registry.dreadnode.io/test-user/agents/linked:89abcdef",
+        "registry.dreadnode.io/test-user/agents/new-agent:89abcdef",
+    ]
+    assert client.versions == []
+
+
+def test_push_workspace_without_agents(tmp_path: Path) -> None:
+    with pytest.raises(Exception, match="No agents found"):
+        agent_cli.push_workspace(tmp_path, tag=None, env={}, notes=None, rebuild=False, jobs=1)
+
+
+def test_push_plan_with_workspace_is_rejected(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    (tmp_path / "agent").mkdir()
+    AgentConfig(project_name="agent").write(tmp_path / "agent")
+
+    calls: list[str] = []
+    monkeypatch.setattr(agent_cli, "push_workspace", lambda *_, **__: calls.append("push_workspace"))
+    monkeypatch.setattr(agent_cli.docker, "push", lambda *_, **__: calls.append("push"))
+    monkeypatch.setattr(agent_cli.api, "create_client", lambda **_: calls.append("create_client"))
+
+    result = CliRunner().invoke(agent_cli.cli, ["push", "--workspace", str(tmp_path), "--plan"])
+
+    assert result.exit_code == 1
+    assert "--plan can't be combined with --workspace" in result.output
+    assert calls == []
+
+
+def test_push_quiet_with_workspace_is_rejected(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[str] = []
+    monkeypatch.setattr(agent_cli, "push_workspace", lambda *_, **__: calls.append("push_workspace"))
+
+    result = CliRunner().invoke(agent_cli.cli, ["push", "--workspace", str(tmp_path), "--quiet"])
+
+    assert result.exit_code == 1
+    assert "--quiet can't be combined with --workspace" in result.output
+    assert calls == []
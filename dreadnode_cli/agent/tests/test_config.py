@@ -4,8 +4,8 @@ from uuid import UUID
 
 import pytest
 
-from dreadnode_cli.agent.cli import ensure_profile
-from dreadnode_cli.agent.config import AgentConfig
+from dreadnode_cli.agent.cli import ensure_profile, needs_new_link
+from dreadnode_cli.agent.config import AgentConfig, find_agent_directories
 from dreadnode_cli.config import ServerConfig, UserConfig
 
 
@@ -131,3 +131,34 @@ def test_ensure_profile() -> None:
     ):
         ensure_profile(agent_config, user_config=user_config)
     assert user_config.active == "other"
+
+
+def test_find_agent_directories(tmp_path: Path) -> None:
+    assert find_agent_directories(tmp_path) == []
+
+    for name in ("b", "a", "nested/c"):
+        (tmp_path / name).mkdir(parents=True)
+        AgentConfig(project_name=name).write(tmp_path / name)
+    (tmp_path / "not-an-agent").mkdir()
+
+    assert find_agent_directories(tmp_path) == [tmp_path / "a", tmp_path / "b", tmp_path / "nested" / "c"]
+
+
+def test_needs_new_link() -> None:
+    agent_config = AgentConfig(project_name="test")
+
+    # No links yet, a new agent is created by the caller anyway
+    assert not needs_new_link(agent_config, "main")
+
+    # Linked to another profile only
+    agent_config.add_link("test-other", UUID("00000000-0000-0000-0000-000000000000"), "other")
+    assert needs_new_link(agent_config, "main")
+
+    # Linked to the current profile, but the active link points elsewhere
+    agent_config.add_link("test-main", UUID("11111111-1111-1111-1111-111111111111"), "main")
+    agent_config.active = "test-other"
+    with pytest.raises(Exception, match="Current agent link"):
+        needs_new_link(agent_config, "main")
+
+    agent_config.active = "test-main"
+    assert not needs_new_link(agent_config, "main")
@@ -2,10 +2,11 @@ import typing as t
 from pathlib import Path
 
 import pytest
+from docker import errors as docker_errors  # type: ignore
 
 import dreadnode_cli.agent.docker as docker
 from dreadnode_cli.config import ServerConfig
-from dreadnode_cli.defaults import DOCKER_REGISTRY_IMAGE_TAG
+from dreadnode_cli.defaults import DOCKER_REGISTRY_IMAGE_TAG, DOCKER_REGISTRY_LOCAL_PORT
 
 
 class MockImage:
@@ -17,9 +18,22 @@ class MockImage:
 
 
 class MockContainer:
-    def __init__(self, image_tags: list[str], attrs: dict[str, t.Any]) -> None:
+    def __init__(self, image_tags: list[str], attrs: dict[str, t.Any], id: str = "mock-container") -> None:
+        self.id = id
         self.image = MockImage(image_tags)
-        self.attrs = attrs
+        self.attrs = {"State": {"Running": True}, **attrs}
+
+    def summary(self) -> dict[str, t.Any]:
+        """The container as returned by the (low level) container list endpoint."""
+
+        return {
+            "Id": self.id,
+            "Ports": [
+                {"PrivatePort": int(port.split("/")[0]), "PublicPort": int(binding["HostPort"]), "Type": "tcp"}
+                for port, bindings in self.attrs["NetworkSettings"]["Ports"].items()
+                for binding in bindings or []
+            ],
+        }
 
 
 class MockDockerClient:
@@ -42,6 +56,22 @@ class MockDockerClient:
         def login(*args: t.Any, **kwargs: t.Any) -> dict[str, t.Any]:
             return {"Status": "Login Succeeded"}
 
+        @staticmethod
+        def containers(filters: dict[str, str] | None = None, **kwargs: t.Any) -> list[dict[str, t.Any]]:
+            ancestor = (filters or {}).get("ancestor")
+            return [
+                container.summary()
+                for container in MockDockerClient.containers.containers
+                if ancestor is None or ancestor in container.image.tags
+            ]
+
+        @staticmethod
+        def inspect_container(id: str) -> dict[str, t.Any]:
+            for container in MockDockerClient.containers.containers:
+                if container.id == id:
+                    return container.attrs
+            raise docker_errors.NotFound(f"No such container: {id}")
+
     class images:
         @staticmethod
         def get(id: str) -> MockImage:
@@ -55,6 +85,13 @@ class MockDockerClient:
             return MockDockerClient.containers.containers
 
 
+@pytest.fixture(autouse=True)
+def local_registry_cache_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "local-registry.json"
+    monkeypatch.setattr(docker, "DOCKER_LOCAL_REGISTRY_CACHE_PATH", path)
+    return path
+
+
 def _create_test_server_config(url: str = "https://crucible.dreadnode.io") -> ServerConfig:
     return ServerConfig(
         url=url,
@@ -141,18 +178,86 @@ def test_get_registry() -> None:
 
 def test_get_local_registry_port_with_running_registry_container() -> None:
     with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(docker, "client", MockDockerClient())
         mp.setattr(
-            docker.client.containers,
+            MockDockerClient.containers,
             "containers",
             [
+                MockContainer(["other:latest"], {"NetworkSettings": {"Ports": {"80/tcp": [{"HostPort": "8080"}]}}}),
                 MockContainer(
                     [DOCKER_REGISTRY_IMAGE_TAG], {"NetworkSettings": {"Ports": {"5000/tcp": [{"HostPort": "12345"}]}}}
-                )
+                ),
             ],
         )
         assert docker.get_registry(_create_test_server_config("http://localhost:8000")) == "localhost:12345"
 
 
+def test_get_local_registry_port_is_cached_until_container_is_gone(monkeypatch: pytest.MonkeyPatch) -> None:
+    registry = MockContainer(
+        [DOCKER_REGISTRY_IMAGE_TAG], {"NetworkSettings": {"Ports": {"5000/tcp": [{"HostPort": "12345"}]}}}, id="abc"
+    )
+    monkeypatch.setattr(docker, "client", MockDockerClient())
+    monkeypatch.setattr(MockDockerClient.containers, "containers", [registry])
+
+    listed = 0
+    list_containers = MockDockerClient.api.containers
+
+    def counting_list_containers(*args: t.Any, **kwargs: t.Any) -> list[dict[str, t.Any]]:
+        nonlocal listed
+        listed += 1
+        return list_containers(*args, **kwargs)
+
+    monkeypatch.setattr(MockDockerClient.api, "containers", counting_list_containers)
+
+    assert docker.get_local_registry_port() == 12345
+    assert docker.LocalRegistryCache.read() == docker.LocalRegistryCache(container_id="abc", port=12345)
+    assert listed == 1
+
+    # the cached container is used without listing containers
+    assert docker.get_local_registry_port() == 12345
+    assert listed == 1
+
+    # once the container is gone the cache is dropped and we fall back to discovery
+    monkeypatch.setattr(MockDockerClient.containers, "containers", [])
+    assert docker.get_local_registry_port() == DOCKER_REGISTRY_LOCAL_PORT
+    assert docker.LocalRegistryCache.read() is None
+    assert listed == 2
+
+
+@pytest.mark.parametrize("state", ["stopped", "error"])
+def test_get_local_registry_port_cache_is_dropped(state: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    registry = MockContainer(
+        [DOCKER_REGISTRY_IMAGE_TAG], {"NetworkSettings": {"Ports": {"5000/tcp": [{"HostPort": "12345"}]}}}, id="abc"
+    )
+    monkeypatch.setattr(docker, "client", MockDockerClient())
+    monkeypatch.setattr(MockDockerClient.containers, "containers", [registry])
+    docker.LocalRegistryCache(container_id="abc", port=12345).write()
+
+    if state == "stopped":
+        registry.attrs["State"]["Running"] = False
+    else:
+
+        def failing_inspect_container(id: str) -> dict[str, t.Any]:
+            raise docker_errors.APIError("500 Server Error")
+
+        monkeypatch.setattr(MockDockerClient.api, "inspect_container", failing_inspect_container)
+
+    assert docker._get_cached_local_registry_port() is None
+    assert docker.LocalRegistryCache.read() is None
+
+
+def test_get_registry_with_local_registry_override(monkeypatch: pytest.MonkeyPatch) -> None:
+    # discovery must not run at all
+    monkeypatch.setattr(docker, "get_local_registry_port", None)
+    monkeypatch.setattr(docker, "client", MockDockerClient())
+
+    monkeypatch.setattr(docker, "DOCKER_REGISTRY_LOCAL", "5000")
+    assert docker.get_registry(_create_test_server_config("http://localhost:8000")) == "localhost:5000"
+
+    monkeypatch.setattr(docker, "DOCKER_REGISTRY_LOCAL", "127.0.0.1:5001")
+    assert docker.get_registry(_create_test_server_config("http://localhost:8000")) == "127.0.0.1:5001"
+
+
 def test_get_registry_without_schema() -> None:
     # Test without schema
     config = _create_test_server_config("crucible.dreadnode.io")
@@ -205,3 +310,260 @@ def test_sanitized_name() -> None:
     assert docker.sanitized_name("   spaced   name   ") == "spaced-name"
     assert docker.sanitized_name("!!!###") == ""
     assert docker.sanitized_name("123 456") == "123-456"
+
+
+def _recorded_push_events(layers: int = 20, events: int = 10_000) -> list[dict[str, t.Any]]:
+    """Synthesize a push event stream shaped like the one recorded from the docker daemon."""
+
+    stream: list[dict[str, t.Any]] = [
+        {"status": "The push refers to repository [registry.dreadnode.io/test/agents/test]"}
+    ]
+    stream += [{"status": "Preparing", "progressDetail": {}, "id": f"layer{i}"} for i in range(layers)]
+    stream += [{"status": "Layer already exists", "progressDetail": {}, "id": f"layer{i}"} for i in range(0, layers, 4)]
+
+    pushing = [i for i in range(layers) if i % 4]
+    steps = (events - len(stream) - len(pushing) - 1) // len(pushing)
+    for step in range(1, steps + 1):
+        for i in pushing:
+            stream.append(
+                {
+                    "status": "Pushing",
+                    "progressDetail": {"current": step * 512, "total": steps * 512},
+                    "id": f"layer{i}",
+                }
+            )
+    stream += [{"status": "Pushed", "progressDetail": {}, "id": f"layer{i}"} for i in pushing]
+    stream.append({"status": "latest: digest: sha256:mock123 size: 4321"})
+
+    return stream
+
+
+def test_push_display_indexes_layers() -> None:
+    display = docker.DockerPushDisplay()
+    display.add_event({"status": "Preparing", "id": "layer1"})
+    display.add_event({"status": "Pushing", "progressDetail": {"current": 50, "total": 100}, "id": "layer1"})
+    display.add_event({"status": "Pushing", "progressDetail": {"current": 150, "total": 100}, "id": "layer1"})
+
+    assert len(display.lines) == 1
+    assert display.layers["layer1"]["status"] == "Pushing"
+    assert display.current_bytes == 100
+    assert display.total_bytes == 100
+    assert "100.0%" in display.render().plain
+
+    display.add_event({"status": "Pushed", "progressDetail": {}, "id": "layer1"})
+    assert display.layers["layer1"]["status"] == "Pushed"
+    assert display.current_bytes == display.total_bytes == 100
+
+
+def test_push_display_reuses_render_until_changed() -> None:
+    display = docker.DockerPushDisplay()
+    display.add_event({"status": "Preparing", "id": "layer1"})
+
+    rendered = display.render()
+    assert display.render() is rendered
+
+    display.add_event({"status": "Pushed", "id": "layer1"})
+    assert display.render() is not rendered
+
+
+def test_push_display_replay_recorded_stream() -> None:
+    events = _recorded_push_events()
+    assert len(events) >= 9_900
+
+    display = docker.DockerPushDisplay()
+
+    for event in events:
+        display.add_event(event)
+    output = display.render().plain
+
+    assert len(display.lines) == 22
+    assert display.current_bytes == display.total_bytes > 0
+    assert "ETA" in output
+
+
+def test_push_renders_on_refresh_tick_only(monkeypatch: pytest.MonkeyPatch) -> None:
+    events = _recorded_push_events()
+    renders = 0
+    render = docker.DockerPushDisplay.render
+
+    def counting_render(self: docker.DockerPushDisplay) -> t.Any:
+        nonlocal renders
+        renders += 1
+        return render(self)
+
+    class ReplayDockerClient(MockDockerClient):
+        class api(MockDockerClient.api):
+            @staticmethod
+            def push(*args: t.Any, **kwargs: t.Any) -> list[dict[str, t.Any]]:
+                return events
+
+    monkeypatch.setattr(docker.DockerPushDisplay, "render", counting_render)
+    monkeypatch.setattr(docker, "client", ReplayDockerClient())
+
+    docker.push(MockImage(), "test-repo", "latest")
+
+    assert 0 < renders < len(events) // 100
+
+
+class LoginCountingDockerClient(MockDockerClient):
+    def __init__(self, push_errors: list[str] | None = None) -> None:
+        self.logins: list[dict[str, t.Any]] = []
+        self.pushes: list[dict[str, t.Any]] = []
+        self.push_errors = push_errors or []
+        outer = self
+
+        class api(MockDockerClient.api):
+            @staticmethod
+            def login(**kwargs: t.Any) -> dict[str, t.Any]:
+                outer.logins.append(kwargs)
+                return {"Status": "Login Succeeded"}
+
+            @staticmethod
+            def push(*args: t.Any, **kwargs: t.Any) -> list[dict[str, t.Any]]:
+                outer.pushes.append(kwargs)
+                if outer.push_errors:
+                    return [{"error": outer.push_errors.pop(0)}]
+                return MockDockerClient.api.push()
+
+        self.api = api
+
+
+@pytest.fixture
+def login_cache_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "registry-logins.json"
+    monkeypatch.setattr(docker, "DOCKER_LOGIN_CACHE_PATH", path)
+    monkeypatch.setattr(docker, "_credentials", {})
+    return path
+
+
+def test_registry_login_cache(login_cache_path: Path) -> None:
+    cache = docker.RegistryLoginCache.read()
+    assert not cache.is_valid("registry.dreadnode.io", "test", "secret")
+
+    # caches written by older versions are readable by everyone
+    login_cache_path.write_text("{}")
+    login_cache_path.chmod(0o644)
+    cache.add("registry.dreadnode.io", "test", "secret").write()
+    assert "secret" not in login_cache_path.read_text()
+    assert login_cache_path.stat().st_mode & 0o777 == 0o600
+
+    # the same credentials are hashed differently for every login
+    other = docker.RegistryLoginCache().add("registry.dreadnode.io", "test", "secret")
+    assert other.logins["test@registry.dreadnode.io"].credential_hash != (
+        cache.logins["test@registry.dreadnode.io"].credential_hash
+    )
+
+    cache = docker.RegistryLoginCache.read()
+    assert cache.is_valid("registry.dreadnode.io", "test", "secret")
+    assert not cache.is_valid("registry.dreadnode.io", "test", "rotated")
+    assert not cache.is_valid("registry.dreadnode.io", "other", "secret")
+    assert not cache.is_valid("staging-registry.dreadnode.io", "test", "secret")
+
+    cache.add("registry.dreadnode.io", "test", "secret", ttl=-1)
+    assert not cache.is_valid("registry.dreadnode.io", "test", "secret")
+
+    # expired entries are dropped on write
+    cache.write()
+    assert docker.RegistryLoginCache.read().logins == {}
+
+
+def test_registry_login_cache_ignores_corrupted_file(login_cache_path: Path) -> None:
+    login_cache_path.write_text("{not json")
+    assert docker.RegistryLoginCache.read().logins == {}
+
+
+def test_login_is_cached(login_cache_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    mock_client = LoginCountingDockerClient()
+    monkeypatch.setattr(docker, "client", mock_client)
+
+    docker.login("registry.dreadnode.io", "test", "secret")
+    docker.login("registry.dreadnode.io", "test", "secret")
+    assert len(mock_client.logins) == 1
+
+    # changed credentials authenticate again
+    docker.login("registry.dreadnode.io", "test", "rotated")
+    assert len(mock_client.logins) == 2
+
+    # pushes carry the credentials even when the login round trip was skipped
+    docker.push(MockImage(), "registry.dreadnode.io/test/agents/test", "latest", quiet=True)
+    assert mock_client.pushes[-1]["auth_config"] == {"username": "test", "password": "rotated"}
+
+
+def test_push_logs_in_again_when_unauthorized(login_cache_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    mock_client = LoginCountingDockerClient(push_errors=["unauthorized: authentication required"])
+    monkeypatch.setattr(docker, "client", mock_client)
+
+    docker.login("registry.dreadnode.io", "test", "secret")
+    docker.push(MockImage(), "registry.dreadnode.io/test/agents/test", "latest", quiet=True)
+
+    assert len(mock_client.logins) == 2
+    assert mock_client.logins[-1]["reauth"] is True
+    assert len(mock_client.pushes) == 2
+
+
+def test_push_raises_other_errors(login_cache_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    mock_client = LoginCountingDockerClient(push_errors=["manifest invalid"])
+    monkeypatch.setattr(docker, "client", mock_client)
+
+    docker.login("registry.dreadnode.io", "test", "secret")
+    with pytest.raises(Exception, match="manifest invalid"):
+        docker.push(MockImage(), "registry.dreadnode.io/test/agents/test", "latest")
+
+    assert len(mock_client.logins) == 1
+
+
+BUILD_STREAM: list[dict[str, t.Any]] = [
+    {"stream": "Step 1/3 : FROM python:3.10\n"},
+    {"stream": " ---> 1234abcd\n"},
+    {"stream": "Step 2/3 : RUN pip install [all]\n"},
+    {"stream": " ---> Using cache\n ---> 5678abcd\n"},
+    {"stream": "Step 3/3 : COPY . .\n"},
+    {"stream": " ---> 9abcdef0\n"},
+    {"stream": "Successfully built 9abcdef0\n"},
+    {"aux": {"ID": "sha256:mock123"}},
+]
+
+
+class BuildStreamDockerClient(MockDockerClient):
+    class api(MockDockerClient.api):
+        @staticmethod
+        def build(*args: t.Any, **kwargs: t.Any) -> list[dict[str, t.Any]]:
+            return BUILD_STREAM
+
+
+def test_build_profile() -> None:
+    profile = docker.BuildProfile()
+    for item in BUILD_STREAM:
+        for line in item.get("stream", "").splitlines(keepends=True):
+            profile.add_line(line)
+    profile.finish()
+
+    assert [(step.number, step.instruction, step.cached) for step in profile.steps] == [
+        (1, "FROM python:3.10", False),
+        (2, "RUN pip install [all]", True),
+        (3, "COPY . .", False),
+    ]
+    assert all(step.duration >= 0 for step in profile.steps)
+    # cached steps are never reported among the slowest
+    assert {step.number for step in profile.slowest()} == {1, 3}
+    assert "1/3 steps cached" in str(profile.render().caption)
+
+
+@pytest.mark.parametrize(
+    ("output", "expected"),
+    [
+        ("full", "".join(item.get("stream", "") for item in BUILD_STREAM)),
+        ("steps", "Step 1/3 : FROM python:3.10\nStep 2/3 : RUN pip install [all]\nStep 3/3 : COPY . .\n"),
+        ("none", ""),
+    ],
+)
+def test_build_output(
+    output: docker.BuildOutput, expected: str, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    monkeypatch.setattr(docker, "client", BuildStreamDockerClient())
+
+    profile = docker.BuildProfile()
+    docker.build("/tmp", output=output, profile=profile)
+
+    assert capsys.readouterr().out == expected
+    assert len(profile.steps) == 3
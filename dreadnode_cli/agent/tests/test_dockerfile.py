@@ -0,0 +1,83 @@
+import pathlib
+
+from dreadnode_cli.agent.dockerfile import is_ignored, lint_dockerfile, parse_dockerfile
+
+CACHE_BUSTING_DOCKERFILE = """\
+FROM python:3.11-slim
+
+# the whole project is copied before installing dependencies
+COPY . /app
+RUN pip install \\
+    -r /app/requirements.txt
+CMD ["python", "/app/main.py"]
+"""
+
+CACHE_FRIENDLY_DOCKERFILE = """\
+FROM python:3.11-slim AS builder
+RUN apt-get update && apt-get install -y build-essential
+COPY requirements.txt /app/
+RUN pip wheel -r /app/requirements.txt -w /wheels
+
+FROM python:3.11-slim
+COPY --from=builder /wheels /wheels
+RUN pip install /wheels/*
+COPY . /app
+"""
+
+
+def test_parse_dockerfile() -> None:
+    instructions = parse_dockerfile(CACHE_BUSTING_DOCKERFILE)
+
+    assert [(i.line, i.command) for i in instructions] == [(1, "FROM"), (4, "COPY"), (5, "RUN"), (7, "CMD")]
+    assert instructions[2].arguments == "pip install -r /app/requirements.txt"
+
+
+def test_lint_cache_order(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "Dockerfile").write_text(CACHE_BUSTING_DOCKERFILE)
+
+    findings = lint_dockerfile(tmp_path)
+
+    assert [(f.rule, f.line) for f in findings] == [("cache-order", 5)]
+    assert findings[0].saved > 0
+
+
+def test_lint_clean_multi_stage(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "Dockerfile").write_text(CACHE_FRIENDLY_DOCKERFILE)
+
+    assert lint_dockerfile(tmp_path) == []
+
+
+def test_lint_unpinned_base_and_toolchain(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "Dockerfile.j2").write_text(
+        "FROM {{ base_image }}\nRUN apt-get install -y gcc\nFROM python@sha256:" + "a" * 64 + "\n"
+    )
+    assert [f.rule for f in lint_dockerfile(tmp_path, context={"base_image": "python:3.11"})] == []
+
+    (tmp_path / "Dockerfile.j2").write_text("FROM {{ base_image }}\nRUN apt-get install -y gcc\n")
+    findings = lint_dockerfile(tmp_path, context={"base_image": "python:latest"})
+    assert [f.rule for f in findings] == ["unpinned-base", "multi-stage"]
+
+    # templates render offline even without a context
+    assert [f.rule for f in lint_dockerfile(tmp_path)] == ["multi-stage"]
+
+
+def test_lint_dockerignore(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "Dockerfile").write_text("FROM python:3.11-slim\nCOPY . /app\n")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_text("ref: refs/heads/main")
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "main.py").write_text("print('hello')")
+
+    assert [f.message.split("'")[1] for f in lint_dockerfile(tmp_path)] == [".git", "node_modules"]
+
+    (tmp_path / ".dockerignore").write_text("# vcs\n.git\nnode_modules/\n")
+    assert lint_dockerfile(tmp_path) == []
+    assert lint_dockerfile(tmp_path, check_context=False) == []
+
+
+def test_is_ignored() -> None:
+    assert is_ignored(".git", [".git"])
+    assert is_ignored("data/big.bin", ["data"])
+    assert is_ignored("model.bin", ["*.bin"])
+    assert not is_ignored("keep.bin", ["*.bin", "!keep.bin"])
+    assert not is_ignored("main.py", ["*.bin"])
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import typing as t
+
+import httpx
+
+from dreadnode_cli.agent.registry import RegistryClient, get_local_layer_sizes, plan_push
+
+
+def _digest(data: bytes) -> str:
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+class LocalRegistry:
+    """In-memory stand-in for a registry with token authentication."""
+
+    def __init__(self) -> None:
+        self.blobs: dict[str, dict[str, bytes]] = {}
+        self.manifests: dict[str, dict[str, dict[str, t.Any]]] = {}
+        self.requests: list[str] = []
+
+    def add_image(self, repository: str, tag: str, layers: list[tuple[str, bytes]]) -> None:
+        """Add an image to the registry from (diff id, compressed blob) pairs."""
+
+        blobs = self.blobs.setdefault(repository, {})
+        config = json.dumps({"rootfs": {"type": "layers", "diff_ids": [diff_id for diff_id, _ in layers]}}).encode()
+        blobs[_digest(config)] = config
+
+        manifest_layers = []
+        for _, blob in layers:
+            blobs[_digest(blob)] = blob
+            manifest_layers.append({"digest": _digest(blob), "size": len(blob)})
+
+        self.manifests.setdefault(repository, {})[tag] = {
+            "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
+            "config": {"digest": _digest(config)},
+            "layers": manifest_layers,
+        }
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(f"{request.method} {request.url.path}")
+
+        if request.url.path == "/token":
+            assert request.headers["Authorization"].startswith("Basic ")
+            return httpx.Response(200, json={"token": "test-token"})
+
+        if request.headers.get("Authorization") != "Bearer test-token":
+            return httpx.Response(
+                401, headers={"WWW-Authenticate": 'Bearer realm="http://registry.test/token",service="registry.test"'}
+            )
+
+        path = request.url.path.removeprefix("/v2/")
+        if "/blobs/" in path:
+            repository, digest = path.split("/blobs/")
+            blob = self.blobs.get(repository, {}).get(digest)
+            if blob is None:
+                return httpx.Response(404)
+            return httpx.Response(200, content=b"" if request.method == "HEAD" else blob)
+
+        if path.endswith("/tags/list"):
+            repository = path.removesuffix("/tags/list")
+            if repository not in self.manifests:
+                return httpx.Response(404)
+            return httpx.Response(200, json={"name": repository, "tags": list(self.manifests[repository])})
+
+        repository, reference = path.split("/manifests/")
+        return httpx.Response(200, json=self.manifests[repository][reference])
+
+
+def _registry_client(registry: LocalRegistry) -> RegistryClient:
+    return RegistryClient(
+        "registry.test",
+        "test",
+        "secret",
+        client=httpx.Client(base_url="http://registry.test", transport=httpx.MockTransport(registry.handler)),
+    )
+
+
+def test_registry_client_authenticates_with_token() -> None:
+    registry = LocalRegistry()
+    registry.add_image("test/agents/a", "v1", [("sha256:a", b"layer-a")])
+    client = _registry_client(registry)
+
+    assert client.list_tags("test/agents/a") == ["v1"]
+    assert client.list_tags("test/agents/missing") == []
+    assert client.get_blob_size("test/agents/a", _digest(b"layer-a")) is not None
+    assert client.get_blob_size("test/agents/a", _digest(b"missing")) is None
+
+    # tokens are scoped to a repository, fetched once per repository and then reused
+    assert registry.requests.count("GET /token") == 2
+
+
+def test_registry_client_get_layers() -> None:
+    registry = LocalRegistry()
+    registry.add_image("test/agents/a", "v1", [("sha256:a", b"layer-a"), ("sha256:b", b"layer-bb")])
+
+    assert _registry_client(registry).get_layers("test/agents/a", "v1") == {
+        "sha256:a": (_digest(b"layer-a"), 7),
+        "sha256:b": (_digest(b"layer-bb"), 8),
+    }
+
+
+def test_plan_push() -> None:
+    registry = LocalRegistry()
+    registry.add_image("test/agents/a", "v1", [("sha256:base", b"base-layer"), ("sha256:deps", b"old-deps")])
+    registry.add_image("test/agents/b", "v1", [("sha256:base", b"base-layer"), ("sha256:shared", b"shared")])
+
+    plan = plan_push(
+        _registry_client(registry),
+        "test/agents/a",
+        ["sha256:base", "sha256:shared", "sha256:code"],
+        local_sizes={"sha256:code": 1000},
+        other_repositories=["test/agents/b"],
+    )
+
+    assert [(layer.diff_id, layer.status) for layer in plan.layers] == [
+        ("sha256:base", "exists"),
+        ("sha256:shared", "mountable"),
+        ("sha256:code", "new"),
+    ]
+    assert plan.layers[1].source == "test/agents/b"
+    assert (plan.count("exists"), plan.count("mountable"), plan.count("new")) == (1, 1, 1)
+    assert plan.bytes("mountable") == len(b"shared")
+    assert plan.bytes("new") == 1000
+
+
+def test_plan_push_inspects_recent_tags_first() -> None:
+    registry = LocalRegistry()
+    # tags/list is lexical, so the latest version "v9" sorts after ten older ones
+    for i in range(10, 20):
+        registry.add_image("test/agents/a", f"v{i}", [(f"sha256:old-{i}", f"old-{i}".encode())])
+    registry.add_image("test/agents/a", "v9", [("sha256:base", b"base-layer")])
+
+    plan = plan_push(
+        _registry_client(registry),
+        "test/agents/a",
+        ["sha256:base"],
+        recent_tags={"test/agents/a": ["v9"]},
+    )
+
+    assert plan.count("exists") == 1
+    # every layer was found in the recent tag, the older ones are never inspected
+    assert [r for r in registry.requests if "/manifests/" in r] == ["GET /v2/test/agents/a/manifests/v9"]
+
+
+def test_plan_push_to_new_repository() -> None:
+    plan = plan_push(_registry_client(LocalRegistry()), "test/agents/new", ["sha256:a", "sha256:b"])
+    assert plan.count("new") == 2
+    assert plan.bytes("new") == 0
+
+
+def test_get_local_layer_sizes() -> None:
+    history = [
+        {"CreatedBy": "CMD", "Size": 0},
+        {"CreatedBy": "COPY", "Size": 300},
+        {"CreatedBy": "RUN", "Size": 200},
+        {"CreatedBy": "FROM", "Size": 100},
+    ]
+
+    assert get_local_layer_sizes(["sha256:a", "sha256:b", "sha256:c"], history) == {
+        "sha256:a": 100,
+        "sha256:b": 200,
+        "sha256:c": 300,
+    }
+    assert get_local_layer_sizes(["sha256:a"], history) == {}
@@ -1,8 +1,21 @@
+import os
 import pathlib
+import shutil
+import typing as t
+from unittest.mock import patch
 
 import pytest
 
-from dreadnode_cli.agent.templates.manager import TemplateManager
+from dreadnode_cli.agent.templates import manager as manager_module
+from dreadnode_cli.agent.templates.manager import TemplateManager, get_environment
+
+
+@pytest.fixture(autouse=True)
+def jinja_cache_path(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    path = tmp_path / "cache" / "jinja"
+    monkeypatch.setattr(manager_module, "JINJA_CACHE_PATH", path)
+    get_environment.cache_clear()
+    return path
 
 
 def test_manager_is_empty_when_no_templates(tmp_path: pathlib.Path) -> None:
@@ -219,3 +232,183 @@ def test_templates_install_from_dir_invalid_path(tmp_path: pathlib.Path) -> None
 
     with pytest.raises(Exception, match="Template directory '.*' does not exist"):
         TemplateManager().install_from_dir(source_dir / "nonexistent", tmp_path, {"name": "World"})
+
+
+def test_manager_lints_installed_template_pack(tmp_path: pathlib.Path, capsys: pytest.CaptureFixture[str]) -> None:
+    source = tmp_path / "source"
+    (source / "slow").mkdir(parents=True)
+    (source / "slow" / "manifest.yaml").write_text("description: slow")
+    (source / "slow" / "Dockerfile.j2").write_text("FROM python\nCOPY . /app\nRUN pip install -r /app/requirements.txt")
+    (source / "fast").mkdir(parents=True)
+    (source / "fast" / "manifest.yaml").write_text("description: fast")
+    (source / "fast" / "Dockerfile").write_text("FROM python:3.11")
+
+    TemplateManager(tmp_path / "templates").install_template_pack(source, "pack")
+
+    output = capsys.readouterr().out
+    assert "slow: 2 Dockerfile issue(s)" in output
+    assert "fast" not in output.split("Installing")[1].split("\n", 1)[1]
+
+
+def test_manager_loads_templates_from_index(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    (tmp_path / "pack" / "test").mkdir(parents=True)
+    (tmp_path / "pack" / "test" / "manifest.yaml").write_text("description: test\nstrikes: [Foo]")
+
+    assert list(TemplateManager(tmp_path).templates) == ["pack/test"]
+    assert (tmp_path / ".index.json").exists()
+
+    def fail(*args: t.Any, **kwargs: t.Any) -> None:
+        raise AssertionError("manifests should not be parsed")
+
+    # manifests are not parsed again while the index is fresh
+    monkeypatch.setattr(manager_module, "parse_yaml_raw_as", fail)
+    manager = TemplateManager(tmp_path)
+    assert list(manager.get_templates_for_strike("foo", "any")) == ["pack/test"]
+    assert manager.templates["pack/test"].manifest.strikes == ["Foo"]
+
+
+def test_manager_index_is_invalidated_by_changes(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "pack" / "a").mkdir(parents=True)
+    (tmp_path / "pack" / "a" / "manifest.yaml").write_text("description: a")
+    assert list(TemplateManager(tmp_path).templates) == ["pack/a"]
+
+    # a new template in an existing pack
+    (tmp_path / "pack" / "b").mkdir()
+    (tmp_path / "pack" / "b" / "manifest.yaml").write_text("description: b")
+    assert sorted(TemplateManager(tmp_path).templates) == ["pack/a", "pack/b"]
+
+    # an edited manifest
+    manifest_path = tmp_path / "pack" / "a" / "manifest.yaml"
+    manifest_path.write_text("description: changed")
+    os.utime(manifest_path, ns=(0, manifest_path.stat().st_mtime_ns + 1_000_000))
+    assert TemplateManager(tmp_path).templates["pack/a"].manifest.description == "changed"
+
+    # a removed pack
+    shutil.rmtree(tmp_path / "pack")
+    assert TemplateManager(tmp_path).templates == {}
+
+
+def test_manager_index_is_invalidated_by_pack_install(tmp_path: pathlib.Path) -> None:
+    manager = TemplateManager(tmp_path / "templates")
+    assert manager.templates == {}
+
+    (tmp_path / "source" / "test").mkdir(parents=True)
+    (tmp_path / "source" / "test" / "manifest.yaml").write_text("description: test")
+    manager.install_template_pack(tmp_path / "source", "pack")
+
+    assert list(manager.templates) == ["pack/test"]
+
+
+def test_manager_asks_before_installing_anything(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    source = tmp_path / "source"
+    (source / "src").mkdir(parents=True)
+    (source / "Dockerfile.j2").write_text("FROM {{ image }}")
+    for i in range(64):
+        (source / "src" / f"file{i}.py.j2").write_text(f"print({i}, '{{{{ name }}}}')")
+    (source / "weights.bin").write_bytes(b"\0" * 1024)
+
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    (dest / "Dockerfile").write_text("FROM keep")
+    (dest / "weights.bin").write_bytes(b"old")
+
+    asked: list[str] = []
+
+    def ask(prompt: str, **kwargs: t.Any) -> str:
+        # nothing is installed while prompting
+        assert not (dest / "src").exists()
+        asked.append(prompt)
+        return "n" if "Dockerfile" in prompt else "y"
+
+    monkeypatch.setattr("rich.prompt.Prompt.ask", ask)
+    TemplateManager(tmp_path / "templates").install_from_dir(source, dest, {"image": "python:3.11", "name": "x"})
+
+    assert len(asked) == 2
+    assert (dest / "Dockerfile").read_text() == "FROM keep"
+    assert (dest / "weights.bin").read_bytes() == b"\0" * 1024
+    assert (dest / "src" / "file63.py").read_text() == "print(63, 'x')"
+
+
+def test_manager_caches_compiled_templates(tmp_path: pathlib.Path, jinja_cache_path: pathlib.Path) -> None:
+    (tmp_path / "templates" / "pack" / "test").mkdir(parents=True)
+    (tmp_path / "templates" / "pack" / "test" / "manifest.yaml").write_text("description: test\nversion: 1.2.3")
+    (tmp_path / "templates" / "pack" / "test" / "Dockerfile.j2").write_text("FROM {{ image }}")
+
+    manager = TemplateManager(tmp_path / "templates")
+    for i in range(3):
+        (tmp_path / f"dest{i}").mkdir()
+        manager.install("pack/test", tmp_path / f"dest{i}", {"image": f"python:3.{i}"})
+        assert (tmp_path / f"dest{i}" / "Dockerfile").read_text() == f"FROM python:3.{i}"
+
+    # the environment is shared and templates are compiled once, in the pack and version cache
+    assert get_environment.cache_info().misses == 1
+    assert len(list((jinja_cache_path / "pack-1.2.3").iterdir())) == 1
+
+    # a fresh process reuses the compiled template
+    get_environment.cache_clear()
+    (tmp_path / "dest3").mkdir()
+    TemplateManager(tmp_path / "templates").install("pack/test", tmp_path / "dest3", {"image": "alpine"})
+    assert (tmp_path / "dest3" / "Dockerfile").read_text() == "FROM alpine"
+
+
+def test_manager_does_not_cache_ad_hoc_sources(tmp_path: pathlib.Path, jinja_cache_path: pathlib.Path) -> None:
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "Dockerfile.j2").write_text("FROM {{ image }}")
+    (tmp_path / "dest").mkdir()
+
+    TemplateManager(tmp_path / "templates").install_from_dir(source, tmp_path / "dest", {"image": "alpine"})
+
+    assert (tmp_path / "dest" / "Dockerfile").read_text() == "FROM alpine"
+    assert not jinja_cache_path.exists()
+
+
+def test_manager_syncs_template_pack_incrementally(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    source = tmp_path / "source"
+    (source / "a").mkdir(parents=True)
+    (source / "a" / "manifest.yaml").write_text("description: a")
+    (source / "a" / "Dockerfile").write_text("FROM python:3.11")
+    (source / "b" / "data").mkdir(parents=True)
+    (source / "b" / "manifest.yaml").write_text("description: b")
+    (source / "b" / "data" / "wordlist.txt").write_text("admin")
+
+    manager = TemplateManager(tmp_path / "templates")
+    result = manager.install_template_pack(source, "pack", origin="owner/pack@main", commit="c1")
+    assert len(result.added) == 4 and not result.changed and not result.removed
+
+    destination = tmp_path / "templates" / "pack"
+    assert (destination / ".pack-lock.json").exists()
+    assert manager.is_pack_up_to_date("pack", "owner/pack@main", "c1")
+    assert not manager.is_pack_up_to_date("pack", "owner/pack@main", "c2")
+    assert not manager.is_pack_up_to_date("pack", "owner/pack@main", None)
+
+    untouched_mtime = (destination / "a" / "Dockerfile").stat().st_mtime_ns
+
+    (source / "a" / "manifest.yaml").write_text("description: changed")
+    (source / "c").mkdir()
+    (source / "c" / "manifest.yaml").write_text("description: c")
+    shutil.rmtree(source / "b")
+
+    def ask(*args: t.Any, **kwargs: t.Any) -> str:
+        raise AssertionError("updates of the same pack should not prompt")
+
+    monkeypatch.setattr("rich.prompt.Prompt.ask", ask)
+    result = manager.install_template_pack(source, "pack", origin="owner/pack@main", commit="c2")
+
+    assert result.added == ["c/manifest.yaml"]
+    assert result.changed == ["a/manifest.yaml"]
+    assert result.removed == ["b/data/wordlist.txt", "b/manifest.yaml"]
+    assert not (destination / "b").exists()
+    assert (destination / "a" / "Dockerfile").stat().st_mtime_ns == untouched_mtime
+    assert sorted(manager.templates) == ["pack/a", "pack/c"]
+    assert manager.templates["pack/a"].manifest.description == "changed"
+
+
+def test_manager_prompts_before_replacing_another_pack(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "source").mkdir()
+    (tmp_path / "source" / "Dockerfile").write_text("FROM python:3.11")
+    manager = TemplateManager(tmp_path / "templates")
+    manager.install_template_pack(tmp_path / "source", "pack", origin="owner/pack@main")
+
+    with patch("rich.prompt.Prompt.ask", return_value="n"), pytest.raises(Exception, match="already exists"):
+        manager.install_template_pack(tmp_path / "source", "pack", origin="other/pack@main")
@@ -1,5 +1,5 @@
-import atexit
 import json
+import pathlib
 import time
 import typing as t
 from datetime import datetime, timezone
@@ -9,6 +9,7 @@ from uuid import UUID
 import httpx
 from pydantic import BaseModel
 from rich import print
+from rich.progress import Progress, TaskID
 
 from dreadnode_cli import __version__, utils
 from dreadnode_cli.config import UserConfig
@@ -19,6 +20,7 @@ from dreadnode_cli.defaults import (
     DEFAULT_TOKEN_MAX_TTL,
     PLATFORM_BASE_URL,
 )
+from dreadnode_cli.download import download_file
 
 
 class Token:
@@ -113,10 +115,11 @@ class Client:
         path: str,
         query_params: dict[str, str] | None = None,
         json_data: dict[str, t.Any] | None = None,
+        headers: dict[str, str] | None = None,
     ) -> httpx.Response:
         """Make a raw request to the API."""
 
-        return self._client.request(method, path, json=json_data, params=query_params)
+        return self._client.request(method, path, json=json_data, params=query_params, headers=headers)
 
     def request(
         self,
@@ -124,14 +127,19 @@ class Client:
         path: str,
         query_params: dict[str, str] | None = None,
         json_data: dict[str, t.Any] | None = None,
+        headers: dict[str, str] | None = None,
     ) -> httpx.Response:
         """Make a request to the API. Raise an exception for non-200 status codes."""
 
-        response = self._request(method, path, query_params, json_data)
+        response = self._request(method, path, query_params, json_data, headers)
 
         if response.status_code == 401:
             raise Exception("Authentication expired, use [bold]dreadnode login[/]")
 
+        # not modified, answering a conditional request
+        if response.status_code == 304:
+            return response
+
         try:
             response.raise_for_status()
             return response
@@ -217,11 +225,63 @@ class Client:
         response = self.request("GET", "/api/challenges")
         return [self.ChallengeResponse(**challenge) for challenge in response.json()]
 
-    def get_challenge_artifact(self, challenge: str, artifact_name: str) -> bytes:
-        """Get a challenge artifact."""
+    def list_challenges_if_modified(self, etag: str | None) -> tuple[list[ChallengeResponse] | None, str | None]:
+        """List all challenges unless they match the etag of a previous listing (None), with the new etag."""
+
+        response = self.request("GET", "/api/challenges", headers={"If-None-Match": etag} if etag else None)
+        if response.status_code == 304:
+            return None, etag
+
+        return [self.ChallengeResponse(**challenge) for challenge in response.json()], response.headers.get("ETag")
+
+    def list_challenge_artifacts(self, challenge: str) -> list[str]:
+        """List the artifact names of a challenge, raise a clear error if the server doesn't support it."""
 
-        response = self.request("GET", f"/api/artifacts/{challenge}/{artifact_name}")
-        return response.content
+        unsupported = f"The server can't list the artifacts of '{challenge}', pass the artifact names to download"
+
+        try:
+            response = self.request("GET", f"/api/artifacts/{challenge}")
+        except Exception as e:
+            # servers without the listing endpoint
+            if str(e).startswith(("404", "405")):
+                raise Exception(unsupported) from e
+            raise
+
+        try:
+            names = response.json()
+        except ValueError:
+            names = None
+
+        if not isinstance(names, list):
+            raise Exception(unsupported)
+
+        return [str(name) for name in names]
+
+    def download_challenge_artifact(
+        self,
+        challenge: str,
+        artifact_name: str,
+        destination: pathlib.Path,
+        *,
+        sha256: str | None = None,
+        progress: Progress | None = None,
+        total_task: TaskID | None = None,
+    ) -> pathlib.Path:
+        """Stream a challenge artifact to a file, resuming interrupted downloads."""
+
+        try:
+            return download_file(
+                f"/api/artifacts/{challenge}/{artifact_name}",
+                destination,
+                client=self._client,
+                sha256=sha256,
+                progress=progress,
+                total_task=total_task,
+            )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 401:
+                raise Exception("Authentication expired, use [bold]dreadnode login[/]") from e
+            raise Exception(self._get_error_message(e.response)) from e
 
     def submit_challenge_flag(self, challenge: str, flag: str) -> bool:
         """Submit a flag to a challenge."""
@@ -511,10 +571,10 @@ class Client:
         return [self.StrikeRunGroupResponse(**group) for group in response.json()]
 
 
-def create_client(*, profile: str | None = None) -> Client:
+def create_client(*, profile: str | None = None, user_config: UserConfig | None = None) -> Client:
     """Create an authenticated API client using stored configuration data."""
 
-    user_config = UserConfig.read()
+    user_config = user_config or UserConfig.read()
     config = user_config.get_server_config(profile)
 
     client = Client(config.url, cookies={"access_token": config.access_token, "refresh_token": config.refresh_token})
@@ -523,11 +583,11 @@ def create_client(*, profile: str | None = None) -> Client:
     if Token(config.refresh_token).is_expired():
         raise Exception("Authentication expired, use [bold]dreadnode login[/]")
 
-    def _flush_auth_changes() -> None:
-        """Flush the authentication data to disk if it has been updated."""
+    def _sync_auth_changes(response: httpx.Response) -> None:
+        """Queue the authentication data for writing if the server updated it."""
 
-        access_token = client._client.cookies.get("access_token")
-        refresh_token = client._client.cookies.get("refresh_token")
+        access_token = response.cookies.get("access_token")
+        refresh_token = response.cookies.get("refresh_token")
 
         changed: bool = False
         if access_token and access_token != config.access_token:
@@ -539,8 +599,8 @@ def create_client(*, profile: str | None = None) -> Client:
             config.refresh_token = refresh_token
 
         if changed:
-            user_config.set_server_config(config, profile).write()
+            user_config.set_server_config(config, profile).write_on_exit()
 
-    atexit.register(_flush_auth_changes)
+    client._client.event_hooks["response"].append(_sync_auth_changes)
 
     return client
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+
+from pydantic import BaseModel, ValidationError
+from rich import print
+
+from dreadnode_cli.defaults import ARCHIVES_CACHE_MAX_SIZE, ARCHIVES_CACHE_PATH
+from dreadnode_cli.download import DownloadStream, create_progress
+from dreadnode_cli.utils import CopyMode, copy_tree, extract_archive, get_repo_archive_source_path
+
+ENTRY_FILE = "entry.json"
+TREE_DIR = "tree"
+
+
+class ArchiveEntry(BaseModel):
+    url: str
+    # commit the archive was downloaded at, if known
+    commit: str | None = None
+    # etag of the archive response, used to revalidate archives without a known commit
+    etag: str | None = None
+    # size of the extracted tree in bytes
+    size: int = 0
+
+
+class ArchiveCache:
+    """
+    Extracted archives keyed by the commit they were downloaded at, or by URL (revalidated with its ETag)
+    when the commit is unknown. Entries are evicted least recently used first once the cache grows over max_size.
+    """
+
+    def __init__(self, path: pathlib.Path = ARCHIVES_CACHE_PATH, max_size: int = ARCHIVES_CACHE_MAX_SIZE) -> None:
+        self.path = path
+        self.max_size = max_size
+
+    @staticmethod
+    def key(url: str, commit: str | None = None, subpath: str | None = None) -> str:
+        suffix = f"-{hashlib.sha256(subpath.strip('/').encode()).hexdigest()[:12]}" if subpath else ""
+        if commit:
+            return f"commit-{commit}{suffix}"
+        return f"url-{hashlib.sha256(url.encode()).hexdigest()[:32]}{suffix}"
+
+    def get(self, key: str) -> ArchiveEntry | None:
+        entry_path = self.path / key / ENTRY_FILE
+        try:
+            entry = ArchiveEntry.model_validate_json(entry_path.read_text())
+        except (OSError, ValueError, ValidationError):
+            return None
+
+        # the entry file mtime tracks when the archive was last used
+        os.utime(entry_path)
+        return entry
+
+    def checkout(self, key: str, *, mode: CopyMode = "reflink", subpath: str | None = None) -> pathlib.Path:
+        """
+        Copy a cached tree into a new temporary directory the caller owns. With a subpath, only that folder
+        of the archive (under its single top-level folder) is copied.
+        """
+
+        tree = self.path / key / TREE_DIR
+        if subpath:
+            tree = get_repo_archive_source_path(tree) / subpath.strip("/")
+            if not tree.is_dir():
+                raise Exception(f"Path '{subpath}' not found in archive")
+
+        temp_dir = pathlib.Path(tempfile.mkdtemp())
+        copy_tree(tree, temp_dir, mode=mode)
+        return temp_dir
+
+    def put(self, key: str, entry: ArchiveEntry, tree: pathlib.Path) -> None:
+        """Store a copy of an extracted tree, then evict old entries if the cache is over its size limit."""
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        staging = pathlib.Path(tempfile.mkdtemp(dir=self.path, prefix=f".{key}-"))
+
+        try:
+            # copy on write where supported, the caller is free to modify its own tree
+            copy_tree(tree, staging / TREE_DIR, mode="reflink")
+            entry.size = sum(path.stat().st_size for path in (staging / TREE_DIR).rglob("*") if path.is_file())
+            (staging / ENTRY_FILE).write_text(entry.model_dump_json())
+
+            destination = self.path / key
+            if destination.exists():
+                shutil.rmtree(destination)
+            staging.rename(destination)
+        except OSError:
+            # the cache is only an optimization
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+
+        self.evict(keep=key)
+
+    def evict(self, *, keep: str | None = None) -> None:
+        entries: list[tuple[float, int, pathlib.Path]] = []
+        for directory in self.path.iterdir():
+            if directory.name.startswith(".") or directory.name == keep:
+                continue
+            try:
+                entry_path = directory / ENTRY_FILE
+                size = ArchiveEntry.model_validate_json(entry_path.read_text()).size
+                entries.append((entry_path.stat().st_mtime, size, directory))
+            except (OSError, ValueError, ValidationError):
+                shutil.rmtree(directory, ignore_errors=True)
+
+        kept = self.get(keep) if keep else None
+        total = sum(size for _, size, _ in entries) + (kept.size if kept else 0)
+
+        for _, size, directory in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
+
+
+def fetch_archive(
+    url: str,
+    *,
+    headers: dict[str, str] | None = None,
+    commit: str | None = None,
+    cache: ArchiveCache | None = None,
+    mode: CopyMode = "reflink",
+    subpath: str | None = None,
+) -> pathlib.Path:
+    """
+    Like download_and_unzip_archive, but served from the archive cache when the same commit was downloaded
+    before, or when the server confirms (304) that the archive at this URL didn't change. Subpath fetches
+    are cached on their own, but can also be served from a full archive of the same commit.
+    """
+
+    cache = cache or ArchiveCache()
+
+    if subpath and commit and cache.get(cache.key(url, commit)) is not None:
+        print(f":package: Using cached archive of {url} ({commit[:12]})")
+        return cache.checkout(cache.key(url, commit), mode=mode, subpath=subpath)
+
+    key = cache.key(url, commit, subpath)
+    entry = cache.get(key)
+
+    if entry is not None and commit:
+        print(f":package: Using cached archive of {url} ({commit[:12]})")
+        return cache.checkout(key, mode=mode)
+
+    request_headers = dict(headers or {})
+    if entry is not None and entry.etag:
+        request_headers["If-None-Match"] = entry.etag
+
+    temp_dir = pathlib.Path(tempfile.mkdtemp())
+
+    print(f":arrow_double_down: Downloading {url} ...")
+
+    try:
+        with create_progress() as progress, DownloadStream(url, headers=request_headers, progress=progress) as stream:
+            response = stream.open()
+            if response.status_code == 304 and entry is not None:
+                shutil.rmtree(temp_dir)
+                print(f":package: Using cached archive of {url}, not modified")
+                return cache.checkout(key, mode=mode)
+
+            etag = response.headers.get("ETag")
+            extract_archive(url, stream, temp_dir, content_type=stream.content_type, subpath=subpath)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    if commit or etag:
+        cache.put(key, ArchiveEntry(url=url, commit=commit, etag=etag), temp_dir)
+
+    return temp_dir
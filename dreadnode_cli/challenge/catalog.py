@@ -0,0 +1,171 @@
+import bisect
+import hashlib
+import pathlib
+import re
+import time
+import typing as t
+
+from pydantic import BaseModel, PrivateAttr
+
+from dreadnode_cli import api
+from dreadnode_cli.defaults import CHALLENGES_CACHE_PATH, CHALLENGES_CACHE_TTL
+
+Challenge = api.Client.ChallengeResponse
+
+# filterable fields, and the challenge values they are indexed from
+FILTER_FIELDS: dict[str, t.Callable[[Challenge], list[str]]] = {
+    "status": lambda challenge: [challenge.status],
+    "difficulty": lambda challenge: [challenge.difficulty],
+    "tag": lambda challenge: challenge.tags,
+    "author": lambda challenge: challenge.authors,
+    "text": lambda challenge: _words(f"{challenge.title} {challenge.lead}"),
+}
+
+# aliases accepted in filter expressions
+FILTER_ALIASES = {"tags": "tag", "authors": "author", "search": "text"}
+
+_FILTER_PATTERN = re.compile(r"^\s*(\w+)\s*(!?=)\s*(.*?)\s*$")
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+class ChallengeFilter(t.NamedTuple):
+    field: str
+    values: list[str]
+    negate: bool = False
+
+    @classmethod
+    def parse(cls, expression: str) -> "ChallengeFilter":
+        """
+        Parse a filter expression like 'tag=web', 'status!=completed' or 'difficulty=easy,medium' (any of the values).
+        A bare expression searches the challenges title and lead.
+        """
+
+        match = _FILTER_PATTERN.match(expression)
+        if match is None:
+            return cls("text", [expression])
+
+        field, operator, values = match.groups()
+        field = FILTER_ALIASES.get(field.lower(), field.lower())
+        if field not in FILTER_FIELDS:
+            raise Exception(f"Unknown filter field '{field}', use one of: {', '.join(FILTER_FIELDS)}")
+
+        return cls(field, [value.strip() for value in values.split(",") if value.strip()], operator == "!=")
+
+
+class ChallengeCatalog(BaseModel):
+    """
+    The challenges of a server cached locally per user (their status is), revalidated with its ETag once older
+    than CHALLENGES_CACHE_TTL, with an inverted index of 'field:value' tokens to the challenges they appear in.
+    """
+
+    url: str
+    user: str
+    etag: str | None = None
+    fetched_at: float = 0
+    challenges: list[Challenge] = []
+    index: dict[str, list[int]] = {}
+
+    # sorted text tokens, for prefix searches
+    _text_tokens: list[str] | None = PrivateAttr(default=None)
+
+    @staticmethod
+    def path_for(url: str, user: str) -> pathlib.Path:
+        return CHALLENGES_CACHE_PATH / f"{hashlib.sha256(f'{user}@{url}'.encode()).hexdigest()[:16]}.json"
+
+    @classmethod
+    def build(cls, url: str, user: str, challenges: list[Challenge], etag: str | None = None) -> "ChallengeCatalog":
+        index: dict[str, list[int]] = {}
+        for position, challenge in enumerate(challenges):
+            for field, values in FILTER_FIELDS.items():
+                for value in {value.lower() for value in values(challenge)}:
+                    index.setdefault(f"{field}:{value}", []).append(position)
+
+        return cls(url=url, user=user, etag=etag, fetched_at=time.time(), challenges=challenges, index=index)
+
+    @classmethod
+    def read(cls, url: str, user: str) -> "ChallengeCatalog | None":
+        """Read the cached catalog of a server for a user, None if missing or unreadable."""
+
+        try:
+            catalog = cls.model_validate_json(cls.path_for(url, user).read_text())
+        except Exception:
+            return None
+
+        return catalog if (catalog.url, catalog.user) == (url, user) else None
+
+    def write(self) -> None:
+        path = self.path_for(self.url, self.user)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(".tmp")
+            temp_path.write_text(self.model_dump_json())
+            temp_path.replace(path)
+        except OSError:
+            pass
+
+    @classmethod
+    def invalidate(cls, url: str, user: str) -> None:
+        cls.path_for(url, user).unlink(missing_ok=True)
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() - self.fetched_at < CHALLENGES_CACHE_TTL
+
+    def _lookup(self, field: str, value: str) -> set[int]:
+        value = value.lower()
+        if field != "text":
+            return set(self.index.get(f"{field}:{value}", []))
+
+        if self._text_tokens is None:
+            self._text_tokens = sorted(token for token in self.index if token.startswith("text:"))
+
+        # every word of the search must prefix a word of the challenge
+        matches: set[int] | None = None
+        for word in _words(value):
+            prefix = f"text:{word}"
+            word_matches: set[int] = set()
+            for position in range(bisect.bisect_left(self._text_tokens, prefix), len(self._text_tokens)):
+                token = self._text_tokens[position]
+                if not token.startswith(prefix):
+                    break
+                word_matches.update(self.index[token])
+            matches = word_matches if matches is None else matches & word_matches
+
+        return matches or set()
+
+    def filter(self, filters: list[ChallengeFilter]) -> list[Challenge]:
+        """Return the challenges matching all the filters, in catalog order."""
+
+        selected = set(range(len(self.challenges)))
+        for challenge_filter in filters:
+            matches: set[int] = set()
+            for value in challenge_filter.values:
+                matches |= self._lookup(challenge_filter.field, value)
+            selected = selected - matches if challenge_filter.negate else selected & matches
+
+        return [self.challenges[position] for position in sorted(selected)]
+
+
+def get_challenge_catalog(client: api.Client, user: str, *, refresh: bool = False) -> ChallengeCatalog:
+    """
+    Return the cached challenges of the client server for the user it's authenticated as. Once stale (or when
+    refreshing), the server is asked whether they changed since they were fetched, and they are only downloaded
+    again if so.
+    """
+
+    url = client._base_url
+    catalog = ChallengeCatalog.read(url, user)
+    if catalog is not None and catalog.is_fresh and not refresh:
+        return catalog
+
+    challenges, etag = client.list_challenges_if_modified(catalog.etag if catalog is not None else None)
+    if challenges is None and catalog is not None:
+        catalog.fetched_at = time.time()
+    else:
+        catalog = ChallengeCatalog.build(url, user, challenges or [], etag)
+
+    catalog.write()
+    return catalog
@@ -1,13 +1,37 @@
+import asyncio
+import builtins
+import contextlib
 import enum
 import pathlib
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 
 import typer
 from rich import box, print
+from rich.progress import MofNCompleteColumn, Progress
 from rich.table import Table
 
 import dreadnode_cli.api as api
-from dreadnode_cli.utils import pretty_cli
+from dreadnode_cli.challenge.catalog import ChallengeCatalog, ChallengeFilter, get_challenge_catalog
+from dreadnode_cli.challenge.flags import FlagHistory, FlagSubmission, read_flags, submit_flags
+from dreadnode_cli.challenge.query import (
+    Checkpoint,
+    QueryCache,
+    get_score_url,
+    is_trusted_url,
+    read_inputs,
+    run_queries,
+)
+from dreadnode_cli.config import UserConfig
+from dreadnode_cli.defaults import (
+    DEFAULT_ARTIFACT_DOWNLOAD_CONCURRENCY,
+    DEFAULT_FLAG_SUBMIT_CONCURRENCY,
+    DEFAULT_FLAG_SUBMIT_RATE,
+    DEFAULT_QUERY_CONCURRENCY,
+    DEFAULT_QUERY_RATE,
+)
+from dreadnode_cli.download import create_progress
+from dreadnode_cli.ext.typer import pretty_cli
 
 cli = typer.Typer(no_args_is_help=True)
 
@@ -39,26 +63,56 @@ def format_difficulty(difficulty: str) -> str:
     return ":skull:" * map_difficulty(difficulty)
 
 
+# sort keys of the challenges, combined into one key when sorting by several
+SORT_KEYS: dict[Sorting, t.Callable[[api.Client.ChallengeResponse], t.Any]] = {
+    Sorting.by_difficulty: lambda x: map_difficulty(x.difficulty),
+    Sorting.by_status: lambda x: x.status,
+    Sorting.by_title: lambda x: x.title,
+    Sorting.by_authors: lambda x: ", ".join(x.authors),
+    Sorting.by_tags: lambda x: ", ".join(x.tags),
+}
+
+
 @cli.command(help="List challenges")
 @pretty_cli
 def list(
-    sorting: t.Annotated[Sorting, typer.Option("--sort-by", help="The sorting order")] = Sorting.none,
+    sorting: t.Annotated[
+        builtins.list[Sorting] | None,
+        typer.Option("--sort-by", help="The sorting keys, can be repeated to sort by several"),
+    ] = None,
     sorting_order: t.Annotated[
         SortingOrder, typer.Option("--sort-order", help="The sorting order")
     ] = SortingOrder.ascending,
+    filters: t.Annotated[
+        builtins.list[str] | None,
+        typer.Option(
+            "--filter",
+            "-f",
+            help="Filter expression like 'tag=web', 'status!=completed', 'difficulty=easy,medium' or text to search, can be repeated",
+        ),
+    ] = None,
+    refresh: t.Annotated[
+        bool, typer.Option("--refresh", "-r", help="Check the server for changes even if the cache is fresh")
+    ] = False,
+    keys: t.Annotated[bool, typer.Option("--keys", help="Only print the challenge keys, one per line")] = False,
 ) -> None:
-    challenges = api.create_client().list_challenges()
-
-    if sorting == Sorting.by_difficulty:
-        challenges.sort(key=lambda x: map_difficulty(x.difficulty), reverse=sorting_order == SortingOrder.descending)
-    elif sorting == Sorting.by_status:
-        challenges.sort(key=lambda x: x.status, reverse=sorting_order == SortingOrder.descending)
-    elif sorting == Sorting.by_title:
-        challenges.sort(key=lambda x: x.title, reverse=sorting_order == SortingOrder.descending)
-    elif sorting == Sorting.by_authors:
-        challenges.sort(key=lambda x: ", ".join(x.authors), reverse=sorting_order == SortingOrder.descending)
-    elif sorting == Sorting.by_tags:
-        challenges.sort(key=lambda x: ", ".join(x.tags), reverse=sorting_order == SortingOrder.descending)
+    user_config = UserConfig.read()
+    catalog = get_challenge_catalog(
+        api.create_client(user_config=user_config), user_config.get_server_config().username, refresh=refresh
+    )
+    challenges = catalog.filter([ChallengeFilter.parse(expression) for expression in filters or []])
+
+    sort_keys = [SORT_KEYS[key] for key in sorting or [] if key in SORT_KEYS]
+    if sort_keys:
+        challenges.sort(
+            key=lambda x: tuple(sort_key(x) for sort_key in sort_keys),
+            reverse=sorting_order == SortingOrder.descending,
+        )
+
+    if keys:
+        for challenge in challenges:
+            print(challenge.key)
+        return
 
     table = Table(box=box.ROUNDED)
     table.add_column("Title")
@@ -81,36 +135,242 @@ def list(
     print(table)
 
 
-@cli.command(help="Download a challenge artifact.")
+@cli.command(help="Download challenge artifacts.")
 @pretty_cli
 def artifact(
     challenge_id: t.Annotated[str, typer.Argument(help="Challenge name")],
-    artifact_name: t.Annotated[str, typer.Argument(help="Artifact name")],
+    artifact_names: t.Annotated[
+        builtins.list[str] | None, typer.Argument(help="Artifact names", show_default=False)
+    ] = None,
+    all_artifacts: t.Annotated[
+        bool, typer.Option("--all", help="Download all the challenge artifacts, if the server can list them.")
+    ] = False,
     output_path: t.Annotated[
         pathlib.Path,
         typer.Option(
-            "--output", "-o", help="The directory to save the artifact to.", file_okay=False, resolve_path=True
+            "--output", "-o", help="The directory to save the artifacts to.", file_okay=False, resolve_path=True
         ),
     ] = pathlib.Path("."),
+    sha256: t.Annotated[
+        str | None,
+        typer.Option("--sha256", help="Expected SHA-256 of the artifact, verified after download (single artifact)."),
+    ] = None,
+    concurrency: t.Annotated[
+        int, typer.Option("--concurrency", "-j", help="How many artifacts to download at once.", min=1)
+    ] = DEFAULT_ARTIFACT_DOWNLOAD_CONCURRENCY,
+) -> None:
+    client = api.create_client()
+
+    if all_artifacts:
+        artifact_names = client.list_challenge_artifacts(challenge_id)
+        if not artifact_names:
+            raise Exception(f"Challenge '{challenge_id}' has no artifacts.")
+    elif not artifact_names:
+        raise Exception("Pass the artifact names to download, or --all.")
+
+    # names listed by the server are written under the output directory as they are
+    for artifact_name in artifact_names:
+        if artifact_name in ("", ".", "..") or "/" in artifact_name or "\\" in artifact_name:
+            raise Exception(f"Invalid artifact name '{artifact_name}', it must be a file name.")
+
+    if sha256 is not None and len(artifact_names) > 1:
+        raise Exception("--sha256 can only be used when downloading a single artifact.")
+
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    failed: dict[str, Exception] = {}
+
+    with create_progress() as progress:
+        total_task = progress.add_task(f"{len(artifact_names)} artifacts", total=0) if len(artifact_names) > 1 else None
+
+        def download(artifact_name: str) -> None:
+            try:
+                client.download_challenge_artifact(
+                    challenge_id,
+                    artifact_name,
+                    output_path / artifact_name,
+                    sha256=sha256,
+                    progress=progress,
+                    total_task=total_task,
+                )
+                progress.console.print(f":floppy_disk: Saved to [bold]{output_path / artifact_name}[/]")
+            except Exception as e:
+                failed[artifact_name] = e
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for _ in executor.map(download, artifact_names):
+                pass
+
+    if failed:
+        raise Exception(
+            "Failed to download "
+            + ", ".join(f"[bold]{artifact_name}[/] ({error})" for artifact_name, error in failed.items())
+        )
+
+
+@cli.command(help="Send inputs to a challenge scoring endpoint")
+@pretty_cli
+def query(
+    challenge: t.Annotated[str, typer.Argument(help="Challenge name")],
+    inputs_path: t.Annotated[
+        pathlib.Path,
+        typer.Option(
+            "--inputs", "-i", help="JSONL file with one input per line", exists=True, dir_okay=False, resolve_path=True
+        ),
+    ],
+    output_path: t.Annotated[
+        pathlib.Path | None,
+        typer.Option("--output", "-o", help="JSONL file to append the results to", dir_okay=False, resolve_path=True),
+    ] = None,
+    url: t.Annotated[
+        str | None, typer.Option("--url", help="Scoring endpoint, defaults to the challenge /score endpoint")
+    ] = None,
+    concurrency: t.Annotated[
+        int, typer.Option("--concurrency", "-j", help="How many queries to keep in flight", min=1)
+    ] = DEFAULT_QUERY_CONCURRENCY,
+    rate: t.Annotated[
+        float, typer.Option("--rate", help="Maximum queries sent per second, 0 for no limit", min=0)
+    ] = DEFAULT_QUERY_RATE,
+    no_cache: t.Annotated[
+        bool, typer.Option("--no-cache", help="Send every input, even if the same payload was answered before")
+    ] = False,
+    restart: t.Annotated[
+        bool, typer.Option("--restart", help="Ignore the checkpoint of a previous run and start over")
+    ] = False,
 ) -> None:
-    content = api.create_client().get_challenge_artifact(challenge_id, artifact_name)
-    file_path = output_path / artifact_name
-    file_path.write_bytes(content)
+    client = api.create_client()
+
+    url = url or get_score_url(client._base_url, challenge)
+
+    output_path = output_path or pathlib.Path(f"{challenge}-results.jsonl").resolve()
+    checkpoint_path = output_path.with_name(output_path.name + ".checkpoint")
+    if restart:
+        checkpoint_path.unlink(missing_ok=True)
+
+    total = sum(1 for _ in read_inputs(inputs_path))
+    checkpoint = Checkpoint(checkpoint_path)
+    if checkpoint.done:
+        print(f":arrows_counterclockwise: Resuming, {len(checkpoint.done)} inputs already answered")
+
+    print(f":dart: Querying [bold]{url}[/] with {total} inputs ...")
+
+    # reuse the authentication of the api client, unless querying some other server
+    cookies = None
+    if is_trusted_url(url, client._base_url, challenge):
+        cookies = {cookie.name: cookie.value for cookie in client._client.cookies.jar if cookie.value is not None}
+    else:
+        print(f":warning: [bold]{url}[/] isn't a platform endpoint, querying it without your credentials")
 
-    print(f":floppy_disk: Saved to [bold]{file_path}[/]")
+    with Progress(*Progress.get_default_columns(), MofNCompleteColumn(), transient=True) as progress:
+        task = progress.add_task("queries", total=total, completed=len(checkpoint.done))
+        try:
+            stats = asyncio.run(
+                run_queries(
+                    url,
+                    read_inputs(inputs_path),
+                    output_path,
+                    checkpoint=checkpoint,
+                    cache=None if no_cache else QueryCache(url),
+                    cookies=cookies,
+                    concurrency=concurrency,
+                    rate=rate,
+                    on_result=lambda _: progress.advance(task),
+                )
+            )
+        finally:
+            checkpoint.close()
 
+    print(
+        f":floppy_disk: {stats.sent} sent, {stats.cached} cached, {stats.skipped} already answered, "
+        f"{stats.failed} failed, results in [bold]{output_path}[/]"
+    )
+    if stats.failed:
+        print(":repeat: Run the same command again to retry the failed inputs")
 
-@cli.command(help="Submit a flag to a challenge")
+
+@cli.command(help="Submit flags to a challenge")
 @pretty_cli
 def submit_flag(
     challenge: t.Annotated[str, typer.Argument(help="Challenge name")],
-    flag: t.Annotated[str, typer.Argument(help="Challenge flag")],
+    flag: t.Annotated[str | None, typer.Argument(help="Challenge flag", show_default=False)] = None,
+    from_file: t.Annotated[
+        pathlib.Path | None,
+        typer.Option(
+            "--from-file",
+            "-f",
+            help="Submit the flags of a file (one per line) until one is correct",
+            exists=True,
+            dir_okay=False,
+            resolve_path=True,
+        ),
+    ] = None,
+    concurrency: t.Annotated[
+        int, typer.Option("--concurrency", "-j", help="How many flags to submit at once", min=1)
+    ] = DEFAULT_FLAG_SUBMIT_CONCURRENCY,
+    rate: t.Annotated[
+        float, typer.Option("--rate", help="Maximum flags submitted per second, 0 for no limit", min=0)
+    ] = DEFAULT_FLAG_SUBMIT_RATE,
+    no_history: t.Annotated[
+        bool, typer.Option("--no-history", help="Submit flags even if they were already found to be incorrect")
+    ] = False,
 ) -> None:
-    print(f":pirate_flag: submitting flag to challenge [bold]{challenge}[/] ...")
+    if (flag is None) == (from_file is None):
+        raise Exception("Pass either a flag or --from-file.")
+
+    user_config = UserConfig.read()
+    client = api.create_client(user_config=user_config)
+    history = None if no_history else FlagHistory.read()
+    counts = {"incorrect": 0, "known": 0}
+    errors: builtins.list[str] = []
+
+    def on_result(submission: FlagSubmission) -> None:
+        if submission.error is not None:
+            errors.append(submission.error)
+            if from_file is not None:
+                print(f":warning: Failed to submit [bold]{submission.flag}[/]: {submission.error}")
+        elif submission.known and not submission.correct:
+            counts["known"] += 1
+        elif not submission.correct:
+            counts["incorrect"] += 1
 
-    correct = api.create_client().submit_challenge_flag(challenge, flag)
+    if from_file is not None:
+        print(f":pirate_flag: submitting flags from [bold]{from_file}[/] to challenge [bold]{challenge}[/] ...")
+    else:
+        print(f":pirate_flag: submitting flag to challenge [bold]{challenge}[/] ...")
+
+    with from_file.open() if from_file is not None else contextlib.nullcontext([flag or ""]) as lines:
+        try:
+            correct_flag = submit_flags(
+                lambda candidate: client.submit_challenge_flag(challenge, candidate),
+                challenge,
+                read_flags(lines),
+                history=history,
+                concurrency=concurrency,
+                rate=rate,
+                on_result=on_result,
+            )
+        finally:
+            if history is not None:
+                history.write()
 
-    if correct:
-        print(":tada: The flag was correct. Congrats!")
+    if correct_flag is not None:
+        # the challenge status changed
+        ChallengeCatalog.invalidate(client._base_url, user_config.get_server_config().username)
+        print(
+            f":tada: The flag [bold]{correct_flag}[/] was correct. Congrats!"
+            if from_file
+            else ":tada: The flag was correct. Congrats!"
+        )
+        return
+
+    if from_file is not None:
+        print(
+            f":cross_mark: No correct flag, {counts['incorrect']} incorrect, "
+            f"{counts['known']} skipped as already incorrect, {len(errors)} failed."
+        )
+    elif errors:
+        raise Exception(errors[0])
+    elif counts["known"]:
+        print(":cross_mark: The flag was already found to be incorrect, use --no-history to submit it again.")
     else:
         print(":cross_mark: The flag was incorrect. Keep trying!")
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import BaseModel
+
+from dreadnode_cli.challenge.query import RateLimiter
+from dreadnode_cli.config import locked
+from dreadnode_cli.defaults import FLAG_HISTORY_PATH
+
+
+class FlagHistory(BaseModel):
+    """Outcome of the flags submitted to challenges, keyed by challenge and flag hash (flags aren't stored)."""
+
+    submissions: dict[str, bool] = {}
+
+    @staticmethod
+    def _key(challenge: str, flag: str) -> str:
+        return f"{challenge}:{hashlib.sha256(flag.encode()).hexdigest()}"
+
+    @classmethod
+    def read(cls) -> "FlagHistory":
+        """Read the history from the file system or return an empty instance if missing or unreadable."""
+
+        try:
+            return cls.model_validate_json(FLAG_HISTORY_PATH.read_text())
+        except Exception:
+            return cls()
+
+    def write(self) -> None:
+        """Write the history under a lock, along with the submissions written by other processes since read."""
+
+        FLAG_HISTORY_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with locked(FLAG_HISTORY_PATH):
+            # submissions are only ever added, so ours are merged over the current ones
+            self.submissions = {**FlagHistory.read().submissions, **self.submissions}
+
+            temp_path = FLAG_HISTORY_PATH.with_name(f"{FLAG_HISTORY_PATH.name}.{os.getpid()}.tmp")
+            temp_path.write_text(self.model_dump_json())
+            temp_path.replace(FLAG_HISTORY_PATH)
+
+    def get(self, challenge: str, flag: str) -> bool | None:
+        """Whether the flag was correct, None if it was never submitted."""
+
+        return self.submissions.get(self._key(challenge, flag))
+
+    def add(self, challenge: str, flag: str, correct: bool) -> "FlagHistory":
+        self.submissions[self._key(challenge, flag)] = correct
+        return self
+
+
+class FlagSubmission(t.NamedTuple):
+    flag: str
+    # None if the submission failed
+    correct: bool | None
+    error: str | None = None
+    # answered from the history
+    known: bool = False
+
+
+def read_flags(lines: t.Iterable[str]) -> t.Iterator[str]:
+    """Yield the non empty, stripped and not yet seen flags of some lines."""
+
+    seen: set[str] = set()
+    for line in lines:
+        flag = line.strip()
+        if flag and flag not in seen:
+            seen.add(flag)
+            yield flag
+
+
+def submit_flags(
+    submit: t.Callable[[str], bool],
+    challenge: str,
+    flags: t.Iterable[str],
+    *,
+    history: FlagHistory | None = None,
+    concurrency: int = 4,
+    rate: float = 2,
+    on_result: t.Callable[[FlagSubmission], None] | None = None,
+) -> str | None:
+    """
+    Submit flags with `concurrency` submissions in flight and at most `rate` started per second, stopping at the
+    first correct one, which is returned. Flags known to be wrong from the history are skipped, and every outcome
+    is added to it. Submissions already in flight when the correct flag is found still complete.
+    """
+
+    limiter = RateLimiter(rate)
+    slots = threading.BoundedSemaphore(concurrency)
+    lock = threading.Lock()
+    found = threading.Event()
+    correct_flags: list[str] = []
+
+    def report(submission: FlagSubmission) -> None:
+        with lock:
+            if submission.correct:
+                correct_flags.append(submission.flag)
+                found.set()
+            if history is not None and submission.correct is not None and not submission.known:
+                history.add(challenge, submission.flag, submission.correct)
+            if on_result is not None:
+                on_result(submission)
+
+    def attempt(flag: str) -> None:
+        try:
+            limiter.wait()
+            if found.is_set():
+                return
+            try:
+                report(FlagSubmission(flag, submit(flag)))
+            except Exception as e:
+                report(FlagSubmission(flag, None, str(e)))
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for flag in flags:
+            known = history.get(challenge, flag) if history is not None else None
+            if known is not None:
+                report(FlagSubmission(flag, known, known=True))
+                if known:
+                    break
+                continue
+
+            slots.acquire()
+            if found.is_set():
+                slots.release()
+                break
+            executor.submit(attempt, flag)
+
+    return correct_flags[0] if correct_flags else None
@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import json
+import pathlib
+import threading
+import time
+import typing as t
+
+import httpx
+
+from dreadnode_cli.defaults import QUERY_CACHE_PATH
+
+# how many times a query is retried after a rate limit or server error
+QUERY_RETRIES = 3
+# base delay in seconds between retries, doubled on every attempt unless the server sends Retry-After
+QUERY_RETRY_DELAY = 1.0
+# responses worth retrying
+QUERY_RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class QueryStats(t.NamedTuple):
+    sent: int = 0
+    cached: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+
+def read_inputs(path: pathlib.Path) -> t.Iterator[tuple[int, t.Any]]:
+    """Read the inputs of a JSONL file with their line index, lines that aren't JSON are sent as strings."""
+
+    with path.open() as file:
+        for index, line in enumerate(file):
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            try:
+                yield index, json.loads(line)
+            except json.JSONDecodeError:
+                yield index, line
+
+
+def get_score_url(platform_url: str, challenge: str) -> str:
+    """The scoring endpoint of a challenge, served from its own subdomain of the platform."""
+
+    base_url = httpx.URL(platform_url)
+    return f"{base_url.scheme}://{challenge}.{base_url.host}/score"
+
+
+def is_trusted_url(url: str, platform_url: str, challenge: str) -> bool:
+    """Whether a URL is on the platform or challenge host, the only ones the platform credentials are sent to."""
+
+    target, base_url = httpx.URL(url), httpx.URL(platform_url)
+    return target.scheme == base_url.scheme and target.host in (base_url.host, f"{challenge}.{base_url.host}")
+
+
+class RateLimiter:
+    """Spaces out requests so no more than `rate` start every second, shared by threads or asyncio tasks."""
+
+    def __init__(self, rate: float) -> None:
+        self._interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Reserve the next slot, returning how long to wait for it."""
+
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+            return delay
+
+    def wait(self) -> None:
+        if (delay := self._reserve()) > 0:
+            time.sleep(delay)
+
+    async def wait_async(self) -> None:
+        if (delay := self._reserve()) > 0:
+            await asyncio.sleep(delay)
+
+
+class QueryCache:
+    """Results of previous queries to an endpoint, keyed by the hash of their payload, stored as JSONL."""
+
+    def __init__(self, url: str, path: pathlib.Path | None = None) -> None:
+        self.path = path or QUERY_CACHE_PATH / f"{hashlib.sha256(url.encode()).hexdigest()[:16]}.jsonl"
+        self._results: dict[str, t.Any] = {}
+
+        try:
+            with self.path.open() as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                        self._results[entry["key"]] = entry["result"]
+                    except (ValueError, KeyError):
+                        # a partial line left by an interrupted run
+                        continue
+        except OSError:
+            pass
+
+    @staticmethod
+    def key(payload: t.Any) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+    def get(self, key: str) -> t.Any:
+        return self._results.get(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._results
+
+    def put(self, key: str, result: t.Any) -> None:
+        self._results[key] = result
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a") as file:
+            file.write(json.dumps({"key": key, "result": result}) + "\n")
+
+
+class Checkpoint:
+    """Indices of the inputs already answered, appended to a file so an interrupted run can be resumed."""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self.done: set[int] = set()
+
+        if path.exists():
+            for line in path.read_text().splitlines():
+                if line.strip().isdigit():
+                    self.done.add(int(line))
+
+        self._file = path.open("a")
+
+    def mark(self, index: int) -> None:
+        self.done.add(index)
+        self._file.write(f"{index}\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+async def _score(
+    client: httpx.AsyncClient, url: str, payload: t.Any, limiter: RateLimiter, retries: int
+) -> tuple[t.Any, str | None]:
+    """Send a payload to the scoring endpoint, returning its result or the error that ended the attempts."""
+
+    for attempt in range(retries + 1):
+        await limiter.wait_async()
+        try:
+            response = await client.post(url, json={"data": payload})
+        except httpx.TransportError as e:
+            error = str(e) or type(e).__name__
+        else:
+            if response.is_success:
+                try:
+                    return response.json(), None
+                except ValueError:
+                    return response.text, None
+
+            error = f"{response.status_code}: {response.text[:200]}"
+            if response.status_code not in QUERY_RETRY_STATUS_CODES:
+                return None, error
+
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit() and attempt < retries:
+                await asyncio.sleep(int(retry_after))
+                continue
+
+        if attempt < retries:
+            await asyncio.sleep(QUERY_RETRY_DELAY * 2**attempt)
+
+    return None, error
+
+
+async def run_queries(
+    url: str,
+    inputs: t.Iterable[tuple[int, t.Any]],
+    output: pathlib.Path,
+    *,
+    checkpoint: Checkpoint,
+    cache: QueryCache | None = None,
+    cookies: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+    concurrency: int = 8,
+    rate: float = 5,
+    retries: int = QUERY_RETRIES,
+    on_result: t.Callable[[dict[str, t.Any]], None] | None = None,
+) -> QueryStats:
+    """
+    Send every input to a scoring endpoint with `concurrency` requests in flight and at most `rate` started per
+    second, appending a JSONL record per answered input to the output as results arrive. Inputs already in the
+    checkpoint are skipped, inputs with a known payload are answered from the cache (or from the request in flight
+    for the same payload). Failed inputs are recorded but not checkpointed, so a resumed run tries them again.
+    """
+
+    limiter = RateLimiter(rate)
+    queue: asyncio.Queue[tuple[int, t.Any] | None] = asyncio.Queue(maxsize=concurrency * 2)
+    in_flight: dict[str, asyncio.Future[tuple[t.Any, str | None]]] = {}
+    counts = {"sent": 0, "cached": 0, "skipped": 0, "failed": 0}
+
+    with output.open("a") as file:
+
+        def record(index: int, payload: t.Any, result: t.Any, error: str | None, cached: bool) -> None:
+            entry: dict[str, t.Any] = {"index": index, "input": payload}
+            if error is None:
+                entry["result"] = result
+                entry["cached"] = cached
+            else:
+                entry["error"] = error
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+
+            if error is None:
+                checkpoint.mark(index)
+            if on_result is not None:
+                on_result(entry)
+
+        async def answer(index: int, payload: t.Any, client: httpx.AsyncClient) -> None:
+            key = QueryCache.key(payload)
+
+            if cache is not None and key in cache:
+                counts["cached"] += 1
+                record(index, payload, cache.get(key), None, True)
+                return
+
+            # an identical payload is already being sent
+            if key in in_flight:
+                result, error = await asyncio.shield(in_flight[key])
+                counts["cached" if error is None else "failed"] += 1
+                record(index, payload, result, error, True)
+                return
+
+            future: asyncio.Future[tuple[t.Any, str | None]] = asyncio.get_running_loop().create_future()
+            in_flight[key] = future
+            try:
+                result, error = await _score(client, url, payload, limiter, retries)
+                future.set_result((result, error))
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                del in_flight[key]
+
+            counts["sent" if error is None else "failed"] += 1
+            if error is None and cache is not None:
+                cache.put(key, result)
+            record(index, payload, result, error, False)
+
+        async def worker(client: httpx.AsyncClient) -> None:
+            while (item := await queue.get()) is not None:
+                await answer(*item, client)
+
+        async with httpx.AsyncClient(cookies=cookies, headers=headers, timeout=30) as client:
+            workers = [asyncio.create_task(worker(client)) for _ in range(concurrency)]
+
+            try:
+                for index, payload in inputs:
+                    if index in checkpoint.done:
+                        counts["skipped"] += 1
+                        continue
+                    await queue.put((index, payload))
+
+                for _ in workers:
+                    await queue.put(None)
+
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+
+    return QueryStats(**counts)
@@ -0,0 +1,134 @@
+import pathlib
+import time
+
+import httpx
+import pytest
+
+from dreadnode_cli import api
+from dreadnode_cli.challenge import catalog as catalog_module
+from dreadnode_cli.challenge.catalog import ChallengeCatalog, ChallengeFilter, get_challenge_catalog
+
+CHALLENGES = [
+    {
+        "authors": ["alice"],
+        "difficulty": "easy",
+        "key": "pieceofcake",
+        "lead": "Extract the secret from a chatbot",
+        "name": "pieceofcake",
+        "status": "completed",
+        "title": "Piece of Cake",
+        "tags": ["prompt injection"],
+    },
+    {
+        "authors": ["bob", "alice"],
+        "difficulty": "medium",
+        "key": "bear1",
+        "lead": "Find the hidden word in the bear dataset",
+        "name": "bear1",
+        "status": "not_started",
+        "title": "Bear 1",
+        "tags": ["data analysis"],
+    },
+    {
+        "authors": ["carol"],
+        "difficulty": "hard",
+        "key": "phantomcheque",
+        "lead": "Forge a cheque the scanner approves",
+        "name": "phantomcheque",
+        "status": "not_started",
+        "title": "Phantom Cheque",
+        "tags": ["prompt injection", "vision"],
+    },
+]
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    monkeypatch.setattr(catalog_module, "CHALLENGES_CACHE_PATH", tmp_path)
+    return tmp_path
+
+
+class Server:
+    def __init__(self, etag: str = '"v1"') -> None:
+        self.etag = etag
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304)
+        return httpx.Response(200, json=CHALLENGES, headers={"ETag": self.etag})
+
+    def client(self) -> api.Client:
+        client = api.Client("http://test.com")
+        client._client = httpx.Client(transport=httpx.MockTransport(self), base_url="http://test.com")
+        return client
+
+
+def _keys(challenges: list[api.Client.ChallengeResponse]) -> list[str]:
+    return [challenge.key for challenge in challenges]
+
+
+@pytest.mark.parametrize(
+    "expressions, expected",
+    [
+        ([], ["pieceofcake", "bear1", "phantomcheque"]),
+        (["tag=prompt injection"], ["pieceofcake", "phantomcheque"]),
+        (["tags=Vision,data analysis"], ["bear1", "phantomcheque"]),
+        (["status!=completed"], ["bear1", "phantomcheque"]),
+        (["author=alice", "difficulty=medium"], ["bear1"]),
+        (["cheq"], ["phantomcheque"]),
+        (["text=secret chat"], ["pieceofcake"]),
+        (["text=secret bear"], []),
+    ],
+)
+def test_catalog_filter(expressions: list[str], expected: list[str]) -> None:
+    catalog = ChallengeCatalog.build(
+        "http://test.com", "test", [api.Client.ChallengeResponse.model_validate(c) for c in CHALLENGES]
+    )
+
+    assert _keys(catalog.filter([ChallengeFilter.parse(expression) for expression in expressions])) == expected
+
+
+def test_catalog_filter_unknown_field() -> None:
+    with pytest.raises(Exception, match="Unknown filter field 'color'"):
+        ChallengeFilter.parse("color=red")
+
+
+def test_get_challenge_catalog_is_cached_and_revalidated(monkeypatch: pytest.MonkeyPatch) -> None:
+    server = Server()
+
+    catalog = get_challenge_catalog(server.client(), "test")
+    assert _keys(catalog.challenges) == ["pieceofcake", "bear1", "phantomcheque"]
+
+    # fresh, served from the cache
+    cached = get_challenge_catalog(server.client(), "test")
+    assert _keys(cached.filter([ChallengeFilter.parse("tag=vision")])) == ["phantomcheque"]
+    assert len(server.requests) == 1
+
+    # stale, revalidated with the etag
+    monkeypatch.setattr(time, "time", lambda: catalog.fetched_at + 3600)
+    get_challenge_catalog(server.client(), "test")
+    assert server.requests[1].headers["If-None-Match"] == '"v1"'
+    assert len(server.requests) == 2
+
+    # refreshed, and changed on the server
+    server.etag = '"v2"'
+    assert get_challenge_catalog(server.client(), "test", refresh=True).etag == '"v2"'
+
+    ChallengeCatalog.invalidate("http://test.com", "test")
+    assert ChallengeCatalog.read("http://test.com", "test") is None
+
+
+def test_get_challenge_catalog_is_cached_per_user() -> None:
+    server = Server()
+
+    get_challenge_catalog(server.client(), "test")
+    get_challenge_catalog(server.client(), "other")
+
+    # the challenges status differs between users, so they don't share a cache
+    assert len(server.requests) == 2
+    assert "If-None-Match" not in server.requests[1].headers
+
+    ChallengeCatalog.invalidate("http://test.com", "other")
+    assert ChallengeCatalog.read("http://test.com", "test") is not None
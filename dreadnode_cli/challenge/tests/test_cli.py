@@ -0,0 +1,48 @@
+import importlib
+import pathlib
+import typing as t
+
+import pytest
+from typer.testing import CliRunner
+
+# dreadnode_cli.challenge re-exports the typer app as `cli`, which shadows the module attribute
+challenge_cli = importlib.import_module("dreadnode_cli.challenge.cli")
+
+
+class MockClient:
+    def __init__(self, artifact_names: list[str]) -> None:
+        self.artifact_names = artifact_names
+        self.downloaded: list[pathlib.Path] = []
+
+    def list_challenge_artifacts(self, challenge: str) -> list[str]:
+        return self.artifact_names
+
+    def download_challenge_artifact(
+        self, challenge: str, artifact_name: str, destination: pathlib.Path, **kwargs: t.Any
+    ) -> pathlib.Path:
+        self.downloaded.append(destination)
+        return destination
+
+
+@pytest.mark.parametrize("artifact_name", ["../../.bashrc", "/etc/passwd", "..", "dir\\file"])
+def test_artifact_rejects_names_outside_output(
+    artifact_name: str, tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    client = MockClient(["model.pt", artifact_name])
+    monkeypatch.setattr(challenge_cli.api, "create_client", lambda **_: client)
+
+    result = CliRunner().invoke(challenge_cli.cli, ["artifact", "challenge", "--all", "-o", str(tmp_path)])
+
+    assert result.exit_code == 1
+    assert "Invalid artifact name" in result.output
+    assert client.downloaded == []
+
+
+def test_artifact_all(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    client = MockClient(["model.pt", "data.csv"])
+    monkeypatch.setattr(challenge_cli.api, "create_client", lambda **_: client)
+
+    result = CliRunner().invoke(challenge_cli.cli, ["artifact", "challenge", "--all", "-o", str(tmp_path)])
+
+    assert result.exit_code == 0, result.output
+    assert sorted(client.downloaded) == [tmp_path / "data.csv", tmp_path / "model.pt"]
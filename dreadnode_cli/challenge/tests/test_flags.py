@@ -0,0 +1,104 @@
+import pathlib
+import threading
+import time
+
+import pytest
+
+from dreadnode_cli.challenge import flags as flags_module
+from dreadnode_cli.challenge.flags import FlagHistory, FlagSubmission, read_flags, submit_flags
+
+
+@pytest.fixture(autouse=True)
+def history_path(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    path = tmp_path / "flag-history.json"
+    monkeypatch.setattr(flags_module, "FLAG_HISTORY_PATH", path)
+    return path
+
+
+class Scorer:
+    def __init__(self, correct: str, delay: float = 0.005) -> None:
+        self.correct = correct
+        self.delay = delay
+        self.submitted: list[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, flag: str) -> bool:
+        with self.lock:
+            self.submitted.append(flag)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if flag == "error":
+            raise Exception("500: server error")
+        return flag == self.correct
+
+
+def test_submit_flags_stops_at_first_correct() -> None:
+    scorer = Scorer("flag-50")
+    results: list[FlagSubmission] = []
+
+    correct = submit_flags(
+        scorer, "challenge", (f"flag-{i}" for i in range(1000)), concurrency=4, rate=0, on_result=results.append
+    )
+
+    assert correct == "flag-50"
+    assert scorer.max_in_flight <= 4
+    # only the submissions in flight when the flag was found follow it
+    assert 51 <= len(scorer.submitted) <= 55
+
+
+def test_submit_flags_rate_limit() -> None:
+    started_at = time.monotonic()
+    submit_flags(Scorer("none", delay=0), "challenge", [f"flag-{i}" for i in range(6)], concurrency=6, rate=50)
+
+    assert time.monotonic() - started_at >= 0.09
+
+
+def test_submit_flags_history(history_path: pathlib.Path) -> None:
+    history = FlagHistory.read()
+    scorer = Scorer("right")
+    results: list[FlagSubmission] = []
+
+    assert submit_flags(scorer, "challenge", ["wrong-1", "error", "wrong-2"], history=history, rate=0) is None
+    history.write()
+
+    assert history_path.exists() and "wrong-1" not in history_path.read_text()
+
+    # known wrong flags are skipped, failed ones are submitted again
+    scorer.submitted.clear()
+    history = FlagHistory.read()
+    correct = submit_flags(
+        scorer, "challenge", ["wrong-1", "wrong-2", "error", "right"], history=history, rate=0, on_result=results.append
+    )
+    assert correct == "right"
+    assert sorted(scorer.submitted) == ["error", "right"]
+    assert sum(result.known for result in results) == 2
+    assert history.get("challenge", "right") is True
+
+    # the history is per challenge
+    assert history.get("other", "wrong-1") is None
+
+    # a known correct flag is answered from the history
+    scorer.submitted.clear()
+    assert submit_flags(scorer, "challenge", ["right"], history=history) == "right"
+    assert scorer.submitted == []
+
+
+def test_flag_history_merges_concurrent_writes(history_path: pathlib.Path) -> None:
+    first, second = FlagHistory.read(), FlagHistory.read()
+
+    first.add("challenge", "wrong-1", False).write()
+    second.add("challenge", "wrong-2", False).write()
+
+    history = FlagHistory.read()
+    assert history.get("challenge", "wrong-1") is False
+    assert history.get("challenge", "wrong-2") is False
+    assert [path.name for path in history_path.parent.iterdir()] == [history_path.name]
+
+
+def test_read_flags() -> None:
+    assert list(read_flags(["a\n", "  \n", "b \n", "a\n"])) == ["a", "b"]
@@ -0,0 +1,196 @@
+import json
+import pathlib
+import threading
+import time
+import typing as t
+from collections import Counter
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from dreadnode_cli.challenge import query
+from dreadnode_cli.challenge.query import (
+    Checkpoint,
+    QueryCache,
+    get_score_url,
+    is_trusted_url,
+    read_inputs,
+    run_queries,
+)
+
+
+class ScoringServer(ThreadingHTTPServer):
+    """Local stand-in for a challenge scoring endpoint, scoring inputs by their length."""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), ScoringHandler)
+        self.payloads: Counter[str] = Counter()
+        self.cookies: list[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/score"
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    server: ScoringServer
+
+    def log_message(self, *args: t.Any) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["data"]
+        key = json.dumps(data)
+
+        with self.server.lock:
+            self.server.payloads[key] += 1
+            self.server.cookies.append(self.headers.get("Cookie", ""))
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            attempt = self.server.payloads[key]
+
+        time.sleep(0.01)
+
+        body: dict[str, t.Any]
+        if data == "invalid":
+            status, body = 400, {"detail": "invalid input"}
+        elif data == "flaky" and attempt == 1:
+            status, body = 503, {"detail": "try again"}
+        else:
+            status, body = 200, {"score": len(key)}
+
+        with self.server.lock:
+            self.server.in_flight -= 1
+
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+@pytest.fixture
+def server() -> Generator[ScoringServer, None, None]:
+    server = ScoringServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(query, "QUERY_RETRY_DELAY", 0)
+
+
+def _write_inputs(path: pathlib.Path, inputs: list[t.Any]) -> pathlib.Path:
+    path.write_text("\n".join(json.dumps(value) for value in inputs) + "\n")
+    return path
+
+
+def _read_results(path: pathlib.Path) -> dict[int, dict[str, t.Any]]:
+    return {entry["index"]: entry for entry in map(json.loads, path.read_text().splitlines())}
+
+
+async def test_run_queries(server: ScoringServer, tmp_path: pathlib.Path) -> None:
+    inputs = _write_inputs(tmp_path / "inputs.jsonl", [f"input {i}" for i in range(20)] + ["input 1", {"a": 1}])
+    output = tmp_path / "results.jsonl"
+
+    stats = await run_queries(
+        server.url,
+        read_inputs(inputs),
+        output,
+        checkpoint=Checkpoint(tmp_path / "checkpoint"),
+        cache=QueryCache(server.url, tmp_path / "cache.jsonl"),
+        cookies={"access_token": "token"},
+        concurrency=4,
+        rate=0,
+    )
+
+    results = _read_results(output)
+    assert len(results) == 22
+    assert results[21] == {"index": 21, "input": {"a": 1}, "result": {"score": 8}, "cached": False}
+    # duplicated payloads are only sent once
+    assert stats.sent == 21 and stats.cached == 1
+    assert max(server.payloads.values()) == 1
+    assert server.max_in_flight <= 4
+    assert all(cookie == "access_token=token" for cookie in server.cookies)
+
+
+async def test_run_queries_rate_limit(server: ScoringServer, tmp_path: pathlib.Path) -> None:
+    inputs = _write_inputs(tmp_path / "inputs.jsonl", list(range(10)))
+
+    started_at = time.monotonic()
+    await run_queries(
+        server.url,
+        read_inputs(inputs),
+        tmp_path / "results.jsonl",
+        checkpoint=Checkpoint(tmp_path / "checkpoint"),
+        concurrency=10,
+        rate=50,
+    )
+
+    # 10 requests spaced by 20ms
+    assert time.monotonic() - started_at >= 0.18
+
+
+async def test_run_queries_resume_and_cache(server: ScoringServer, tmp_path: pathlib.Path) -> None:
+    inputs = _write_inputs(tmp_path / "inputs.jsonl", ["a", "invalid", "flaky", "b"])
+    output = tmp_path / "results.jsonl"
+    cache = QueryCache(server.url, tmp_path / "cache.jsonl")
+
+    checkpoint = Checkpoint(tmp_path / "checkpoint")
+    checkpoint.mark(0)
+    stats = await run_queries(server.url, read_inputs(inputs), output, checkpoint=checkpoint, cache=cache, retries=1)
+    checkpoint.close()
+
+    # the first input was answered by a previous run, the flaky one succeeded when retried
+    assert stats == (2, 0, 1, 1)
+    assert server.payloads['"a"'] == 0 and server.payloads['"flaky"'] == 2
+    assert _read_results(output)[1]["error"].startswith("400")
+
+    # resumed runs only retry the failed input
+    checkpoint = Checkpoint(tmp_path / "checkpoint")
+    assert checkpoint.done == {0, 2, 3}
+    stats = await run_queries(server.url, read_inputs(inputs), output, checkpoint=checkpoint, cache=cache)
+    assert stats == (0, 0, 3, 1)
+
+    # a new run is answered from the result cache
+    stats = await run_queries(
+        server.url,
+        read_inputs(inputs),
+        tmp_path / "new-results.jsonl",
+        checkpoint=Checkpoint(tmp_path / "new-checkpoint"),
+        cache=QueryCache(server.url, tmp_path / "cache.jsonl"),
+    )
+    assert (stats.cached, stats.failed) == (2, 1)
+    assert server.payloads['"b"'] == 1
+
+
+def test_read_inputs(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "inputs.jsonl"
+    path.write_text('"quoted"\nplain text\n\n{"a": [1, 2]}\n')
+
+    assert list(read_inputs(path)) == [(0, "quoted"), (1, "plain text"), (3, {"a": [1, 2]})]
+
+
+@pytest.mark.parametrize(
+    ("url", "trusted"),
+    [
+        ("https://bear1.platform.dreadnode.io/score", True),
+        ("https://platform.dreadnode.io/api/score", True),
+        ("https://other.platform.dreadnode.io/score", False),
+        ("http://bear1.platform.dreadnode.io/score", False),
+        ("https://bear1.platform.dreadnode.io.example.com/score", False),
+        ("https://example.com/score", False),
+    ],
+)
+def test_is_trusted_url(url: str, trusted: bool) -> None:
+    assert get_score_url("https://platform.dreadnode.io", "bear1") == "https://bear1.platform.dreadnode.io/score"
+    assert is_trusted_url(url, "https://platform.dreadnode.io", "bear1") is trusted
@@ -1,29 +1,28 @@
 import typing as t
-import webbrowser
 
 import typer
 from rich import print
 
-from dreadnode_cli import api
-from dreadnode_cli.agent import cli as agent_cli
-from dreadnode_cli.challenge import cli as challenge_cli
-from dreadnode_cli.config import ServerConfig, UserConfig
-from dreadnode_cli.defaults import PLATFORM_BASE_URL
-from dreadnode_cli.model import cli as models_cli
-from dreadnode_cli.profile import cli as profile_cli
-from dreadnode_cli.utils import pretty_cli
+from dreadnode_cli.ext.typer import LazyGroup, pretty_cli
+
+
+class CLIGroup(LazyGroup):
+    # sub commands are only imported when used, keeping help, completions and trivial commands fast
+    lazy_commands = {
+        "profile": ("dreadnode_cli.profile.cli:cli", "Manage server profiles"),
+        "challenge": ("dreadnode_cli.challenge.cli:cli", "Interact with Crucible challenges"),
+        "agent": ("dreadnode_cli.agent.cli:cli", "Interact with Strike agents"),
+        "model": ("dreadnode_cli.model.cli:cli", "Manage user-defined inference models"),
+    }
+
 
 cli = typer.Typer(
+    cls=CLIGroup,
     no_args_is_help=True,
     context_settings={"help_option_names": ["-h", "--help"]},
     help="Interact with the Dreadnode platform",
 )
 
-cli.add_typer(profile_cli, name="profile", help="Manage server profiles")
-cli.add_typer(challenge_cli, name="challenge", help="Interact with Crucible challenges")
-cli.add_typer(agent_cli, name="agent", help="Interact with Strike agents")
-cli.add_typer(models_cli, name="model", help="Manage user-defined inference models")
-
 
 @cli.command(help="Authenticate to the platform.")
 @pretty_cli
@@ -31,6 +30,12 @@ def login(
     server: t.Annotated[str | None, typer.Option("--server", "-s", help="URL of the server")] = None,
     profile: t.Annotated[str | None, typer.Option("--profile", "-p", help="Profile alias to assign / update")] = None,
 ) -> None:
+    import webbrowser
+
+    from dreadnode_cli import api
+    from dreadnode_cli.config import ServerConfig, UserConfig
+    from dreadnode_cli.defaults import PLATFORM_BASE_URL
+
     if not server:
         try:
             existing_config = UserConfig.read().get_server_config(profile)
@@ -88,10 +93,13 @@ Then enter the code: [bold]{codes.user_code}[/]
 @cli.command(help="Refresh data for the active server profile.")
 @pretty_cli
 def refresh() -> None:
+    from dreadnode_cli import api
+    from dreadnode_cli.config import UserConfig
+
     user_config = UserConfig.read()
     server_config = user_config.get_server_config()
 
-    client = api.create_client()
+    client = api.create_client(user_config=user_config)
     user = client.get_user()
 
     server_config.email = user.email_address
@@ -1,8 +1,197 @@
-from pydantic import BaseModel
+import atexit
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+import stat
+import typing as t
+
+from pydantic import BaseModel, PrivateAttr, ValidationError
 from rich import print
 from ruamel.yaml import YAML
 
-from dreadnode_cli.defaults import DEFAULT_PROFILE_NAME, USER_CONFIG_PATH
+from dreadnode_cli.defaults import CONFIG_CACHE_PATH, DEFAULT_PROFILE_NAME, USER_CONFIG_PATH
+
+ConfigT = t.TypeVar("ConfigT", bound=BaseModel)
+
+
+class _Snapshot(t.NamedTuple):
+    # (mtime, size, inode) of the file when read or written
+    signature: tuple[int, int, int]
+    config: BaseModel
+    # content of the file at that time, what the changes made to the config are merged from
+    base: dict[str, t.Any]
+
+
+# configuration files parsed or written by this process
+_snapshots: dict[pathlib.Path, _Snapshot] = {}
+
+# marks a value missing from one side of a merge
+_MISSING: t.Any = object()
+
+
+def _file_signature(path: pathlib.Path) -> tuple[int, int, int] | None:
+    try:
+        file_stat = path.stat()
+    except OSError:
+        return None
+    # files are replaced rather than rewritten, so the inode changes with every write
+    return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+
+def _cache_path(path: pathlib.Path, suffix: str) -> pathlib.Path:
+    return CONFIG_CACHE_PATH / f"{hashlib.sha256(str(path).encode()).hexdigest()[:16]}{suffix}"
+
+
+def _sidecar_path(path: pathlib.Path) -> pathlib.Path:
+    return _cache_path(path, ".json")
+
+
+def _write_sidecar(path: pathlib.Path, signature: tuple[int, int, int], content: dict[str, t.Any]) -> None:
+    sidecar_path = _sidecar_path(path)
+    try:
+        sidecar_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = sidecar_path.with_name(f"{sidecar_path.name}.{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps({"path": str(path), "signature": signature, "content": content}))
+        # the content is as sensitive as the configuration file itself
+        temp_path.chmod(stat.S_IMODE(path.stat().st_mode))
+        temp_path.replace(sidecar_path)
+    except OSError:
+        pass
+
+
+def _load(cls: type[ConfigT], path: pathlib.Path, signature: tuple[int, int, int]) -> tuple[ConfigT, dict[str, t.Any]]:
+    """
+    Load a configuration file into a model, along with its JSON content. YAML being slow to parse, the content
+    is cached in a JSON sidecar which is used as long as the file has the same signature, the YAML file remaining
+    the source of truth.
+    """
+
+    try:
+        sidecar = json.loads(_sidecar_path(path).read_bytes())
+        if sidecar["path"] == str(path) and tuple(sidecar["signature"]) == signature:
+            return cls.model_validate(sidecar["content"]), sidecar["content"]
+    except (OSError, ValueError, KeyError, TypeError, ValidationError):
+        pass
+
+    with path.open("r") as f:
+        config = cls.model_validate(YAML(typ="safe").load(f))
+
+    content = config.model_dump(mode="json")
+    _write_sidecar(path, signature, content)
+    return config, content
+
+
+@contextlib.contextmanager
+def locked(path: pathlib.Path) -> t.Iterator[None]:
+    """
+    Hold an advisory lock on a file, configuration or cache, where supported. Such files are replaced on write,
+    so the lock is taken on a lock file in the cache directory, which keeps it out of project directories.
+    """
+
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    lock_path = _cache_path(path.absolute(), ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _merge(base: t.Any, ours: t.Any, theirs: t.Any) -> t.Any:
+    """
+    Three-way merge of JSON values: the changes we made since base are applied over theirs, dictionaries are
+    merged by key and lists by item, and ours win when both sides changed the same value.
+    """
+
+    if ours == base:
+        return theirs
+    if theirs == base:
+        return ours
+
+    if isinstance(ours, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = {
+            key: _merge(base.get(key, _MISSING), ours.get(key, _MISSING), theirs.get(key, _MISSING))
+            for key in {**theirs, **ours}
+        }
+        return {key: value for key, value in merged.items() if value is not _MISSING}
+
+    if isinstance(ours, list) and isinstance(theirs, list):
+        base = base if isinstance(base, list) else []
+        removed = [item for item in base if item not in ours]
+        added = [item for item in ours if item not in base and item not in theirs]
+        return [item for item in theirs if item not in removed] + added
+
+    return ours
+
+
+def read_config_file(cls: type[ConfigT], path: pathlib.Path) -> ConfigT | None:
+    """
+    Read a YAML configuration file into a model, or None if missing. Files are only parsed once per process
+    (unless changed on disk since), every read returning the same instance so commands share their changes.
+    """
+
+    path = path.absolute()
+    signature = _file_signature(path)
+    if signature is None:
+        _snapshots.pop(path, None)
+        return None
+
+    snapshot = _snapshots.get(path)
+    if snapshot is not None and snapshot.signature == signature and isinstance(snapshot.config, cls):
+        return snapshot.config
+
+    config, content = _load(cls, path, signature)
+    _snapshots[path] = _Snapshot(signature, config, content)
+    return config
+
+
+def write_config_file(config: BaseModel, path: pathlib.Path, *, exclude_none: bool = False) -> None:
+    """
+    Write a model to a YAML configuration file under a lock. If the model was read from the file, the changes
+    made to it are merged into the current content of the file (and the model updated with the result), so
+    updates written by other processes since aren't lost. The file is replaced through a temporary file, so
+    it's never left truncated.
+    """
+
+    path = path.absolute()
+    model = type(config)
+
+    with locked(path):
+        snapshot = _snapshots.get(path)
+        if snapshot is not None and snapshot.config is config:
+            theirs = snapshot.base
+            if (signature := _file_signature(path)) is not None and signature != snapshot.signature:
+                try:
+                    theirs = _load(model, path, signature)[1]
+                except FileNotFoundError:
+                    pass
+
+            if theirs != snapshot.base:
+                merged = model.model_validate(_merge(snapshot.base, config.model_dump(mode="json"), theirs))
+                for field in model.model_fields:
+                    setattr(config, field, getattr(merged, field))
+
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with temp_path.open("w") as f:
+            YAML().dump(config.model_dump(mode="json", exclude_none=exclude_none), f)
+        if path.exists():
+            temp_path.chmod(stat.S_IMODE(path.stat().st_mode))
+        temp_path.replace(path)
+
+        if (signature := _file_signature(path)) is not None:
+            content = config.model_dump(mode="json")
+            _snapshots[path] = _Snapshot(signature, config, content)
+            _write_sidecar(path, signature, content)
 
 
 class ServerConfig(BaseModel):
@@ -22,6 +211,8 @@ class UserConfig(BaseModel):
     active: str | None = None
     servers: dict[str, ServerConfig] = {}
 
+    _write_pending: bool = PrivateAttr(default=False)
+
     def _update_active(self) -> None:
         """If active is not set, set it to the first available server and raise an error if no servers are configured."""
 
@@ -43,16 +234,17 @@ class UserConfig(BaseModel):
 
     @classmethod
     def read(cls) -> "UserConfig":
-        """Read the user configuration from the file system or return an empty instance."""
+        """
+        Read the user configuration from the file system or return an empty instance. The file is parsed once
+        per command, later reads return the same instance.
+        """
 
-        if not USER_CONFIG_PATH.exists():
+        self = read_config_file(cls, USER_CONFIG_PATH)
+        if self is None:
             return cls()
 
-        with USER_CONFIG_PATH.open("r") as f:
-            self = cls.model_validate(YAML().load(f))
-
         if self._update_urls():
-            self.write()
+            self.write_on_exit()
 
         return self
 
@@ -60,13 +252,24 @@ class UserConfig(BaseModel):
         """Write the user configuration to the file system."""
 
         self._update_active()
+        self._write_pending = False
 
         if not USER_CONFIG_PATH.parent.exists():
             print(f":rocket: Creating config at {USER_CONFIG_PATH.parent}")
             USER_CONFIG_PATH.parent.mkdir(parents=True)
 
-        with USER_CONFIG_PATH.open("w") as f:
-            YAML().dump(self.model_dump(mode="json"), f)
+        write_config_file(self, USER_CONFIG_PATH)
+
+    def write_on_exit(self) -> None:
+        """Write the user configuration once the command exits, along with any other change made until then."""
+
+        if not self._write_pending:
+            self._write_pending = True
+            atexit.register(self._write_if_pending)
+
+    def _write_if_pending(self) -> None:
+        if self._write_pending:
+            self.write()
 
     @property
     def active_profile_name(self) -> str | None:
@@ -0,0 +1,11 @@
+from pathlib import Path
+
+import pytest
+
+
+# keeps the configuration sidecars and locks written by tests out of the user's cache directory
+@pytest.fixture(autouse=True)
+def config_cache_path(tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path_factory.mktemp("config-cache")
+    monkeypatch.setattr("dreadnode_cli.config.CONFIG_CACHE_PATH", path)
+    return path
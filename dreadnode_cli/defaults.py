@@ -18,6 +18,18 @@ DOCKER_REGISTRY_SUBDOMAIN = "registry"
 DOCKER_REGISTRY_LOCAL_PORT = 5005
 # default docker registry image tag
 DOCKER_REGISTRY_IMAGE_TAG = "registry"
+# explicit local registry address (host:port or port), skips discovery of the local registry container
+DOCKER_REGISTRY_LOCAL = os.getenv("DREADNODE_LOCAL_REGISTRY")
+# time in seconds a successful registry login is reused for, 0 disables the cache
+DOCKER_LOGIN_TTL = int(os.getenv("DREADNODE_DOCKER_LOGIN_TTL") or 3600)
+# time in seconds the existence and commit of a github repository reference are cached for, 0 disables the cache
+GITHUB_PROBE_TTL = int(os.getenv("DREADNODE_GITHUB_PROBE_TTL") or 300)
+# time in seconds the challenges listing is used without asking the server whether it changed
+CHALLENGES_CACHE_TTL = int(os.getenv("DREADNODE_CHALLENGES_CACHE_TTL") or 300)
+# how many times interrupted downloads are resumed before giving up
+DOWNLOAD_RETRIES = int(os.getenv("DREADNODE_DOWNLOAD_RETRIES") or 5)
+# maximum size in bytes of the downloaded archives cache, least recently used archives are evicted first
+ARCHIVES_CACHE_MAX_SIZE = int(os.getenv("DREADNODE_ARCHIVES_CACHE_MAX_SIZE") or 1024 * 1024 * 1024)
 
 # path to the user configuration file
 USER_CONFIG_PATH = pathlib.Path(
@@ -31,15 +43,66 @@ USER_MODELS_CONFIG_PATH = pathlib.Path(
     os.getenv("DREADNODE_USER_CONFIG_FILE") or pathlib.Path.home() / ".dreadnode" / "models.yml"
 )
 
+# path to the registry login cache
+DOCKER_LOGIN_CACHE_PATH = pathlib.Path(
+    # allow overriding the registry login cache path via env variable
+    os.getenv("DREADNODE_DOCKER_LOGIN_CACHE_FILE") or pathlib.Path.home() / ".dreadnode" / "registry-logins.json"
+)
+
+# path to the cached local registry container lookup
+DOCKER_LOCAL_REGISTRY_CACHE_PATH = pathlib.Path(
+    # allow overriding the local registry cache path via env variable
+    os.getenv("DREADNODE_LOCAL_REGISTRY_CACHE_FILE") or pathlib.Path.home() / ".dreadnode" / "local-registry.json"
+)
+
+# path to the history of submitted flags
+FLAG_HISTORY_PATH = pathlib.Path(
+    # allow overriding the flag history path via env variable
+    os.getenv("DREADNODE_FLAG_HISTORY_FILE") or pathlib.Path.home() / ".dreadnode" / "flag-history.json"
+)
+
 # path to the templates directory
 TEMPLATES_PATH = pathlib.Path(
     # allow overriding the templates path via env variable
     os.getenv("DREADNODE_TEMPLATES_PATH") or pathlib.Path.home() / ".dreadnode" / "templates"
 )
 
+# path to the cache directory
+CACHE_PATH = pathlib.Path(
+    # allow overriding the cache path via env variable
+    os.getenv("DREADNODE_CACHE_PATH") or pathlib.Path.home() / ".dreadnode" / "cache"
+)
+
+# path to the compiled jinja templates cache
+JINJA_CACHE_PATH = CACHE_PATH / "jinja"
+
+# path to the downloaded archives cache
+ARCHIVES_CACHE_PATH = CACHE_PATH / "archives"
+
+# path to the cached challenges listings, one file per server
+CHALLENGES_CACHE_PATH = CACHE_PATH / "challenges"
+
+# path to the cached results of challenge queries, one file per scoring endpoint
+QUERY_CACHE_PATH = CACHE_PATH / "queries"
+
+# path to the parsed configuration files, as JSON sidecars validated against the YAML they were parsed from
+CONFIG_CACHE_PATH = CACHE_PATH / "config"
+
+# path to the cached github repository probes
+GITHUB_PROBE_CACHE_PATH = CACHE_PATH / "github-probes.json"
+
 # name of the agent templates manifest file
 TEMPLATE_MANIFEST_FILE = "manifest.yaml"
 
+# name of the installed templates index, stored in the templates directory
+TEMPLATES_INDEX_FILE = ".index.json"
+
+# name of the catalog of the templates of a pack, published at the root of the pack repository
+TEMPLATE_CATALOG_FILE = "catalog.json"
+
+# name of the lockfile recording the source and content of an installed template pack
+TEMPLATE_PACK_LOCK_FILE = ".pack-lock.json"
+
 # default template repository
 TEMPLATES_DEFAULT_REPO = "dreadnode/basic-agents"
 
@@ -55,3 +118,13 @@ DEFAULT_POLL_INTERVAL = 5
 DEFAULT_MAX_POLL_TIME = 300
 # default maximum token TTL in seconds
 DEFAULT_TOKEN_MAX_TTL = 60
+# default number of challenge artifacts downloaded concurrently
+DEFAULT_ARTIFACT_DOWNLOAD_CONCURRENCY = 4
+# default number of challenge queries in flight
+DEFAULT_QUERY_CONCURRENCY = 8
+# default maximum number of challenge queries sent per second
+DEFAULT_QUERY_RATE = 5.0
+# default number of flag submissions in flight
+DEFAULT_FLAG_SUBMIT_CONCURRENCY = 4
+# default maximum number of flags submitted per second
+DEFAULT_FLAG_SUBMIT_RATE = 2.0
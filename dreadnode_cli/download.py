@@ -0,0 +1,290 @@
+import contextlib
+import hashlib
+import pathlib
+import re
+import threading
+import time
+import typing as t
+
+import httpx
+from rich.progress import (
+    BarColumn,
+    DownloadColumn,
+    Progress,
+    TaskID,
+    TextColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
+)
+
+from dreadnode_cli.defaults import DOWNLOAD_RETRIES
+
+# bounds of the chunk size used to read downloads, picked from the announced content length
+DOWNLOAD_CHUNK_SIZE_MIN = 64 * 1024
+DOWNLOAD_CHUNK_SIZE_MAX = 4 * 1024 * 1024
+# base delay in seconds between retries, doubled on every attempt
+DOWNLOAD_RETRY_DELAY = 0.5
+# responses worth retrying
+DOWNLOAD_RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_CONTENT_RANGE_PATTERN = re.compile(r"bytes \d+-\d+/(\d+)")
+
+# serializes updates of the total of a task shared by concurrent downloads
+_total_task_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    pass
+
+
+def create_progress() -> Progress:
+    """Progress display for downloads, showing transferred bytes, throughput and time left."""
+
+    return Progress(
+        TextColumn("[bold]{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        transient=True,
+    )
+
+
+class DownloadStream:
+    """
+    Iterate over the body of an HTTP download, transparently resuming with Range requests after connection
+    errors or truncated responses. Every byte yielded is also hashed, to verify the download when it's done.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        client: httpx.Client | None = None,
+        headers: dict[str, str] | None = None,
+        offset: int = 0,
+        etag: str | None = None,
+        digest: t.Any = None,
+        retries: int = DOWNLOAD_RETRIES,
+        progress: Progress | None = None,
+        description: str | None = None,
+        total_task: TaskID | None = None,
+    ) -> None:
+        self.url = url
+        # bytes received so far, including the ones received before this stream was created
+        self.offset = offset
+        self.etag = etag
+        self.digest = digest or hashlib.sha256()
+        self.total: int | None = None
+        self.response: httpx.Response | None = None
+
+        self._client = client
+        self._headers = headers or {}
+        self._retries = retries
+        self._progress = progress
+        self._description = description or url.rsplit("/", 1)[-1]
+        self._task: TaskID | None = None
+        # task of the progress display summing several downloads
+        self._total_task = total_task
+        self._stack = contextlib.ExitStack()
+
+    def __enter__(self) -> "DownloadStream":
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._stack.close()
+        if self._progress is not None and self._task is not None:
+            self._progress.remove_task(self._task)
+            self._task = None
+
+    @property
+    def content_type(self) -> str:
+        if self.response is None:
+            return ""
+        return str(self.response.headers.get("Content-Type", "")).split(";")[0].strip()
+
+    @property
+    def chunk_size(self) -> int:
+        return min(max((self.total or 0) // 64, DOWNLOAD_CHUNK_SIZE_MIN), DOWNLOAD_CHUNK_SIZE_MAX)
+
+    def _send(self, attempt: int) -> httpx.Response:
+        headers = dict(self._headers)
+        if self.offset:
+            headers["Range"] = f"bytes={self.offset}-"
+            if self.etag:
+                # only resume if the content didn't change in the meantime
+                headers["If-Range"] = self.etag
+
+        self._stack.close()
+        stream = self._client.stream if self._client is not None else httpx.stream
+        response = self._stack.enter_context(stream("GET", self.url, headers=headers, follow_redirects=True))
+
+        if response.status_code in DOWNLOAD_RETRY_STATUS_CODES and attempt < self._retries:
+            raise httpx.TransportError(f"Server responded with {response.status_code}")
+
+        return response
+
+    def _retry(self, attempt: int, error: Exception) -> None:
+        if attempt >= self._retries:
+            raise error
+        time.sleep(DOWNLOAD_RETRY_DELAY * 2**attempt)
+
+    def open(self) -> httpx.Response:
+        """
+        Send the first request, retrying transient failures. A resumed download restarts from scratch if
+        the server ignores the range (200), is complete if there's nothing left to fetch (416).
+        """
+
+        attempt = 0
+        while True:
+            try:
+                self.response = self._send(attempt)
+                break
+            except httpx.TransportError as e:
+                self._retry(attempt, e)
+                attempt += 1
+
+        status_code = self.response.status_code
+        if status_code == 416 and self.offset:
+            self.total = self.offset
+            return self.response
+
+        if status_code == 200 and self.offset:
+            self.offset = 0
+            self.digest = hashlib.sha256()
+
+        if status_code >= 400:
+            # the stream is closed once the error leaves the stream context, read the body for the message
+            self.response.read()
+            self.response.raise_for_status()
+
+        self.etag = self.response.headers.get("ETag") or self.etag
+        self.total = self._get_total(self.response)
+
+        if self._progress is not None:
+            self._task = self._progress.add_task(self._description, total=self.total, completed=self.offset)
+            if self._total_task is not None:
+                with _total_task_lock:
+                    task = next(task for task in self._progress.tasks if task.id == self._total_task)
+                    self._progress.update(self._total_task, total=(task.total or 0) + (self.total or 0))
+                self._progress.advance(self._total_task, self.offset)
+
+        return self.response
+
+    def _get_total(self, response: httpx.Response) -> int | None:
+        if response.status_code == 206:
+            match = _CONTENT_RANGE_PATTERN.match(response.headers.get("Content-Range", ""))
+            return int(match.group(1)) if match else None
+
+        length = response.headers.get("Content-Length")
+        return int(length) if length else None
+
+    def __iter__(self) -> t.Iterator[bytes]:
+        if self.response is None:
+            self.open()
+
+        assert self.response is not None
+        if self.response.status_code in (304, 416):
+            return
+
+        attempt = 0
+        while True:
+            try:
+                for chunk in self.response.iter_bytes(chunk_size=self.chunk_size):
+                    self.offset += len(chunk)
+                    self.digest.update(chunk)
+                    if self._progress is not None and self._task is not None:
+                        self._progress.update(self._task, completed=self.offset)
+                        if self._total_task is not None:
+                            self._progress.advance(self._total_task, len(chunk))
+                    yield chunk
+
+                if self.total is not None and self.offset < self.total:
+                    raise httpx.ReadError(f"Connection closed after {self.offset} of {self.total} bytes")
+
+                return
+
+            except httpx.TransportError as e:
+                self._retry(attempt, e)
+                attempt += 1
+
+            # resume where the connection dropped, the data already yielded can't be taken back, and
+            # the dropped response is closed, so keep reconnecting until a new one arrives
+            while True:
+                try:
+                    self.response = self._send(attempt)
+                    break
+                except httpx.TransportError as e:
+                    self._retry(attempt, e)
+                    attempt += 1
+
+            if self.response.status_code != 206:
+                raise DownloadError(f"Server can't resume the download of {self.url}, try again")
+
+    def verify(self, sha256: str | None) -> None:
+        if sha256 is not None and self.digest.hexdigest() != sha256.lower():
+            raise DownloadError(f"Checksum mismatch for {self.url}: expected {sha256}, got {self.digest.hexdigest()}")
+
+
+def download_file(
+    url: str,
+    destination: pathlib.Path,
+    *,
+    client: httpx.Client | None = None,
+    headers: dict[str, str] | None = None,
+    sha256: str | None = None,
+    retries: int = DOWNLOAD_RETRIES,
+    progress: Progress | None = None,
+    total_task: TaskID | None = None,
+) -> pathlib.Path:
+    """
+    Download a file through a .part file next to the destination, which is renamed into place once complete
+    (and verified if a sha256 is given). A .part file left by an interrupted download is resumed.
+    """
+
+    part_path = destination.with_name(destination.name + ".part")
+    etag_path = destination.with_name(destination.name + ".part.etag")
+
+    offset, etag, digest = 0, None, hashlib.sha256()
+    if part_path.exists():
+        offset = part_path.stat().st_size
+        etag = etag_path.read_text() if etag_path.exists() else None
+        with part_path.open("rb") as file:
+            while chunk := file.read(DOWNLOAD_CHUNK_SIZE_MAX):
+                digest.update(chunk)
+
+    with DownloadStream(
+        url,
+        client=client,
+        headers=headers,
+        offset=offset,
+        etag=etag,
+        digest=digest,
+        retries=retries,
+        progress=progress,
+        description=destination.name,
+        total_task=total_task,
+    ) as stream:
+        stream.open()
+        if stream.etag:
+            etag_path.write_text(stream.etag)
+
+        # a 200 for a resumed download means starting over
+        with part_path.open("ab" if stream.offset else "wb") as file:
+            for chunk in stream:
+                file.write(chunk)
+
+    try:
+        stream.verify(sha256)
+    except DownloadError:
+        part_path.unlink()
+        etag_path.unlink(missing_ok=True)
+        raise
+
+    part_path.replace(destination)
+    etag_path.unlink(missing_ok=True)
+
+    return destination
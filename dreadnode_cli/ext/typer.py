@@ -1,8 +1,40 @@
+import contextlib
+import functools
+import importlib
 import re
+import sys
+import typing as t
 
-from click import Command, Context
+import typer
+from click import Command, Context, HelpFormatter
+from click.shell_completion import CompletionItem
+from rich import print
 from typer.core import TyperGroup
 
+from dreadnode_cli.defaults import DEBUG
+
+P = t.ParamSpec("P")
+R = t.TypeVar("R")
+
+
+def pretty_cli(func: t.Callable[P, R]) -> t.Callable[P, R]:
+    """Decorator to pad function output and catch/pretty print any exceptions."""
+
+    @functools.wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        try:
+            print()
+            return func(*args, **kwargs)
+        except Exception as e:
+            if DEBUG:
+                raise
+
+            print(f":exclamation: {e}")
+            sys.exit(1)
+
+    return wrapper
+
+
 # https://github.com/fastapi/typer/issues/132
 
 
@@ -19,3 +51,55 @@ class AliasGroup(TyperGroup):
             if name and default_name in self._CMD_SPLIT_P.split(name):
                 return name
         return default_name
+
+
+class LazyGroup(TyperGroup):
+    """
+    Group whose `lazy_commands` are only imported when dispatched, help and completions list them
+    from their registered help text instead.
+    """
+
+    # command name -> ("module:attribute" of its Typer app or click command, help text)
+    lazy_commands: t.ClassVar[dict[str, tuple[str, str]]] = {}
+
+    def __init__(self, **attrs: t.Any) -> None:
+        super().__init__(**attrs)
+        self._listing = False
+
+    @contextlib.contextmanager
+    def _list_lazily(self) -> t.Iterator[None]:
+        listing, self._listing = self._listing, True
+        try:
+            yield
+        finally:
+            self._listing = listing
+
+    def list_commands(self, ctx: Context) -> list[str]:
+        return sorted({*super().list_commands(ctx), *self.lazy_commands})
+
+    def get_command(self, ctx: Context, cmd_name: str) -> Command | None:
+        if cmd_name in self.commands or cmd_name not in self.lazy_commands:
+            return super().get_command(ctx, cmd_name)
+
+        import_path, help = self.lazy_commands[cmd_name]
+        if self._listing:
+            return Command(cmd_name, help=help)
+
+        command = self._load(import_path)
+        command.name, command.help = cmd_name, help
+        self.add_command(command, cmd_name)
+        return command
+
+    @staticmethod
+    def _load(import_path: str) -> Command:
+        module_name, attribute = import_path.split(":")
+        obj = getattr(importlib.import_module(module_name), attribute)
+        return typer.main.get_group(obj) if isinstance(obj, typer.Typer) else obj
+
+    def format_help(self, ctx: Context, formatter: HelpFormatter) -> None:
+        with self._list_lazily():
+            super().format_help(ctx, formatter)
+
+    def shell_complete(self, ctx: Context, incomplete: str) -> list[CompletionItem]:
+        with self._list_lazily():
+            return super().shell_complete(ctx, incomplete)
@@ -4,10 +4,9 @@ import typer
 from rich import print
 
 from dreadnode_cli.defaults import USER_MODELS_CONFIG_PATH
-from dreadnode_cli.ext.typer import AliasGroup
+from dreadnode_cli.ext.typer import AliasGroup, pretty_cli
 from dreadnode_cli.model.config import UserModel, UserModels
 from dreadnode_cli.model.format import format_user_models
-from dreadnode_cli.utils import pretty_cli
 
 cli = typer.Typer(no_args_is_help=True, cls=AliasGroup)
 
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, field_validator
 from rich import print
-from ruamel.yaml import YAML
 
+from dreadnode_cli.config import read_config_file, write_config_file
 from dreadnode_cli.defaults import USER_MODELS_CONFIG_PATH
 
 
@@ -35,14 +35,10 @@ class UserModels(BaseModel):
     def read(cls) -> "UserModels":
         """Read the user models configuration from the file system or return an empty instance."""
 
-        if not USER_MODELS_CONFIG_PATH.exists():
-            return cls()
-
-        with USER_MODELS_CONFIG_PATH.open("r") as f:
-            return cls.model_validate(YAML().load(f))
+        config = read_config_file(cls, USER_MODELS_CONFIG_PATH)
+        return config if config is not None else cls()
 
     def write(self) -> None:
         """Write the user models configuration to the file system."""
 
-        with USER_MODELS_CONFIG_PATH.open("w") as f:
-            YAML().dump(self.model_dump(mode="json", exclude_none=True), f)
+        write_config_file(self, USER_MODELS_CONFIG_PATH, exclude_none=True)
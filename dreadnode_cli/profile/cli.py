@@ -7,8 +7,7 @@ from rich.table import Table
 from dreadnode_cli import utils
 from dreadnode_cli.api import Token
 from dreadnode_cli.config import UserConfig
-from dreadnode_cli.ext.typer import AliasGroup
-from dreadnode_cli.utils import pretty_cli
+from dreadnode_cli.ext.typer import AliasGroup, pretty_cli
 
 cli = typer.Typer(no_args_is_help=True, cls=AliasGroup)
 
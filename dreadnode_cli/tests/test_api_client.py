@@ -1,3 +1,5 @@
+import pathlib
+from collections.abc import Iterator
 from typing import Any
 
 import httpx
@@ -129,3 +131,60 @@ def test_poll_for_token_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
 
     with pytest.raises(Exception, match="Polling for token timed out"):
         client.poll_for_token("device123", interval=0, max_poll_time=0)
+
+
+class StreamingBody(httpx.SyncByteStream):
+    """Response body only available while the response stream is open, like on a real connection."""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self.data
+
+
+def test_download_challenge_artifact_error(tmp_path: pathlib.Path) -> None:
+    client = api.Client("http://test.com")
+    client._client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(
+                404,
+                headers={"Content-Type": "application/json"},
+                stream=StreamingBody(b'{"detail": "Artifact not found"}'),
+            )
+        ),
+        base_url="http://test.com",
+    )
+
+    with pytest.raises(Exception, match="404: Artifact not found"):
+        client.download_challenge_artifact("challenge", "missing.bin", tmp_path / "missing.bin")
+
+
+def test_list_challenge_artifacts() -> None:
+    client = api.Client("http://test.com")
+    client._client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json=["model.pt", "data.csv"])),
+        base_url="http://test.com",
+    )
+
+    assert client.list_challenge_artifacts("challenge") == ["model.pt", "data.csv"]
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        httpx.Response(404, json={"detail": "Not Found"}),
+        httpx.Response(405, json={"detail": "Method Not Allowed"}),
+        httpx.Response(200, text="<html></html>"),
+        httpx.Response(200, json={"detail": "unexpected"}),
+    ],
+)
+def test_list_challenge_artifacts_unsupported(response: httpx.Response) -> None:
+    client = api.Client("http://test.com")
+    client._client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: response),
+        base_url="http://test.com",
+    )
+
+    with pytest.raises(Exception, match="can't list the artifacts of 'challenge'"):
+        client.list_challenge_artifacts("challenge")
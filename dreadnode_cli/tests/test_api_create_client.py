@@ -58,47 +58,80 @@ def test_create_client_with_valid_token(monkeypatch: pytest.MonkeyPatch, tmp_pat
     assert client._client.cookies["refresh_token"] == token
 
 
-def test_create_client_flushes_auth_changes(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> None:
-    # Mock config path to use temporary directory
-    mock_config_path = tmp_path / "config.yaml"
-    monkeypatch.setattr("dreadnode_cli.config.USER_CONFIG_PATH", mock_config_path)
+def _set_auth_cookies(client: api.Client, access_token: str, refresh_token: str) -> None:
+    client._client._transport = httpx.MockTransport(
+        lambda _: httpx.Response(
+            200,
+            headers=[
+                ("set-cookie", f"access_token={access_token}; Path=/"),
+                ("set-cookie", f"refresh_token={refresh_token}; Path=/"),
+            ],
+        )
+    )
 
+
+def test_create_client_flushes_auth_changes(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> None:
     token = create_jwt_test_token(30)
     _ = _create_test_config(monkeypatch, tmp_path, token)
 
-    at_exit_called = False
+    exit_fns: list[Callable[[], None]] = []
+    monkeypatch.setattr("atexit.register", exit_fns.append)
 
-    # patch atexit.register
-    with monkeypatch.context() as m:
-        teardown_fn: Callable[[], None] = lambda: None  # noqa
-
-        def set_teardown_fn(fn: Callable[[], None]) -> None:
-            nonlocal teardown_fn
-            nonlocal at_exit_called
-            teardown_fn = fn
-            at_exit_called = True
-
-        m.setattr("atexit.register", set_teardown_fn)
-
-        client = api.create_client()
+    client = api.create_client()
 
-        assert client._client.cookies["access_token"] == token
-        assert client._client.cookies["refresh_token"] == token
+    assert client._client.cookies["access_token"] == token
+    assert client._client.cookies["refresh_token"] == token
 
-        client._client.cookies = httpx.Cookies(
-            {
-                "access_token": "new_access_token",
-                "refresh_token": "new_refresh_token",
-            }
-        )
+    # nothing changed, nothing to write
+    _set_auth_cookies(client, token, token)
+    client._client.get("/")
+    assert exit_fns == []
 
-        # explicitly call the atexit registered function
-        teardown_fn()
+    _set_auth_cookies(client, "new_access_token", "new_refresh_token")
+    client._client.get("/")
+    assert len(exit_fns) == 1
 
-    assert at_exit_called
+    # explicitly call the atexit registered function
+    exit_fns[0]()
 
     # read from disk again and expect the new cookies to be written
     new_config = UserConfig.read().get_server_config()
 
     assert new_config.access_token == "new_access_token"
     assert new_config.refresh_token == "new_refresh_token"
+
+
+def test_create_client_shares_one_write(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> None:
+    token = create_jwt_test_token(30)
+    _ = _create_test_config(monkeypatch, tmp_path, token)
+
+    exit_fns: list[Callable[[], None]] = []
+    monkeypatch.setattr("atexit.register", exit_fns.append)
+
+    writes = 0
+    write = UserConfig.write
+
+    def counting_write(self: UserConfig) -> None:
+        nonlocal writes
+        writes += 1
+        write(self)
+
+    monkeypatch.setattr(UserConfig, "write", counting_write)
+
+    user_config = UserConfig.read()
+    clients = [api.create_client(user_config=user_config) for _ in range(3)]
+    for i, client in enumerate(clients):
+        _set_auth_cookies(client, f"access_{i}", f"refresh_{i}")
+        client._client.get("/")
+
+    assert len(exit_fns) == 1
+
+    for fn in exit_fns:
+        fn()
+
+    assert writes == 1
+
+    new_config = UserConfig.read().get_server_config()
+
+    assert new_config.access_token == "access_2"
+    assert new_config.refresh_token == "refresh_2"
@@ -0,0 +1,133 @@
+import io
+import os
+import pathlib
+import typing as t
+import zipfile
+from collections.abc import Generator
+
+import httpx
+import pytest
+
+from dreadnode_cli.archives import ArchiveCache, fetch_archive
+
+
+def _zip(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+    return buffer.getvalue()
+
+
+class MockServer:
+    def __init__(self, content: bytes, etag: str | None = None) -> None:
+        self.content = content
+        self.etag = etag
+        self.requests: list[dict[str, str]] = []
+
+    def stream(self, method: str, url: str, *, headers: dict[str, str], **kwargs: t.Any) -> "MockServer.Response":
+        self.requests.append(headers)
+        if self.etag and headers.get("If-None-Match") == self.etag:
+            return self.Response(304, b"", {})
+        return self.Response(200, self.content, {"ETag": self.etag} if self.etag else {})
+
+    class Response:
+        def __init__(self, status_code: int, content: bytes, headers: dict[str, str]) -> None:
+            self.status_code = status_code
+            self.content = content
+            self.headers = headers
+
+        def __enter__(self) -> "MockServer.Response":
+            return self
+
+        def __exit__(self, *args: t.Any) -> None:
+            pass
+
+        def raise_for_status(self) -> None:
+            pass
+
+        def iter_bytes(self, chunk_size: int) -> Generator[bytes, None, None]:
+            yield self.content
+
+
+@pytest.fixture
+def cache(tmp_path: pathlib.Path) -> ArchiveCache:
+    return ArchiveCache(tmp_path / "archives", max_size=1024 * 1024)
+
+
+def test_fetch_archive_by_commit(cache: ArchiveCache, monkeypatch: pytest.MonkeyPatch) -> None:
+    server = MockServer(_zip({"repo/Dockerfile": b"FROM python:3.11"}))
+    monkeypatch.setattr(httpx, "stream", server.stream)
+
+    first = fetch_archive("https://example.com/archive.zip", commit="abc", cache=cache)
+    second = fetch_archive("https://example.com/archive.zip", commit="abc", cache=cache)
+
+    assert len(server.requests) == 1
+    assert first != second
+    assert (second / "repo" / "Dockerfile").read_bytes() == b"FROM python:3.11"
+    assert not (second / "archive.zip").exists()
+
+    # callers own their copy, changing it doesn't change the cache
+    (second / "repo" / "Dockerfile").write_text("FROM changed")
+    third = fetch_archive("https://example.com/archive.zip", commit="abc", cache=cache)
+    assert (third / "repo" / "Dockerfile").read_bytes() == b"FROM python:3.11"
+
+    # a new commit is downloaded again
+    fetch_archive("https://example.com/archive.zip", commit="def", cache=cache)
+    assert len(server.requests) == 2
+
+
+def test_fetch_archive_revalidates_etag(cache: ArchiveCache, monkeypatch: pytest.MonkeyPatch) -> None:
+    server = MockServer(_zip({"file.txt": b"v1"}), etag='"v1"')
+    monkeypatch.setattr(httpx, "stream", server.stream)
+
+    fetch_archive("https://example.com/archive.zip", cache=cache)
+    cached = fetch_archive("https://example.com/archive.zip", cache=cache)
+
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert (cached / "file.txt").read_bytes() == b"v1"
+
+    server.content, server.etag = _zip({"file.txt": b"v2"}), '"v2"'
+    updated = fetch_archive("https://example.com/archive.zip", cache=cache)
+    assert (updated / "file.txt").read_bytes() == b"v2"
+
+
+def test_fetch_archive_without_etag_is_not_cached(cache: ArchiveCache, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(httpx, "stream", MockServer(_zip({"file.txt": b"data"})).stream)
+
+    fetch_archive("https://example.com/archive.zip", cache=cache)
+
+    assert not cache.path.exists() or not any(cache.path.iterdir())
+
+
+def test_archive_cache_evicts_least_recently_used(cache: ArchiveCache, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache.max_size = 2500
+    server = MockServer(_zip({"file.bin": b"\0" * 1000}))
+    monkeypatch.setattr(httpx, "stream", server.stream)
+
+    fetch_archive("https://example.com/archive.zip", commit="a", cache=cache)
+    fetch_archive("https://example.com/archive.zip", commit="b", cache=cache)
+    # make 'a' the most recently used entry
+    os.utime(cache.path / "commit-b" / "entry.json", (0, 0))
+    fetch_archive("https://example.com/archive.zip", commit="a", cache=cache)
+
+    fetch_archive("https://example.com/archive.zip", commit="c", cache=cache)
+
+    assert sorted(path.name for path in cache.path.iterdir()) == ["commit-a", "commit-c"]
+
+
+def test_fetch_archive_subpath(cache: ArchiveCache, monkeypatch: pytest.MonkeyPatch) -> None:
+    server = MockServer(_zip({"repo/README.md": b"readme", "repo/agents/web/Dockerfile": b"FROM python:3.11"}))
+    monkeypatch.setattr(httpx, "stream", server.stream)
+
+    subtree = fetch_archive("https://example.com/archive.zip", commit="abc", cache=cache, subpath="agents/web")
+    assert [path.name for path in subtree.iterdir()] == ["Dockerfile"]
+
+    # a full archive of the same commit serves any subpath
+    fetch_archive("https://example.com/archive.zip", commit="def", cache=cache)
+    subtree = fetch_archive("https://example.com/archive.zip", commit="def", cache=cache, subpath="agents/web/")
+    assert (subtree / "Dockerfile").read_bytes() == b"FROM python:3.11"
+    assert len(server.requests) == 2
+
+    with pytest.raises(Exception, match="not found"):
+        fetch_archive("https://example.com/archive.zip", commit="def", cache=cache, subpath="missing")
@@ -1,11 +1,21 @@
 # mypy: ignore-errors
 
+import multiprocessing
+import time
+from collections.abc import Callable
 from pathlib import Path
+from uuid import UUID, uuid4
 
 import pydantic
 import pytest
+from ruamel.yaml import YAML
 
+import dreadnode_cli.config
+from dreadnode_cli.agent.config import AgentConfig
 from dreadnode_cli.config import ServerConfig, UserConfig
+from dreadnode_cli.model.config import UserModel, UserModels
+
+BENCHMARK_ATTEMPTS = 5
 
 
 def test_server_config() -> None:
@@ -79,3 +89,224 @@ def test_user_config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     empty_config = UserConfig()
     empty_config._update_active()
     assert empty_config.active is None
+
+
+def _server_config(url: str = "https://platform.dreadnode.io") -> ServerConfig:
+    return ServerConfig(
+        url=url,
+        email="test@example.com",
+        username="test",
+        api_key="test123",
+        access_token="token123",
+        refresh_token="refresh123",
+    )
+
+
+def test_user_config_is_read_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    mock_config_path = tmp_path / "config.yaml"
+    monkeypatch.setattr("dreadnode_cli.config.USER_CONFIG_PATH", mock_config_path)
+
+    UserConfig().set_server_config(_server_config(), "default").write()
+
+    parses = 0
+    model_validate = UserConfig.model_validate
+
+    def counting_model_validate(obj: object) -> UserConfig:
+        nonlocal parses
+        parses += 1
+        return model_validate(obj)
+
+    monkeypatch.setattr(UserConfig, "model_validate", counting_model_validate)
+
+    # reads share the instance written or parsed by this process
+    config = UserConfig.read()
+    config.active = "default"
+    assert UserConfig.read() is config
+    assert parses == 0
+
+    # but a change made by another process is picked up
+    mock_config_path.write_text(mock_config_path.read_text().replace("test123", "other"))
+    assert UserConfig.read().servers["default"].api_key == "other"
+    assert UserConfig.read() is UserConfig.read()
+    assert parses == 1
+
+
+def test_user_config_url_migration_is_written_on_exit(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    mock_config_path = tmp_path / "config.yaml"
+    monkeypatch.setattr("dreadnode_cli.config.USER_CONFIG_PATH", mock_config_path)
+
+    UserConfig().set_server_config(_server_config("https://crucible.dreadnode.io"), "default").write()
+    on_exit: list[Callable[[], None]] = []
+    monkeypatch.setattr("atexit.register", on_exit.append)
+
+    config = UserConfig.read()
+    assert config.servers["default"].url == "https://platform.dreadnode.io"
+    assert "//crucible" in mock_config_path.read_text()
+
+    # the migration is written along with the other changes of the command
+    config.active = "default"
+    assert len(on_exit) == 1
+    on_exit[0]()
+    assert "//platform" in mock_config_path.read_text()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["config.yaml"]
+
+    # a write made before exiting takes care of it
+    UserConfig().set_server_config(_server_config("https://crucible.dreadnode.io"), "default").write()
+    UserConfig.read().write()
+    written = mock_config_path.stat().st_mtime_ns
+    on_exit[-1]()
+    assert mock_config_path.stat().st_mtime_ns == written
+
+
+def test_user_config_write_merges_concurrent_changes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    mock_config_path = tmp_path / "config.yaml"
+    monkeypatch.setattr("dreadnode_cli.config.USER_CONFIG_PATH", mock_config_path)
+
+    UserConfig().set_server_config(_server_config(), "default").set_server_config(_server_config(), "old").write()
+    config = UserConfig.read()
+
+    # another process rotates the access token of a profile and adds another one
+    other = config.model_copy(deep=True)
+    other.servers["default"].access_token = "rotated"
+    other.set_server_config(_server_config("https://new.dreadnode.io"), "new")
+    with mock_config_path.open("w") as f:
+        YAML().dump(other.model_dump(mode="json"), f)
+
+    # while this one forgets a profile and rotates the refresh token
+    del config.servers["old"]
+    config.servers["default"].refresh_token = "refreshed"
+    config.write()
+
+    written = UserConfig.read()
+    assert written is config
+    assert list(written.servers) == ["default", "new"]
+    assert written.servers["default"].access_token == "rotated"
+    assert written.servers["default"].refresh_token == "refreshed"
+
+    # a new instance replaces the file
+    UserConfig().set_server_config(_server_config(), "default").write()
+    assert list(UserConfig.read().servers) == ["default"]
+
+
+def _update_configs(
+    user_config_path: Path, config_cache_path: Path, agent_directory: Path, worker: int, updates: int
+) -> None:
+    dreadnode_cli.config.USER_CONFIG_PATH = user_config_path
+    dreadnode_cli.config.CONFIG_CACHE_PATH = config_cache_path
+
+    for update in range(updates):
+        user_config = UserConfig.read()
+        user_config.servers["default"].access_token = f"{worker}-{update}"
+        user_config.set_server_config(_server_config(f"https://{worker}.dreadnode.io"), f"worker-{worker}").write()
+
+        AgentConfig.read(agent_directory).add_run(uuid4()).write(agent_directory)
+
+
+def test_concurrent_config_writes_are_not_lost(
+    tmp_path: Path, config_cache_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    workers, updates = 4, 10
+    mock_config_path = tmp_path / "config.yaml"
+    monkeypatch.setattr("dreadnode_cli.config.USER_CONFIG_PATH", mock_config_path)
+
+    UserConfig().set_server_config(_server_config(), "default").write()
+    AgentConfig(project_name="test").add_link("test", UUID(int=0), "default").write(tmp_path)
+
+    # separate interpreters, like parallel CLI invocations
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_update_configs, args=(mock_config_path, config_cache_path, tmp_path, worker, updates))
+        for worker in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    user_config = UserConfig.read()
+    assert set(user_config.servers) == {"default", *(f"worker-{worker}" for worker in range(workers))}
+    assert user_config.servers["default"].access_token.endswith(f"-{updates - 1}")
+
+    runs = AgentConfig.read(tmp_path).active_link.runs
+    assert len(runs) == len(set(runs)) == workers * updates
+    # neither temporary nor lock files are left next to the configuration files
+    assert sorted(path.name for path in tmp_path.iterdir()) == [".dreadnode.yaml", "config.yaml"]
+    assert len(list(config_cache_path.glob("*.lock"))) == 2
+
+
+def test_config_is_loaded_from_sidecar(
+    tmp_path: Path, config_cache_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    mock_config_path = tmp_path / "config.yaml"
+    monkeypatch.setattr("dreadnode_cli.config.USER_CONFIG_PATH", mock_config_path)
+    monkeypatch.setattr("dreadnode_cli.config._snapshots", {})
+
+    UserConfig().set_server_config(_server_config(), "default").write()
+    assert len(list(config_cache_path.glob("*.json"))) == 1
+
+    # a new process doesn't parse the YAML again
+    with monkeypatch.context() as m:
+        m.setattr("dreadnode_cli.config._snapshots", {})
+        m.setattr("dreadnode_cli.config.YAML", None)
+        assert UserConfig.read().servers["default"].api_key == "test123"
+
+    # but the YAML remains the source of truth when edited
+    monkeypatch.setattr("dreadnode_cli.config._snapshots", {})
+    mock_config_path.write_text(mock_config_path.read_text().replace("test123", "edited"))
+    assert UserConfig.read().servers["default"].api_key == "edited"
+
+    # and an unreadable sidecar is ignored
+    monkeypatch.setattr("dreadnode_cli.config._snapshots", {})
+    for path in config_cache_path.iterdir():
+        path.write_text("{")
+    assert UserConfig.read().servers["default"].api_key == "edited"
+
+
+def test_config_load_benchmark(tmp_path: Path, config_cache_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    profiles, runs = 50, 10_000
+    monkeypatch.setattr("dreadnode_cli.config.USER_CONFIG_PATH", tmp_path / "config.yaml")
+    monkeypatch.setattr("dreadnode_cli.model.config.USER_MODELS_CONFIG_PATH", tmp_path / "models.yaml")
+
+    user_config = UserConfig()
+    agent_config = AgentConfig(project_name="benchmark")
+    user_models = UserModels()
+    for profile in range(profiles):
+        user_config.set_server_config(_server_config(f"https://{profile}.dreadnode.io"), f"profile-{profile}")
+        agent_config.add_link(f"link-{profile}", uuid4(), f"profile-{profile}")
+        agent_config.links[f"link-{profile}"].runs = [uuid4() for _ in range(runs // profiles)]
+        user_models.models[f"model-{profile}"] = UserModel(generator_id=f"openai/gpt-{profile}", api_key="$KEY")
+
+    user_config.write()
+    agent_config.write(tmp_path)
+    user_models.write()
+
+    loaders: dict[str, Callable[[], object]] = {
+        "UserConfig": UserConfig.read,
+        "AgentConfig": lambda: AgentConfig.read(tmp_path),
+        "UserModels": UserModels.read,
+    }
+
+    def timed(load: Callable[[], object]) -> float:
+        started_at = time.perf_counter()
+        load()
+        return (time.perf_counter() - started_at) * 1000
+
+    def load_times(load: Callable[[], object]) -> tuple[float, float, float]:
+        monkeypatch.setattr("dreadnode_cli.config._snapshots", {})
+        for path in config_cache_path.iterdir():
+            path.unlink()
+        yaml_time = timed(load)
+
+        monkeypatch.setattr("dreadnode_cli.config._snapshots", {})
+        sidecar_time = timed(load)
+
+        return yaml_time, sidecar_time, timed(load)
+
+    print(f"\nconfig load times with {profiles} profiles and {runs} runs (best of {BENCHMARK_ATTEMPTS}, ms):")
+    for name, load in loaders.items():
+        attempts = [load_times(load) for _ in range(BENCHMARK_ATTEMPTS)]
+        yaml_time, sidecar_time, snapshot_time = (min(times) for times in zip(*attempts, strict=True))
+
+        print(f"  {name:<12} yaml {yaml_time:8.2f}  sidecar {sidecar_time:8.2f}  snapshot {snapshot_time:8.2f}")
+        assert sidecar_time < yaml_time / 3
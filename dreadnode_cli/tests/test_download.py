@@ -0,0 +1,202 @@
+import hashlib
+import io
+import os
+import pathlib
+import tarfile
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from dreadnode_cli import download
+from dreadnode_cli.download import DownloadError, create_progress, download_file
+from dreadnode_cli.utils import download_and_unzip_archive
+
+DATA = os.urandom(1024 * 1024)
+ETAG = '"v1"'
+
+
+class DroppingStream(httpx.SyncByteStream):
+    """Response body that loses the connection after sending some bytes."""
+
+    def __init__(self, data: bytes, drop_after: int) -> None:
+        self.data = data
+        self.drop_after = drop_after
+
+    def __iter__(self) -> t.Iterator[bytes]:
+        yield self.data[: self.drop_after]
+        raise httpx.ReadError("Connection reset by peer")
+
+
+class Server:
+    """Serves DATA honoring Range requests, dropping the connection of the first `drops` responses."""
+
+    def __init__(self, data: bytes = DATA, *, drops: int = 0, ranges: bool = True) -> None:
+        self.data = data
+        self.drops = drops
+        self.ranges = ranges
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+
+        start, status, headers = 0, 200, {"ETag": ETAG}
+        range_header = request.headers.get("Range")
+        if range_header and self.ranges and request.headers.get("If-Range", ETAG) == ETAG:
+            start, status = int(range_header.removeprefix("bytes=").rstrip("-")), 206
+            headers["Content-Range"] = f"bytes {start}-{len(self.data) - 1}/{len(self.data)}"
+
+        body = self.data[start:]
+        headers["Content-Length"] = str(len(body))
+
+        if self.drops:
+            self.drops -= 1
+            return httpx.Response(status, headers=headers, stream=DroppingStream(body, len(body) // 3))
+
+        return httpx.Response(status, headers=headers, content=body)
+
+    def client(self) -> httpx.Client:
+        return httpx.Client(transport=httpx.MockTransport(self), base_url="http://test.com")
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(download, "DOWNLOAD_RETRY_DELAY", 0)
+
+
+def test_download_file(tmp_path: pathlib.Path) -> None:
+    server = Server()
+    destination = tmp_path / "artifact.bin"
+
+    download_file("/artifact.bin", destination, client=server.client(), sha256=hashlib.sha256(DATA).hexdigest())
+
+    assert destination.read_bytes() == DATA
+    assert [path.name for path in tmp_path.iterdir()] == ["artifact.bin"]
+    assert len(server.requests) == 1
+
+
+def test_download_file_resumes_dropped_connection(tmp_path: pathlib.Path) -> None:
+    server = Server(drops=2)
+    destination = tmp_path / "artifact.bin"
+
+    download_file("/artifact.bin", destination, client=server.client(), sha256=hashlib.sha256(DATA).hexdigest())
+
+    assert destination.read_bytes() == DATA
+    assert len(server.requests) == 3
+    assert "Range" not in server.requests[0].headers
+    for request in server.requests[1:]:
+        assert request.headers["Range"].startswith("bytes=")
+        assert request.headers["If-Range"] == ETAG
+
+
+def test_download_file_retries_failed_reconnect(tmp_path: pathlib.Path) -> None:
+    server = Server(drops=1)
+    failed_reconnects = 1
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal failed_reconnects
+        if "Range" in request.headers and failed_reconnects:
+            failed_reconnects -= 1
+            raise httpx.ConnectError("Connection refused")
+        return server(request)
+
+    destination = tmp_path / "artifact.bin"
+    client = httpx.Client(transport=httpx.MockTransport(handler), base_url="http://test.com")
+
+    download_file("/artifact.bin", destination, client=client, sha256=hashlib.sha256(DATA).hexdigest())
+
+    assert destination.read_bytes() == DATA
+    # truncated 200, refused reconnect, then a 206 with the rest
+    assert len(server.requests) == 2
+    assert "Range" not in server.requests[0].headers
+    assert server.requests[1].headers["Range"].startswith("bytes=")
+
+
+def test_download_file_resumes_part_file(tmp_path: pathlib.Path) -> None:
+    server = Server()
+    destination = tmp_path / "artifact.bin"
+    (tmp_path / "artifact.bin.part").write_bytes(DATA[:1000])
+    (tmp_path / "artifact.bin.part.etag").write_text(ETAG)
+
+    download_file("/artifact.bin", destination, client=server.client(), sha256=hashlib.sha256(DATA).hexdigest())
+
+    assert destination.read_bytes() == DATA
+    assert server.requests[0].headers["Range"] == "bytes=1000-"
+    assert not (tmp_path / "artifact.bin.part.etag").exists()
+
+
+def test_download_file_restarts_when_range_is_ignored(tmp_path: pathlib.Path) -> None:
+    server = Server(ranges=False)
+    destination = tmp_path / "artifact.bin"
+    (tmp_path / "artifact.bin.part").write_bytes(b"stale content")
+
+    download_file("/artifact.bin", destination, client=server.client(), sha256=hashlib.sha256(DATA).hexdigest())
+
+    assert destination.read_bytes() == DATA
+
+
+def test_download_file_checksum_mismatch(tmp_path: pathlib.Path) -> None:
+    destination = tmp_path / "artifact.bin"
+
+    with pytest.raises(DownloadError, match="Checksum mismatch"):
+        download_file("/artifact.bin", destination, client=Server().client(), sha256="0" * 64)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_download_file_gives_up_after_retries(tmp_path: pathlib.Path) -> None:
+    server = Server(drops=10)
+    destination = tmp_path / "artifact.bin"
+
+    with pytest.raises(httpx.ReadError):
+        download_file("/artifact.bin", destination, client=server.client(), retries=2)
+
+    assert len(server.requests) == 3
+    assert not destination.exists()
+    # what was received is kept for the next attempt
+    assert (tmp_path / "artifact.bin.part").stat().st_size > 0
+
+
+def test_download_file_retries_server_errors(tmp_path: pathlib.Path) -> None:
+    responses = [httpx.Response(503), httpx.Response(200, content=b"content")]
+    client = httpx.Client(transport=httpx.MockTransport(lambda request: responses.pop(0)), base_url="http://test.com")
+
+    download_file("/artifact.bin", tmp_path / "artifact.bin", client=client)
+
+    assert (tmp_path / "artifact.bin").read_bytes() == b"content"
+
+
+def test_archive_download_resumes_while_extracting(monkeypatch: pytest.MonkeyPatch) -> None:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        info = tarfile.TarInfo("repo/data.bin")
+        info.size = len(DATA)
+        tar.addfile(info, io.BytesIO(DATA))
+
+    server = Server(buffer.getvalue(), drops=1)
+    monkeypatch.setattr(httpx, "stream", server.client().stream)
+
+    output_dir = download_and_unzip_archive("https://github.com/owner/repo/tarball/main")
+
+    assert (output_dir / "repo" / "data.bin").read_bytes() == DATA
+    assert server.requests[1].headers["Range"].startswith("bytes=")
+
+
+def test_download_files_with_combined_progress(tmp_path: pathlib.Path) -> None:
+    server = Server(drops=1)
+    client = server.client()
+    progress = create_progress()
+    total_task = progress.add_task("artifacts", total=0)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        for name in ["a.bin", "b.bin", "c.bin"]:
+            executor.submit(
+                download_file, f"/{name}", tmp_path / name, client=client, progress=progress, total_task=total_task
+            )
+
+    assert all((tmp_path / name).read_bytes() == DATA for name in ["a.bin", "b.bin", "c.bin"])
+    task = progress.tasks[total_task]
+    assert task.total == task.completed == 3 * len(DATA)
+    # per download tasks are removed once done
+    assert len(progress.tasks) == 1
@@ -0,0 +1,88 @@
+import subprocess
+import sys
+
+import pytest
+from typer.testing import CliRunner
+
+from dreadnode_cli.cli import cli
+
+# sub commands implementations, only imported when dispatched
+SUB_COMMANDS = {
+    "agent": "dreadnode_cli.agent.cli",
+    "challenge": "dreadnode_cli.challenge.cli",
+    "model": "dreadnode_cli.model.cli",
+    "profile": "dreadnode_cli.profile.cli",
+}
+
+# heavy dependencies which only some sub commands need
+HEAVY_MODULES = {"docker", "jinja2", "httpx", "pydantic", "ruamel.yaml", "dreadnode_cli.api"}
+
+# per command: import time budget, relative to the time it takes to just import typer (so it holds on slow
+# machines), and modules it must not import. Importing every sub command takes over 3 times as long.
+IMPORT_BUDGETS: dict[str, tuple[float, set[str]]] = {
+    "--help": (1.5, set(SUB_COMMANDS.values()) | HEAVY_MODULES),
+    "profile --help": (3, set(SUB_COMMANDS.values()) - {SUB_COMMANDS["profile"]} | {"docker", "jinja2"}),
+    "model --help": (2.5, set(SUB_COMMANDS.values()) - {SUB_COMMANDS["model"]} | {"docker", "jinja2", "httpx"}),
+    "challenge --help": (3, set(SUB_COMMANDS.values()) - {SUB_COMMANDS["challenge"]} | {"docker", "jinja2"}),
+    "agent --help": (5, {SUB_COMMANDS["challenge"]}),
+}
+
+# runs of a command before failing its budget, the best one counts
+IMPORT_BUDGET_ATTEMPTS = 3
+
+
+def _import_times(*args: str) -> dict[str, int]:
+    """Run python with -X importtime and return the self import time in microseconds of every module."""
+
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, _, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = times.get(name.strip(), 0) + int(self_time)
+
+    return times
+
+
+@pytest.mark.parametrize("command", IMPORT_BUDGETS)
+def test_import_time_budget(command: str) -> None:
+    budget, forbidden = IMPORT_BUDGETS[command]
+
+    best = None
+    for _ in range(IMPORT_BUDGET_ATTEMPTS):
+        times = _import_times("-m", "dreadnode_cli", *command.split())
+        assert not forbidden & times.keys(), f"'{command}' imports {sorted(forbidden & times.keys())}"
+
+        ratio = sum(times.values()) / sum(_import_times("-c", "import typer").values())
+        best = ratio if best is None else min(best, ratio)
+        if best <= budget:
+            break
+
+    assert best is not None and best <= budget, f"'{command}' imports took {best:.1f}x typer's (budget {budget}x)"
+
+
+def test_lazy_commands_are_listed_without_importing() -> None:
+    script = f"""
+import sys, typer
+from dreadnode_cli.cli import cli
+
+group = typer.main.get_command(cli)
+ctx = group.make_context("dreadnode", [], resilient_parsing=True)
+completions = [item.value for item in group.shell_complete(ctx, "")]
+assert {{"agent", "challenge", "model", "profile", "login"}} <= set(completions), completions
+assert not {set(SUB_COMMANDS.values())!r} & sys.modules.keys()
+"""
+
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_lazy_commands_are_dispatched() -> None:
+    result = CliRunner().invoke(cli, ["profile", "--help"])
+
+    assert result.exit_code == 0
+    assert "Manage server profiles" in result.output
+    assert "switch" in result.output
@@ -1,8 +1,22 @@
+import pathlib
+import time
+import typing as t
+
+import httpx
 import pytest
 
+from dreadnode_cli import types
 from dreadnode_cli.types import GithubRepo
 
 
+@pytest.fixture(autouse=True)
+def probe_cache_path(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    path = tmp_path / "github-probes.json"
+    monkeypatch.setattr(types, "GITHUB_PROBE_CACHE_PATH", path)
+    monkeypatch.setattr(types, "_probes", {})
+    return path
+
+
 def test_github_repo_simple_format() -> None:
     repo = GithubRepo("owner/repo")
     assert repo.namespace == "owner"
@@ -201,3 +215,64 @@ def test_github_repo_self_format() -> None:
     assert repo2.repo == "repo"
     assert repo2.ref == "main"
     assert str(repo2) == str(repo1)
+
+
+def test_github_repo_resolve_commit(monkeypatch: pytest.MonkeyPatch) -> None:
+    requests: list[tuple[str, dict[str, str]]] = []
+
+    def get(url: str, headers: dict[str, str], **kwargs: t.Any) -> httpx.Response:
+        requests.append((url, headers))
+        if "missing" in url:
+            return httpx.Response(404)
+        return httpx.Response(200, text="0123456789abcdef0123456789abcdef01234567\n")
+
+    monkeypatch.setattr(httpx, "get", get)
+
+    assert GithubRepo("owner/repo@v1").resolve_commit() == "0123456789abcdef0123456789abcdef01234567"
+    assert requests[0] == (
+        "https://api.github.com/repos/owner/repo/commits/v1",
+        {"Accept": "application/vnd.github.sha"},
+    )
+    assert GithubRepo("owner/missing").resolve_commit(headers={"Authorization": "Bearer x"}) is None
+    assert requests[1][1]["Authorization"] == "Bearer x"
+
+
+def test_github_repo_probe_is_cached(probe_cache_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    urls: list[str] = []
+
+    def get(url: str, **kwargs: t.Any) -> httpx.Response:
+        urls.append(url)
+        if "/unknown-ref" in url:
+            return httpx.Response(422)
+        return httpx.Response(200, text="0123456789abcdef0123456789abcdef01234567")
+
+    monkeypatch.setattr(httpx, "get", get)
+
+    repo = GithubRepo("owner/repo@main")
+    assert repo.exists
+    assert repo.resolve_commit(headers={}) == "0123456789abcdef0123456789abcdef01234567"
+    assert len(urls) == 1
+
+    # a new invocation reuses the probe until it expires
+    monkeypatch.setattr(types, "_probes", {})
+    assert GithubRepo("owner/repo@main").resolve_commit() == "0123456789abcdef0123456789abcdef01234567"
+    assert len(urls) == 1
+
+    monkeypatch.setattr(types, "_probes", {})
+    monkeypatch.setattr(time, "time", lambda: 2**40)
+    assert GithubRepo("owner/repo@main").exists
+    assert len(urls) == 2
+
+    # the repository exists, its reference doesn't
+    probe = GithubRepo("owner/repo@unknown-ref").probe()
+    assert probe.exists and probe.commit is None
+
+
+def test_github_repo_probe_rate_limited(probe_cache_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(httpx, "get", lambda url, **kwargs: httpx.Response(403))
+    monkeypatch.setattr(httpx, "head", lambda url, **kwargs: httpx.Response(200))
+
+    assert GithubRepo("owner/repo").exists
+    assert GithubRepo("owner/repo").resolve_commit() is None
+    # not definitive, so only kept for this invocation
+    assert not probe_cache_path.exists()
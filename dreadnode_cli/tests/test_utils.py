@@ -1,5 +1,10 @@
+import io
 import os
 import pathlib
+import shutil
+import tarfile
+import tempfile
+import time
 import typing as t
 import zipfile
 from collections.abc import Generator
@@ -8,10 +13,18 @@ from datetime import datetime, timedelta
 import httpx
 import pytest
 
+from dreadnode_cli.types import GithubRepo
 from dreadnode_cli.utils import (
+    COPY_PARALLEL_THRESHOLD,
+    check_github_path,
+    copy_file,
+    copy_tree,
     download_and_unzip_archive,
+    download_github_subtree,
     parse_jwt_token_expiration,
     time_to,
+    untar_stream,
+    unzip_archive,
 )
 
 
@@ -19,6 +32,7 @@ from dreadnode_cli.utils import (
 class MockResponse:
     def __init__(self, zip_path: pathlib.Path):
         self.status_code = 200
+        self.headers: dict[str, str] = {}
         with open(zip_path, "rb") as f:
             self.content = f.read()
 
@@ -113,3 +127,311 @@ def test_download_and_unzip_archive_path_traversal(tmp_path: pathlib.Path, monke
 
     with pytest.raises(Exception, match="Attempted Path Traversal Attack Detected"):
         download_and_unzip_archive("http://test.com/archive.zip")
+
+
+@pytest.mark.parametrize("mode", ["copy", "reflink", "hardlink"])
+def test_copy_file(tmp_path: pathlib.Path, mode: t.Literal["copy", "reflink", "hardlink"]) -> None:
+    src = tmp_path / "src.bin"
+    src.write_bytes(os.urandom(1024 * 1024))
+    src.chmod(0o750)
+    dst = tmp_path / "dst.bin"
+    dst.write_bytes(b"existing content")
+
+    copy_file(src, dst, mode=mode)
+
+    assert dst.read_bytes() == src.read_bytes()
+    assert dst.stat().st_mode & 0o777 == 0o750
+    assert (dst.stat().st_ino == src.stat().st_ino) == (mode == "hardlink")
+
+
+@pytest.mark.parametrize("count", [2, COPY_PARALLEL_THRESHOLD * 2])
+def test_copy_tree(tmp_path: pathlib.Path, count: int) -> None:
+    source = tmp_path / "source"
+    for i in range(count):
+        path = source / f"dir{i % 3}" / f"file{i}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"content {i}")
+    (source / "empty").mkdir()
+    # links are copied as links, even looping ones
+    (source / "self").symlink_to(".")
+    (source / "dir0" / "link.txt").symlink_to("file0.txt")
+
+    copy_tree(source, tmp_path / "destination")
+
+    copied = sorted(p.relative_to(tmp_path / "destination") for p in (tmp_path / "destination").rglob("*"))
+    assert copied == sorted(p.relative_to(source) for p in source.rglob("*"))
+    assert (tmp_path / "destination" / "dir1" / "file1.txt").read_text() == "content 1"
+    assert os.readlink(tmp_path / "destination" / "self") == "."
+    assert os.readlink(tmp_path / "destination" / "dir0" / "link.txt") == "file0.txt"
+
+
+def test_download_github_subtree(monkeypatch: pytest.MonkeyPatch) -> None:
+    files = {
+        "README.md": b"pack",
+        "templates/web/Dockerfile.j2": b"FROM python:3.11",
+        "templates/web/src/main.py": b"print('hello')",
+        "templates/webapp/Dockerfile": b"FROM nginx",
+    }
+    requested: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        if request.url.path == "/repos/owner/pack/git/trees/v1":
+            tree = [{"path": path, "type": "blob"} for path in files] + [{"path": "templates", "type": "tree"}]
+            return httpx.Response(200, json={"tree": tree, "truncated": False})
+        return httpx.Response(200, content=files[request.url.path.removeprefix("/owner/pack/v1/")])
+
+    client = httpx.Client
+    monkeypatch.setattr(httpx, "Client", lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs))
+
+    path = download_github_subtree(GithubRepo("owner/pack@v1"), "templates/web/")
+
+    assert sorted(p.relative_to(path).as_posix() for p in path.rglob("*") if p.is_file()) == [
+        "Dockerfile.j2",
+        "src/main.py",
+    ]
+    assert (path / "src" / "main.py").read_bytes() == b"print('hello')"
+    assert len(requested) == 3
+
+    with pytest.raises(Exception, match="not found"):
+        download_github_subtree(GithubRepo("owner/pack@v1"), "missing")
+
+
+def _targz(files: dict[str, bytes], links: dict[str, str] | None = None) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            info.mode = 0o755 if name.endswith(".sh") else 0o644
+            tar.addfile(info, io.BytesIO(content))
+        for name, target in (links or {}).items():
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tar.addfile(info)
+    return buffer.getvalue()
+
+
+def _chunks(data: bytes, size: int = 1000) -> t.Iterator[bytes]:
+    return (data[i : i + size] for i in range(0, len(data), size))
+
+
+def test_untar_stream(tmp_path: pathlib.Path) -> None:
+    data = _targz(
+        {"repo/Dockerfile": b"FROM python:3.11", "repo/run.sh": b"#!/bin/sh", "repo/src/main.py": os.urandom(5000)},
+        links={"repo/link.py": "src/main.py"},
+    )
+
+    untar_stream(_chunks(data), tmp_path)
+
+    assert (tmp_path / "repo" / "Dockerfile").read_bytes() == b"FROM python:3.11"
+    assert os.access(tmp_path / "repo" / "run.sh", os.X_OK)
+    assert (tmp_path / "repo" / "link.py").read_bytes() == (tmp_path / "repo" / "src" / "main.py").read_bytes()
+
+
+@pytest.mark.parametrize(
+    "files, links",
+    [({"../escape.txt": b"x"}, None), ({"/etc/escape.txt": b"x"}, None), ({}, {"repo/link": "../../etc/passwd"})],
+)
+def test_untar_stream_path_traversal(
+    tmp_path: pathlib.Path, files: dict[str, bytes], links: dict[str, str] | None
+) -> None:
+    with pytest.raises(Exception, match="Attempted Path Traversal Attack Detected"):
+        untar_stream(_chunks(_targz(files, links)), tmp_path / "dest")
+
+
+def test_untar_stream_chained_links(tmp_path: pathlib.Path) -> None:
+    # each link looks harmless on its own, but z resolves to the parent of the destination
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, target in [("repo/y", ".."), ("repo/z", "y/..")]:
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tar.addfile(info)
+        info = tarfile.TarInfo("repo/z/evil.txt")
+        info.size = 1
+        tar.addfile(info, io.BytesIO(b"x"))
+
+    destination = tmp_path / "sub" / "dest"
+    with pytest.raises(Exception, match="Attempted Path Traversal Attack Detected"):
+        untar_stream(_chunks(buffer.getvalue()), destination)
+
+    assert not list(tmp_path.rglob("evil.txt"))
+
+    # x looks inside while d doesn't exist, until d is linked to the destination itself
+    def retargeted(with_file: bool) -> bytes:
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            for name, target in [("x", "d/e/../../escaped"), ("d", ".")]:
+                info = tarfile.TarInfo(name)
+                info.type = tarfile.SYMTYPE
+                info.linkname = target
+                tar.addfile(info)
+            info = tarfile.TarInfo("e")
+            info.type = tarfile.DIRTYPE
+            tar.addfile(info)
+            if with_file:
+                info = tarfile.TarInfo("x")
+                info.size = 5
+                tar.addfile(info, io.BytesIO(b"pwned"))
+        return buffer.getvalue()
+
+    # the file replaces the link instead of being written through it
+    untar_stream(_chunks(retargeted(with_file=True)), tmp_path / "sub" / "file")
+    assert not (tmp_path / "sub" / "file" / "x").is_symlink()
+    assert (tmp_path / "sub" / "file" / "x").read_bytes() == b"pwned"
+
+    # the link is refused once d makes it point outside
+    with pytest.raises(Exception, match="Attempted Path Traversal Attack Detected"):
+        untar_stream(_chunks(retargeted(with_file=False)), tmp_path / "sub" / "link")
+    assert not (tmp_path / "sub" / "link" / "x").is_symlink()
+
+    assert not (tmp_path / "sub" / "escaped").exists()
+
+
+def test_untar_stream_subpath(tmp_path: pathlib.Path) -> None:
+    chunks_read = 0
+    data = _targz(
+        {
+            "owner-repo-abc/README.md": b"readme",
+            "owner-repo-abc/agents/web/Dockerfile": b"FROM python:3.11",
+            "owner-repo-abc/agents/web/src/main.py": b"print('hello')",
+            "owner-repo-abc/agents/webapp/Dockerfile": b"FROM nginx",
+            "owner-repo-abc/zzz/large.bin": os.urandom(100_000),
+        }
+    )
+
+    def chunks() -> t.Iterator[bytes]:
+        nonlocal chunks_read
+        for chunk in _chunks(data):
+            chunks_read += 1
+            yield chunk
+
+    untar_stream(chunks(), tmp_path / "dest", subpath="agents/web/")
+
+    assert sorted(p.relative_to(tmp_path / "dest").as_posix() for p in (tmp_path / "dest").rglob("*")) == [
+        "Dockerfile",
+        "src",
+        "src/main.py",
+    ]
+    # the whole archive went through the stream, only the subtree was written
+    assert chunks_read == len(list(_chunks(data)))
+
+    with pytest.raises(Exception, match="not found in archive"):
+        untar_stream(_chunks(data), tmp_path / "missing", subpath="agents/missing")
+
+
+def test_unzip_archive_subpath(tmp_path: pathlib.Path) -> None:
+    zip_path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("owner-repo-abc/README.md", b"readme")
+        zf.writestr("owner-repo-abc/agents/web/Dockerfile", b"FROM python:3.11")
+
+    unzip_archive(zip_path, tmp_path / "dest", subpath="agents/web")
+
+    assert [p.name for p in (tmp_path / "dest").iterdir()] == ["Dockerfile"]
+
+
+def test_check_github_path(monkeypatch: pytest.MonkeyPatch) -> None:
+    def get(url: str, **kwargs: t.Any) -> httpx.Response:
+        request = httpx.Request("GET", url)
+        if url.endswith("/contents/agents/web"):
+            return httpx.Response(200, json=[{"name": "Dockerfile", "type": "file"}], request=request)
+        if url.endswith("/contents/README.md"):
+            return httpx.Response(200, json={"name": "README.md", "type": "file"}, request=request)
+        if url.endswith("/contents/limited"):
+            return httpx.Response(403, json={"message": "API rate limit exceeded"}, request=request)
+        return httpx.Response(404, json={"message": "Not Found"}, request=request)
+
+    monkeypatch.setattr(httpx, "get", get)
+
+    check_github_path(GithubRepo("owner/repo"), "agents/web/")
+    # the download reports other errors
+    check_github_path(GithubRepo("owner/repo"), "limited")
+
+    with pytest.raises(Exception, match="not found in repository"):
+        check_github_path(GithubRepo("owner/repo"), "missing")
+    with pytest.raises(Exception, match="not a folder"):
+        check_github_path(GithubRepo("owner/repo"), "README.md")
+
+
+def test_download_tar_archive(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    archive = tmp_path / "archive.tar.gz"
+    archive.write_bytes(_targz({"repo/Dockerfile": b"FROM python:3.11"}))
+    monkeypatch.setattr(httpx, "stream", lambda *args, **kw: MockResponse(archive))
+
+    output_dir = download_and_unzip_archive("https://github.com/owner/repo/tarball/main")
+
+    assert (output_dir / "repo" / "Dockerfile").read_bytes() == b"FROM python:3.11"
+
+
+def test_archive_extraction_benchmark(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Compare peak disk use and wall time of extracting the same tree from a ZIP and a tar.gz download.
+    Set DREADNODE_BENCHMARK_ARCHIVE_MB to run it with a bigger archive (e.g. 200).
+    """
+
+    size = int(os.getenv("DREADNODE_BENCHMARK_ARCHIVE_MB") or 4) * 1024 * 1024
+    files = {f"repo/data/{i}.bin": os.urandom(1024 * 1024) for i in range(max(size // (1024 * 1024), 1))}
+
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(work_dir))
+
+    peak = 0
+
+    def sample() -> None:
+        nonlocal peak
+        peak = max(peak, sum(path.stat().st_size for path in work_dir.rglob("*") if path.is_file()))
+
+    # the spooled zip is removed once extracted, when both are on disk
+    remove = os.remove
+
+    def sample_and_remove(path: str) -> None:
+        sample()
+        remove(path)
+
+    monkeypatch.setattr(os, "remove", sample_and_remove)
+
+    results: dict[str, tuple[int, float]] = {}
+    for url, data in [
+        ("https://example.com/archive.zip", zip_buffer.getvalue()),
+        ("https://example.com/archive.tar.gz", _targz(files)),
+    ]:
+
+        class Response(MockResponse):
+            def __init__(self, data: bytes) -> None:
+                self.status_code = 200
+                self.headers = {"Content-Length": str(len(data))}
+                self.content = data
+
+            def iter_bytes(self, chunk_size: int) -> Generator[bytes, None, None]:
+                for chunk in _chunks(self.content, chunk_size):
+                    sample()
+                    yield chunk
+                sample()
+
+        monkeypatch.setattr(httpx, "stream", lambda *args, response=Response(data), **kw: response)
+
+        peak = 0
+        started_at = time.monotonic()
+        output_dir = download_and_unzip_archive(url)
+        results[url] = (peak, time.monotonic() - started_at)
+
+        assert sum(path.stat().st_size for path in output_dir.rglob("*") if path.is_file()) == size
+        shutil.rmtree(output_dir)
+
+    print()
+    for url, (peak, elapsed) in results.items():
+        print(f"{url}: peak disk {peak / 1024 / 1024:.1f} MB, {elapsed:.2f}s")
+
+    # the zip is spooled whole before extraction, the tarball never exists on disk
+    assert results["https://example.com/archive.zip"][0] >= 2 * size
+    assert results["https://example.com/archive.tar.gz"][0] <= size
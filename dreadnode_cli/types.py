@@ -1,7 +1,58 @@
 import re
+import time
 import typing as t
 
 import httpx
+from pydantic import BaseModel
+
+from dreadnode_cli.defaults import GITHUB_PROBE_CACHE_PATH, GITHUB_PROBE_TTL
+
+
+class GithubRepoProbe(BaseModel):
+    # whether the repository exists and is accessible
+    exists: bool
+    # commit the reference resolves to, if known
+    commit: str | None = None
+    expires_at: float = 0
+
+
+class GithubProbeCache(BaseModel):
+    """Probed repository references, keyed by namespace, repo and ref, reused until they expire."""
+
+    probes: dict[str, GithubRepoProbe] = {}
+
+    @classmethod
+    def read(cls) -> "GithubProbeCache":
+        """Read the cache from the file system or return an empty instance if missing or unreadable."""
+
+        try:
+            return cls.model_validate_json(GITHUB_PROBE_CACHE_PATH.read_text())
+        except Exception:
+            return cls()
+
+    def write(self) -> None:
+        """Write the cache to the file system, dropping expired entries."""
+
+        now = time.time()
+        self.probes = {key: probe for key, probe in self.probes.items() if probe.expires_at > now}
+
+        try:
+            GITHUB_PROBE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            GITHUB_PROBE_CACHE_PATH.write_text(self.model_dump_json())
+        except OSError:
+            pass
+
+    def get(self, key: str) -> GithubRepoProbe | None:
+        probe = self.probes.get(key)
+        return probe if probe is not None and probe.expires_at > time.time() else None
+
+    def add(self, key: str, probe: GithubRepoProbe, ttl: int = GITHUB_PROBE_TTL) -> "GithubProbeCache":
+        self.probes[key] = probe.model_copy(update={"expires_at": time.time() + ttl})
+        return self
+
+
+# probes made during this invocation, keyed by repository reference and whether they were authenticated
+_probes: dict[tuple[str, bool], GithubRepoProbe] = {}
 
 
 class GithubRepo(str):
@@ -129,6 +180,16 @@ class GithubRepo(str):
         """API ZIP archive URL for the repository."""
         return f"https://api.github.com/repos/{self.namespace}/{self.repo}/zipball/{self.ref}"
 
+    @property
+    def tar_url(self) -> str:
+        """Gzipped tar archive URL for the repository, which can be extracted while downloading."""
+        return f"https://github.com/{self.namespace}/{self.repo}/tarball/{self.ref}"
+
+    @property
+    def api_tar_url(self) -> str:
+        """API gzipped tar archive URL for the repository."""
+        return f"https://api.github.com/repos/{self.namespace}/{self.repo}/tarball/{self.ref}"
+
     @property
     def tree_url(self) -> str:
         """URL to view the tree at this reference."""
@@ -136,9 +197,66 @@ class GithubRepo(str):
 
     @property
     def exists(self) -> bool:
-        """Check if a repo exists (or is private) on GitHub."""
-        response = httpx.get(f"https://github.com/{self.namespace}/{self.repo}")
-        return response.status_code == 200
+        """Check if a repo (and its reference) exists publicly on GitHub."""
+        return self.probe().exists
+
+    def resolve_commit(self, *, headers: dict[str, str] | None = None) -> str | None:
+        """Resolve the reference to a commit SHA with the GitHub API, None if it can't be resolved."""
+        return self.probe(headers=headers).commit
+
+    def probe(self, *, headers: dict[str, str] | None = None) -> GithubRepoProbe:
+        """
+        Check the repository exists and resolve the reference to a commit with a single API request. Results
+        are reused for the rest of the invocation, and unauthenticated ones for GITHUB_PROBE_TTL seconds.
+        """
+
+        key = (str(self), bool(headers))
+        if key in _probes:
+            return _probes[key]
+
+        cache = GithubProbeCache.read() if not headers and GITHUB_PROBE_TTL > 0 else None
+        cached = cache.get(str(self)) if cache is not None else None
+        if cached is not None:
+            _probes[key] = cached
+            return cached
+
+        probe, definitive = self._probe(headers or {})
+        _probes[key] = probe
+        if cache is not None and definitive:
+            cache.add(str(self), probe).write()
+
+        return probe
+
+    def _probe(self, headers: dict[str, str]) -> tuple[GithubRepoProbe, bool]:
+        """Probe the repository, returning whether the answer is definitive and can be cached."""
+
+        try:
+            response = httpx.get(
+                f"https://api.github.com/repos/{self.namespace}/{self.repo}/commits/{self.ref}",
+                headers={"Accept": "application/vnd.github.sha", **headers},
+                follow_redirects=True,
+                timeout=10,
+            )
+        except httpx.HTTPError:
+            return GithubRepoProbe(exists=False), False
+
+        if response.status_code == 200:
+            return GithubRepoProbe(exists=True, commit=response.text.strip() or None), True
+
+        # unknown reference (422) or empty repository (409)
+        if response.status_code in (409, 422):
+            return GithubRepoProbe(exists=True), True
+
+        if response.status_code == 404:
+            return GithubRepoProbe(exists=False), True
+
+        # rate limited, fall back to a HEAD request on the repository page
+        try:
+            response = httpx.head(f"https://github.com/{self.namespace}/{self.repo}", timeout=10)
+        except httpx.HTTPError:
+            return GithubRepoProbe(exists=False), False
+
+        return GithubRepoProbe(exists=response.status_code == 200), False
 
     def __repr__(self) -> str:
         return f"GithubRepo(namespace='{self.namespace}', repo='{self.repo}', ref='{self.ref}')"
@@ -1,39 +1,37 @@
 import base64
-import functools
+import hashlib
+import io
 import json
 import os
 import pathlib
-import sys
+import shutil
+import tarfile
 import tempfile
 import typing as t
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import httpx
 from rich import print
 
-from dreadnode_cli.defaults import DEBUG
+from dreadnode_cli.download import DownloadStream, create_progress
+from dreadnode_cli.types import GithubRepo
 
-P = t.ParamSpec("P")
-R = t.TypeVar("R")
+# how files are copied, reflink and hardlink fall back to a copy when not supported by the filesystem
+CopyMode = t.Literal["copy", "reflink", "hardlink"]
 
+# file sets larger than this are copied with a thread pool
+COPY_PARALLEL_THRESHOLD = 32
 
-def pretty_cli(func: t.Callable[P, R]) -> t.Callable[P, R]:
-    """Decorator to pad function output and catch/pretty print any exceptions."""
+# buffer size used to write extracted archive members
+ARCHIVE_CHUNK_SIZE_MAX = 4 * 1024 * 1024
 
-    @functools.wraps(func)
-    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
-        try:
-            print()
-            return func(*args, **kwargs)
-        except Exception as e:
-            if DEBUG:
-                raise
-
-            print(f":exclamation: {e}")
-            sys.exit(1)
+# content types of tar archives, which are extracted while downloading
+TAR_CONTENT_TYPES = {"application/x-tar", "application/gzip", "application/x-gzip", "application/x-gtar"}
 
-    return wrapper
+# linux ioctl to clone a file (reflink) on filesystems that support it (btrfs, xfs, ...)
+FICLONE = 0x40049409
 
 
 def time_to(future_datetime: datetime) -> str:
@@ -81,36 +79,435 @@ def get_repo_archive_source_path(source_dir: pathlib.Path) -> pathlib.Path:
     return source_dir
 
 
-def download_and_unzip_archive(url: str, *, headers: dict[str, str] | None = None) -> pathlib.Path:
+class _ChunkReader(io.RawIOBase):
+    """File-like view over an iterator of byte chunks, for consumers that want read() like tarfile streams."""
+
+    def __init__(self, chunks: t.Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buffer = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: t.Any) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def _safe_path(root: str, name: str) -> str:
+    """Resolve an archive member name against the (already resolved) extraction root."""
+
+    return _inside(root, os.path.normpath(os.path.join(root, name)))
+
+
+def _inside(root: str, path: str) -> str:
+    if path != root and not path.startswith(root + os.sep):
+        raise Exception("Attempted Path Traversal Attack Detected")
+    return path
+
+
+def _resolved_path(root: str, name: str) -> str:
     """
-    Downloads a ZIP archive from the given URL and unzips it into a temporary directory.
+    Resolve an archive member name against the extraction root, following the links already extracted (which
+    their names alone don't tell about, like chained relative links).
     """
 
-    temp_dir = pathlib.Path(tempfile.mkdtemp())
-    local_zip_path = pathlib.Path(os.path.join(temp_dir, "archive.zip"))
+    path = _safe_path(root, name)
+    if path == root:
+        return path
+    return os.path.join(_inside(root, os.path.realpath(os.path.dirname(path))), os.path.basename(path))
 
-    print(f":arrow_double_down: Downloading {url} ...")
 
-    # download to temporary file
-    with httpx.stream("GET", url, follow_redirects=True, verify=True, headers=headers) as response:
-        response.raise_for_status()
-        with open(local_zip_path, "wb") as zip_file:
-            for chunk in response.iter_bytes(chunk_size=8192):
-                zip_file.write(chunk)
+def is_tar_archive(url: str, content_type: str = "") -> bool:
+    path = httpx.URL(url).path
+    return (
+        content_type in TAR_CONTENT_TYPES
+        or path.endswith((".tar", ".tar.gz", ".tgz"))
+        or "/tarball/" in path
+        or "/tar.gz/" in path
+    )
+
+
+def _rebase(name: str, prefix: str | None) -> str | None:
+    """
+    Map an archive member name to its path in the extraction directory. With a prefix, the top-level folder
+    of the archive is dropped and only members under the prefix are kept (None otherwise), relative to it.
+    """
+
+    if prefix is None:
+        return name
+
+    _, _, name = name.rstrip("/").partition("/")
+    if name + "/" == prefix:
+        return ""
+    if not name.startswith(prefix):
+        return None
+    return name.removeprefix(prefix)
+
+
+def unzip_archive(zip_path: pathlib.Path, directory: pathlib.Path, *, subpath: str | None = None) -> None:
+    """
+    Extract a ZIP archive into a directory, refusing members that would land outside of it.
+    See untar_stream for subpath.
+    """
+
+    root = os.path.realpath(directory)
+    prefix = subpath.strip("/") + "/" if subpath else None
+    found = False
+
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for member in zf.infolist():
+            name = _rebase(member.filename, prefix)
+            if name is None:
+                continue
+
+            found = True
+            path = _safe_path(root, name)
+
+            if member.is_dir():
+                os.makedirs(path, exist_ok=True)
+                continue
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with zf.open(member) as source, open(path, "wb") as file:
+                shutil.copyfileobj(source, file, ARCHIVE_CHUNK_SIZE_MAX)
 
-    # unzip to temporary directory
+    if subpath and not found:
+        raise Exception(f"Path '{subpath}' not found in archive")
+
+
+def _write_file(path: str, source: t.IO[bytes]) -> None:
+    """Write a file without following a link already at its path, which is replaced like any other file."""
+
+    if os.path.islink(path) or os.path.isfile(path):
+        os.unlink(path)
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0), 0o644)
+    with os.fdopen(fd, "wb") as file:
+        shutil.copyfileobj(source, file, ARCHIVE_CHUNK_SIZE_MAX)
+
+
+def untar_stream(chunks: t.Iterator[bytes], directory: pathlib.Path, *, subpath: str | None = None) -> None:
+    """
+    Extract a (compressed) tar archive into a directory while it is being read, refusing members that would
+    land outside of it. Links are only kept when they point inside the directory, special files are skipped.
+
+    Symbolic links are created last, once nothing else is written, so later members can neither be written
+    through them nor change where they point. Members under a symbolic link of the archive are refused.
+
+    With a subpath, the archive is expected to have a single top-level folder (like GitHub archives) and only
+    the members under <folder>/<subpath> are extracted, directly into the directory. The rest of the archive
+    is read past without being written.
+    """
+
+    root = os.path.realpath(directory)
+    prefix = subpath.strip("/") + "/" if subpath else None
+    found = False
+    # path -> target of the symbolic links to create
+    links: dict[str, str] = {}
+
+    def check_not_linked(path: str) -> None:
+        parent = os.path.dirname(path)
+        while parent.startswith(root + os.sep):
+            if parent in links:
+                raise Exception("Attempted Path Traversal Attack Detected")
+            parent = os.path.dirname(parent)
+
+    with tarfile.open(fileobj=io.BufferedReader(_ChunkReader(chunks)), mode="r|*") as tar:
+        for member in tar:
+            name = _rebase(member.name, prefix)
+            if name is None:
+                continue
+
+            found = True
+            path = _resolved_path(root, name)
+            check_not_linked(path)
+
+            if member.isdir():
+                links.pop(path, None)
+                os.makedirs(path, exist_ok=True)
+
+            elif member.isfile():
+                links.pop(path, None)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                source = tar.extractfile(member)
+                _write_file(path, source if source is not None else io.BytesIO())
+                os.chmod(path, member.mode & 0o755 | 0o644)
+
+            elif member.issym():
+                _inside(root, os.path.normpath(os.path.join(os.path.dirname(path), member.linkname)))
+                links[path] = member.linkname
+
+            elif member.islnk():
+                # the link target must have been extracted already
+                target = _rebase(member.linkname, prefix)
+                if target is None:
+                    continue
+                target_path = _safe_path(root, target)
+                check_not_linked(target_path)
+                links.pop(path, None)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if os.path.islink(path) or os.path.isfile(path):
+                    os.unlink(path)
+                os.link(_inside(root, os.path.realpath(target_path)), path)
+
+    if subpath and not found:
+        raise Exception(f"Path '{subpath}' not found in archive")
+
+    for path, linkname in links.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.islink(path) or os.path.isfile(path):
+            os.unlink(path)
+        os.symlink(linkname, path)
+
+    # where links point is only known once they all exist, as they can go through each other
     try:
-        with zipfile.ZipFile(local_zip_path, "r") as zf:
-            for member in zf.infolist():
-                file_path = os.path.realpath(os.path.join(temp_dir, member.filename))
-                if file_path.startswith(os.path.realpath(temp_dir)):
-                    zf.extract(member, temp_dir)
-                else:
-                    raise Exception("Attempted Path Traversal Attack Detected")
+        for path in links:
+            _inside(root, os.path.realpath(path))
+    except Exception:
+        for path in links:
+            if os.path.islink(path):
+                os.unlink(path)
+        raise
+
 
+def extract_archive(
+    url: str,
+    chunks: t.Iterable[bytes],
+    directory: pathlib.Path,
+    *,
+    content_type: str = "",
+    subpath: str | None = None,
+) -> None:
+    """
+    Extract a downloading archive into a directory. Tar archives are extracted as their data arrives, ZIP
+    archives keep their index at the end and are spooled to a temporary file next to the directory first.
+    """
+
+    if is_tar_archive(url, content_type):
+        untar_stream(iter(chunks), directory, subpath=subpath)
+        return
+
+    fd, local_zip_path = tempfile.mkstemp(suffix=".zip", dir=directory.parent)
+    try:
+        with os.fdopen(fd, "wb") as zip_file:
+            for chunk in chunks:
+                zip_file.write(chunk)
+
+        unzip_archive(pathlib.Path(local_zip_path), directory, subpath=subpath)
     finally:
         # always remove the zip file
-        if local_zip_path.exists():
-            os.remove(local_zip_path)
+        os.remove(local_zip_path)
+
+
+def download_and_unzip_archive(
+    url: str, *, headers: dict[str, str] | None = None, subpath: str | None = None
+) -> pathlib.Path:
+    """
+    Downloads a ZIP or tar archive from the given URL and extracts it into a temporary directory.
+    With a subpath, only that folder of a (GitHub like) archive is extracted, see untar_stream.
+    """
+
+    temp_dir = pathlib.Path(tempfile.mkdtemp())
+
+    print(f":arrow_double_down: Downloading {url} ...")
+
+    try:
+        with create_progress() as progress, DownloadStream(url, headers=headers, progress=progress) as stream:
+            stream.open()
+            extract_archive(url, stream, temp_dir, content_type=stream.content_type, subpath=subpath)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
 
     return temp_dir
+
+
+def download_github_subtree(
+    github_repo: GithubRepo, path: str, *, headers: dict[str, str] | None = None
+) -> pathlib.Path:
+    """
+    Downloads a single directory of a GitHub repository into a temporary directory,
+    listing it with the git trees API and fetching its files in parallel.
+    """
+
+    headers = headers or {}
+    prefix = path.strip("/") + "/"
+    api_url = f"https://api.github.com/repos/{github_repo.namespace}/{github_repo.repo}"
+
+    print(f":arrow_double_down: Downloading {github_repo.tree_url}/{prefix} ...")
+
+    with httpx.Client(headers=headers, follow_redirects=True, timeout=30) as client:
+        response = client.get(f"{api_url}/git/trees/{github_repo.ref}", params={"recursive": "1"})
+        response.raise_for_status()
+        tree = response.json()
+        if tree.get("truncated"):
+            raise Exception(f"Repository '{github_repo}' is too large to list, download the full archive instead")
+
+        files = [
+            entry["path"] for entry in tree["tree"] if entry["type"] == "blob" and entry["path"].startswith(prefix)
+        ]
+        if not files:
+            raise Exception(f"Path '{path}' not found in repository '{github_repo}'")
+
+        temp_dir = pathlib.Path(tempfile.mkdtemp())
+        root = temp_dir.resolve()
+
+        def download(file: str) -> None:
+            destination = (temp_dir / file.removeprefix(prefix)).resolve()
+            if not destination.is_relative_to(root):
+                raise Exception("Attempted Path Traversal Attack Detected")
+
+            # private repositories can only be read through the API
+            if "Authorization" in headers:
+                response = client.get(
+                    f"{api_url}/contents/{file}",
+                    params={"ref": github_repo.ref},
+                    headers={"Accept": "application/vnd.github.raw"},
+                )
+            else:
+                response = client.get(
+                    f"https://raw.githubusercontent.com/{github_repo.namespace}/{github_repo.repo}/{github_repo.ref}/{file}"
+                )
+            response.raise_for_status()
+
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            destination.write_bytes(response.content)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(download, files))
+
+    return temp_dir
+
+
+def check_github_path(github_repo: GithubRepo, path: str, *, headers: dict[str, str] | None = None) -> None:
+    """
+    Make sure a folder exists in a GitHub repository before downloading it, by listing it with the contents API.
+    Errors other than a missing path are ignored, the download will report them.
+    """
+
+    response = httpx.get(
+        f"https://api.github.com/repos/{github_repo.namespace}/{github_repo.repo}/contents/{path.strip('/')}",
+        params={"ref": github_repo.ref},
+        headers=headers or {},
+        follow_redirects=True,
+        timeout=30,
+    )
+    if response.status_code == 404:
+        raise Exception(f"Path '{path}' not found in repository '{github_repo}'")
+    if response.is_success and not isinstance(response.json(), list):
+        raise Exception(f"Path '{path}' is not a folder in repository '{github_repo}'")
+
+
+def _reflink(src: pathlib.Path, dst: pathlib.Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            return True
+        except OSError:
+            return False
+
+
+def _copy_file_range(src: pathlib.Path, dst: pathlib.Path) -> bool:
+    if not hasattr(os, "copy_file_range"):
+        return False
+
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        remaining = os.fstat(src_file.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(src_file.fileno(), dst_file.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        except OSError:
+            # not supported across these filesystems, let the caller start over
+            return False
+
+    return remaining == 0
+
+
+def copy_file(src: pathlib.Path, dst: pathlib.Path, *, mode: CopyMode = "copy") -> None:
+    """
+    Copy a file without moving its data through userspace when possible: hardlink or reflink if
+    requested, then copy_file_range, then shutil (which uses sendfile on linux).
+    """
+
+    if mode == "hardlink":
+        try:
+            dst.unlink(missing_ok=True)
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+
+    if (mode == "reflink" and _reflink(src, dst)) or _copy_file_range(src, dst):
+        shutil.copymode(src, dst)
+        return
+
+    shutil.copy(src, dst)
+
+
+def copy_tree(source: pathlib.Path, destination: pathlib.Path, *, mode: CopyMode = "copy") -> None:
+    """
+    Copy a directory tree like shutil.copytree(symlinks=True), copying large trees with a thread pool.
+    Symbolic links are copied as links, never followed.
+    """
+
+    files: list[tuple[pathlib.Path, pathlib.Path]] = []
+    for root, dirnames, names in os.walk(source):
+        target = destination / pathlib.Path(root).relative_to(source)
+        target.mkdir(parents=True, exist_ok=True)
+
+        # links to directories are listed with the directories, but not walked into
+        for name in [*dirnames, *names]:
+            src, dst = pathlib.Path(root) / name, target / name
+            if src.is_symlink():
+                if dst.is_symlink() or dst.is_file():
+                    dst.unlink()
+                os.symlink(os.readlink(src), dst)
+            elif name in names:
+                files.append((src, dst))
+
+    if len(files) <= COPY_PARALLEL_THRESHOLD:
+        for src, dst in files:
+            copy_file(src, dst, mode=mode)
+        return
+
+    with ThreadPoolExecutor() as executor:
+        # consume the results to raise the first error
+        list(executor.map(lambda item: copy_file(*item, mode=mode), files))
+
+
+def hash_file(path: pathlib.Path) -> str:
+    """Return the sha256 hex digest of a file's content."""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_tree(root: pathlib.Path, *, exclude: t.Container[str] = ()) -> dict[str, str]:
+    """Map every file under a directory (posix relative paths) to the sha256 of its content."""
+
+    paths = [path for path in root.rglob("*") if path.is_file() and path.relative_to(root).as_posix() not in exclude]
+
+    with ThreadPoolExecutor() as executor:
+        return dict(
+            zip((path.relative_to(root).as_posix() for path in paths), executor.map(hash_file, paths), strict=True)
+        )